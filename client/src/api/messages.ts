@@ -1,10 +1,21 @@
 import { API_URL } from "./config"
 
-export async function fetchMessages(groupId: string, chatId: string) {
+// Same as the server default (MESSAGES_PAGE_SIZE)
+export const MESSAGES_PAGE_SIZE = 50
+
+// One page of a chat, oldest first: the latest messages, or those just before
+// the message id `before`. A page shorter than `limit` is the start of the chat.
+export async function fetchMessages(
+  groupId: string,
+  chatId: string,
+  opts: { before?: string, limit?: number } = {}
+) {
   const token = localStorage.getItem("nexus_token")
+  const params = new URLSearchParams({ limit: String(opts.limit ?? MESSAGES_PAGE_SIZE) })
+  if (opts.before) params.set("before", opts.before)
 
   const res = await fetch(
-    `${API_URL}/api/messages/${groupId}/${chatId}`,
+    `${API_URL}/api/messages/${groupId}/${chatId}?${params}`,
     {
       headers: {
         Authorization: `Bearer ${token}`,
@@ -5,9 +5,10 @@ type Props = {
   title: string
   onToggleSidebar: () => void
   onOpenDetails: () => void
+  onlineCount?: number
 }
 
-export default function ChatHeader({ title, onToggleSidebar, onOpenDetails }: Props) {
+export default function ChatHeader({ title, onToggleSidebar, onOpenDetails, onlineCount }: Props) {
   return (
     <div className="flex items-center justify-between border-b border-nexus-border bg-nexus-header px-6 py-4">
       <div className="flex items-center gap-3">
@@ -29,7 +30,9 @@ export default function ChatHeader({ title, onToggleSidebar, onOpenDetails }: Pr
               <span className="animate-ping absolute inline-flex h-full w-full rounded-full bg-emerald-400 opacity-75"></span>
               <span className="relative inline-flex rounded-full h-2 w-2 bg-emerald-500"></span>
             </span>
-            <p className="text-xs text-nexus-muted">Online</p>
+            <p className="text-xs text-nexus-muted">
+              {onlineCount ? `${onlineCount} online` : "Online"}
+            </p>
           </div>
         </div>
       </div>
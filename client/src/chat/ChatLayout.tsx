@@ -32,7 +32,10 @@ export default function ChatLayout() {
     removeMember,
     profileImage,
     deleteMessage,
-    editMessage
+    editMessage,
+    onlineInChat,
+    hasOlderMessages,
+    loadOlderMessages
   } = useWorkspace()
 
   /* Reply State */
@@ -79,6 +82,7 @@ export default function ChatLayout() {
             title={activeChat.title}
             onToggleSidebar={() => setIsSidebarOpen(!isSidebarOpen)}
             onOpenDetails={() => setShowGroupDetails(true)}
+            onlineCount={onlineInChat.length}
           />
           <MessageList
             messages={activeChat.messages}
@@ -88,6 +92,8 @@ export default function ChatLayout() {
             onReply={handleReply}
             onDelete={deleteMessage}
             onEdit={editMessage}
+            hasOlder={hasOlderMessages}
+            onLoadOlder={loadOlderMessages}
           />
           <MessageInput
             onSend={handleSend}
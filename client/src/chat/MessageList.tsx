@@ -10,18 +10,31 @@ type Props = {
   onReply: (message: Message) => void
   onDelete: (messageId: string, type: "everyone" | "me") => void
   onEdit: (messageId: string, content: string) => void
+  hasOlder?: boolean
+  onLoadOlder?: () => void
 }
 
-export default function MessageList({ messages, isTyping, userEmail, userImage, onReply, onDelete, onEdit }: Props) {
+export default function MessageList({ messages, isTyping, userEmail, userImage, onReply, onDelete, onEdit, hasOlder, onLoadOlder }: Props) {
   const bottomRef = useRef<HTMLDivElement>(null)
+  const last = messages[messages.length - 1]
 
+  // Follow new and streaming messages, but stay put when older pages are prepended
   useEffect(() => {
     bottomRef.current?.scrollIntoView({ behavior: "smooth" })
-  }, [messages, isTyping])
+  }, [last?.id, last?.content, isTyping])
 
   return (
     <div className="flex-1 overflow-y-auto px-6 py-4">
       <div className="flex flex-col gap-3">
+        {hasOlder && onLoadOlder && (
+          <button
+            onClick={onLoadOlder}
+            className="mx-auto rounded-full px-3 py-1 text-xs text-nexus-muted hover:text-nexus-text"
+          >
+            Load older messages
+          </button>
+        )}
+
         {messages.length === 0 && !isTyping && (
           <div className="mt-20 text-center text-nexus-muted">
             Ask Nexus anything…
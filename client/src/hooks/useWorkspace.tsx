@@ -1,5 +1,5 @@
 import { useEffect, useState, useRef } from "react"
-import { fetchMessages } from "../api/messages"
+import { fetchMessages, MESSAGES_PAGE_SIZE } from "../api/messages"
 import { getProfile } from "../api/auth"
 import { socket } from "../socket"
 import axios from "axios"
@@ -18,6 +18,7 @@ export type Message = {
     content: string
   }
   is_deleted?: boolean
+  seq?: number
 }
 
 export type Chat = {
@@ -37,6 +38,21 @@ export type Group = {
 import { API_URL as BASE_URL } from "../api/config"
 const API_URL = `${BASE_URL}/api`
 
+// Server message (GET /api/messages or messages_synced) to client shape
+function toMessage(m: any): Message {
+  return {
+    id: m.id || crypto.randomUUID(),
+    role: m.role,
+    content: m.content,
+    sender: m.sender || m.user_id,
+    sender_name: m.sender_name,
+    sender_image: m.sender_image,
+    replyTo: m.replyTo || undefined,
+    is_deleted: m.is_deleted,
+    seq: m.seq
+  }
+}
+
 
 export function useWorkspace() {
   const [groups, setGroups] = useState<Group[]>([])
@@ -48,9 +64,25 @@ export function useWorkspace() {
   const [username, setUsername] = useState("")
   const [profileImage, setProfileImage] = useState<string | null>(null)
   const [error, setError] = useState<string | null>(null)
+  // Online users per socket room ("group:<id>" and "<groupId>:<chatId>")
+  const [presence, setPresence] = useState<Record<string, string[]>>({})
+  // Whether older pages of a chat ("<groupId>:<chatId>") may still be on the server
+  const [hasOlder, setHasOlder] = useState<Record<string, boolean>>({})
+  const loadingOlderRef = useRef(false)
 
+  const typersRef = useRef(new Map<string, number>())
   const activeGroupIdRef = useRef(activeGroupId)
   const activeChatIdRef = useRef(activeChatId)
+  // Highest sequence number seen per chat ("<groupId>:<chatId>"); on reconnect it
+  // is sent as `since` so the server only returns what was missed
+  const seqRef = useRef(new Map<string, number>())
+  const lastJoinedRef = useRef("")
+
+  function noteSeq(groupId: string, chatId: string, seq?: number) {
+    if (seq === undefined || seq === null) return
+    const key = `${groupId}:${chatId}`
+    if (seq > (seqRef.current.get(key) ?? -1)) seqRef.current.set(key, seq)
+  }
 
   useEffect(() => {
     activeGroupIdRef.current = activeGroupId
@@ -144,8 +176,24 @@ export function useWorkspace() {
       console.log("Socket disconnected")
     }
 
+    // Full lists on join, then diffs
+    function onPresenceSnapshot(data: { rooms: Record<string, string[]> }) {
+      setPresence(prev => ({ ...prev, ...data.rooms }))
+    }
+
+    function onPresence(data: { room: string, online: string[], offline: string[] }) {
+      setPresence(prev => {
+        const users = new Set(prev[data.room] || [])
+        data.online.forEach(u => users.add(u))
+        data.offline.forEach(u => users.delete(u))
+        return { ...prev, [data.room]: Array.from(users) }
+      })
+    }
+
     socket.on("connect", onConnect)
     socket.on("disconnect", onDisconnect)
+    socket.on("presence_snapshot", onPresenceSnapshot)
+    socket.on("presence", onPresence)
     socket.on("connect_error", (err) => {
       console.error("Socket connection error:", err)
       setError("Connection error. Retrying...")
@@ -154,6 +202,8 @@ export function useWorkspace() {
     return () => {
       socket.off("connect", onConnect)
       socket.off("disconnect", onDisconnect)
+      socket.off("presence_snapshot", onPresenceSnapshot)
+      socket.off("presence", onPresence)
       socket.disconnect()
     }
   }, [])
@@ -177,8 +227,45 @@ export function useWorkspace() {
 
       console.log("WS: New Message", msg) // Debug log
 
-      // If I sent it, ignore (optimistic update handles it)
-      if (msg.role === "user" && msg.sender === myEmail) return
+      const groupId = msg.group_id || activeGroupIdRef.current
+      const chatId = msg.chat_id || activeChatIdRef.current
+      noteSeq(groupId, chatId, msg.seq)
+
+      // If I sent it, keep the optimistic copy but give it the stored id
+      if (msg.role === "user" && msg.sender === myEmail) {
+        if (msg.client_id && msg.id) {
+          setGroups(prev => prev.map(group => group.id === groupId ? {
+            ...group,
+            chats: group.chats.map(chat => chat.id === chatId ? {
+              ...chat,
+              messages: chat.messages.map(m => m.id === msg.client_id ? { ...m, id: msg.id, seq: msg.seq } : m)
+            } : chat)
+          } : group))
+        }
+        return
+      }
+
+      // Final message of a streamed AI reply: replace the draft built from deltas
+      // in the chat the reply belongs to, even if the user switched chats meanwhile
+      if (msg.stream_id) {
+        setGroups((prev) =>
+          prev.map((group) =>
+            group.id === groupId
+              ? {
+                ...group,
+                chats: group.chats.map((chat) => {
+                  if (chat.id !== chatId) return chat
+                  const final = { id: msg.id || msg.stream_id, role: msg.role, content: msg.content }
+                  return chat.messages.some(m => m.id === msg.stream_id)
+                    ? { ...chat, messages: chat.messages.map(m => m.id === msg.stream_id ? final : m) }
+                    : { ...chat, messages: [...chat.messages, final] }
+                }),
+              }
+              : group
+          )
+        )
+        return
+      }
 
       setGroups((prev) =>
         prev.map((group) =>
@@ -186,7 +273,8 @@ export function useWorkspace() {
             ? {
               ...group,
               chats: group.chats.map((chat) =>
-                chat.id === activeChatIdRef.current
+                // Skip messages a sync already delivered
+                chat.id === activeChatIdRef.current && !(msg.id && chat.messages.some(m => m.id === msg.id))
                   ? {
                     ...chat,
                     messages: [
@@ -199,7 +287,8 @@ export function useWorkspace() {
                         sender_name: msg.sender_name,
                         sender_image: msg.sender_image,
                         replyTo: msg.replyTo,
-                        is_deleted: msg.is_deleted
+                        is_deleted: msg.is_deleted,
+                        seq: msg.seq
                       },
                     ],
                   }
@@ -211,8 +300,9 @@ export function useWorkspace() {
       )
     }
 
-    function onMessageDeleted(data: { id: string, type: "everyone" | "me" }) {
+    function onMessageDeleted(data: { id: string, type: "everyone" | "me", seq?: number, chat_id: string, group_id: string }) {
       console.log("WS: Message Deleted", data)
+      noteSeq(data.group_id, data.chat_id, data.seq)
       setGroups(prev => prev.map(group => ({
         ...group,
         chats: group.chats.map(chat => ({
@@ -239,12 +329,65 @@ export function useWorkspace() {
       // Actually, I'll do a quick refactor of loadHistory to use `_id` from DB as `id`.
     }
 
-    function onTyping() {
-      setIsTyping(true)
-      setTimeout(() => setIsTyping(false), 1500)
+    // Streamed AI reply: grow a draft message keyed by stream_id
+    function onAssistantDelta(data: { stream_id: string, delta: string, group_id: string, chat_id: string }) {
+      setIsTyping(false)
+      setGroups(prev => prev.map(group => group.id === data.group_id ? {
+        ...group,
+        chats: group.chats.map(chat => {
+          if (chat.id !== data.chat_id) return chat
+          return chat.messages.some(m => m.id === data.stream_id)
+            ? { ...chat, messages: chat.messages.map(m => m.id === data.stream_id ? { ...m, content: m.content + data.delta } : m) }
+            : { ...chat, messages: [...chat.messages, { id: data.stream_id, role: "assistant", content: data.delta }] }
+        })
+      } : group))
+    }
+
+    function onAssistantCancelled(data: { stream_id: string }) {
+      setGroups(prev => prev.map(group => ({
+        ...group,
+        chats: group.chats.map(chat => ({
+          ...chat,
+          messages: chat.messages.filter(m => m.id !== data.stream_id)
+        }))
+      })))
+    }
+
+    // Aggregated updates: { users, stopped, ttl_ms }. Each listed user is typing
+    // until ttl_ms from now unless a later update says they stopped.
+    // A bare {} is the AI "thinking" indicator.
+    function onTyping(data?: { users?: string[], stopped?: string[], ttl_ms?: number }) {
+      if (!data || !Array.isArray(data.users)) {
+        setIsTyping(true)
+        setTimeout(() => setIsTyping(false), 1500)
+        return
+      }
+
+      const token = localStorage.getItem("nexus_token")
+      let myEmail = ""
+      if (token) {
+        try {
+          myEmail = JSON.parse(atob(token.split('.')[1])).sub
+        } catch (e) { console.error(e) }
+      }
+
+      const now = Date.now()
+      const typers = typersRef.current
+      for (const email of data.stopped || []) typers.delete(email)
+      for (const email of data.users) {
+        if (email !== myEmail) typers.set(email, now + (data.ttl_ms || 3000))
+      }
+      const refresh = () => {
+        const t = Date.now()
+        for (const [email, until] of typers) if (until <= t) typers.delete(email)
+        setIsTyping(typers.size > 0)
+      }
+      refresh()
+      setTimeout(refresh, (data.ttl_ms || 3000) + 50)
     }
 
-    function onMessageUpdated(data: { id: string, content: string, is_edited: boolean, chat_id: string, group_id: string }) {
+    function onMessageUpdated(data: { id: string, content: string, is_edited: boolean, seq?: number, chat_id: string, group_id: string }) {
+      noteSeq(data.group_id, data.chat_id, data.seq)
       setGroups(prev => prev.map(group => group.id === data.group_id ? {
         ...group,
         chats: group.chats.map(chat => chat.id === data.chat_id ? {
@@ -255,10 +398,55 @@ export function useWorkspace() {
       } : group))
     }
 
+    // Catch-up after a reconnect: upsert everything that changed since our last seq
+    function onMessagesSynced(data: { group_id: string, chat_id: string, messages: any[], seq?: number, reset?: boolean }) {
+      if (data.reset) {
+        // Too much was missed; a full reload is cheaper
+        loadHistory(data.group_id, data.chat_id)
+        return
+      }
+      noteSeq(data.group_id, data.chat_id, data.seq)
+      setGroups(prev => prev.map(group => group.id === data.group_id ? {
+        ...group,
+        chats: group.chats.map(chat => {
+          if (chat.id !== data.chat_id) return chat
+          let messages = chat.messages
+          for (const m of data.messages) {
+            // Own messages may still carry their optimistic id
+            const matches = (x: Message) => x.id === m.id || (!!m.client_id && x.id === m.client_id)
+            if (m.deleted_for_me) {
+              messages = messages.filter(x => !matches(x))
+            } else if (messages.some(matches)) {
+              messages = messages.map(x => matches(x) ? toMessage(m) : x)
+            } else if (m.seq !== undefined && m.seq < (messages[0]?.seq ?? -1)) {
+              // Edited before the loaded page; loading older messages fetches it as it is now
+              continue
+            } else {
+              messages = [...messages, toMessage(m)]
+            }
+          }
+          return { ...chat, messages }
+        })
+      } : group))
+    }
+
+    // Hot rooms deliver message events in batches; replay them in order
+    function onEventBatch(batch: { events: { event: string, data: any }[] }) {
+      for (const { event, data } of batch.events) {
+        if (event === "new_message") onNewMessage(data)
+        else if (event === "message_updated") onMessageUpdated(data)
+        else if (event === "message_deleted") onMessageDeleted(data)
+      }
+    }
+
     socket.on("new_message", onNewMessage)
     socket.on("message_deleted", onMessageDeleted)
     socket.on("message_updated", onMessageUpdated)
+    socket.on("event_batch", onEventBatch)
+    socket.on("messages_synced", onMessagesSynced)
     socket.on("typing", onTyping)
+    socket.on("assistant_delta", onAssistantDelta)
+    socket.on("assistant_cancelled", onAssistantCancelled)
 
     // Re-join room to ensure we are subscribed to the correct channel
     // (Join logic is idempotent-ish, but let's ensure we are in the room)
@@ -267,10 +455,29 @@ export function useWorkspace() {
       chat_id: activeChatId,
     })
 
+    // Back in the same chat after a reconnect: fetch only what we missed
+    // (switching chats does a full load instead, see LOAD HISTORY)
+    const key = `${activeGroupId}:${activeChatId}`
+    const since = seqRef.current.get(key)
+    if (since !== undefined && lastJoinedRef.current === key) {
+      socket.emit("sync_messages", {
+        group_id: activeGroupId,
+        chat_id: activeChatId,
+        since,
+      })
+    }
+    lastJoinedRef.current = key
+
     return () => {
+      typersRef.current.clear()
       socket.off("new_message", onNewMessage)
       socket.off("message_deleted", onMessageDeleted)
+      socket.off("message_updated", onMessageUpdated)
+      socket.off("event_batch", onEventBatch)
+      socket.off("messages_synced", onMessagesSynced)
       socket.off("typing", onTyping)
+      socket.off("assistant_delta", onAssistantDelta)
+      socket.off("assistant_cancelled", onAssistantCancelled)
       socket.emit("leave_room", {
         group_id: activeGroupId,
         chat_id: activeChatId,
@@ -281,54 +488,77 @@ export function useWorkspace() {
   // Join Room logic is now integrated into the socket listener effect to ensure sync.
 
   // LOAD HISTORY
-  useEffect(() => {
-    if (!activeGroupId || !activeChatId) return
-
-    async function loadHistory() {
-      try {
-        const data = await fetchMessages(activeGroupId, activeChatId)
+  // Latest page of a chat (on open, or when a resume would return too much)
+  async function loadHistory(groupId: string, chatId: string) {
+    try {
+      const data = await fetchMessages(groupId, chatId, { limit: MESSAGES_PAGE_SIZE })
+      seqRef.current.set(`${groupId}:${chatId}`, 0)
+      for (const m of data) noteSeq(groupId, chatId, m.updated_seq)
+      setHasOlder(prev => ({ ...prev, [`${groupId}:${chatId}`]: data.length >= MESSAGES_PAGE_SIZE }))
 
-        setGroups((prev) =>
-          prev.map((group) =>
-            group.id === activeGroupId
-              ? {
-                ...group,
-                chats: group.chats.map((chat) =>
-                  chat.id === activeChatId
-                    ? {
-                      ...chat,
-                      messages: data.map((m: any) => ({
-                        id: m._id || m.id || crypto.randomUUID(), // Use DB ID if available
-                        role: m.role,
-                        content: m.content,
-                        sender: m.sender || m.user_id,
-                        sender_name: m.sender_name,
-                        sender_image: m.sender_image,
-                        replyTo: m.replyTo,
-                        is_deleted: m.is_deleted
-                      })),
-                    }
-                    : chat
-                ),
-              }
-              : group
-          )
+      setGroups((prev) =>
+        prev.map((group) =>
+          group.id === groupId
+            ? {
+              ...group,
+              chats: group.chats.map((chat) =>
+                chat.id === chatId
+                  ? { ...chat, messages: data.map(toMessage) }
+                  : chat
+              ),
+            }
+            : group
         )
-      } catch (err) {
-        console.error("Failed to load history", err)
-        setError("Failed to load message history")
-      }
+      )
+    } catch (err) {
+      console.error("Failed to load history", err)
+      setError("Failed to load message history")
     }
+  }
 
-    loadHistory()
+  useEffect(() => {
+    if (!activeGroupId || !activeChatId) return
+    loadHistory(activeGroupId, activeChatId)
   }, [activeGroupId, activeChatId])
 
+  // Prepend the page before the oldest loaded message of the active chat
+  async function loadOlderMessages() {
+    const groupId = activeGroupId
+    const chatId = activeChatId
+    const chat = groups.find(g => g.id === groupId)?.chats.find(c => c.id === chatId)
+    // Optimistic/streaming messages have no server id yet
+    const oldest = chat?.messages.find(m => m.seq !== undefined)
+    if (!oldest || loadingOlderRef.current) return
+
+    loadingOlderRef.current = true
+    try {
+      const data = await fetchMessages(groupId, chatId, { before: oldest.id, limit: MESSAGES_PAGE_SIZE })
+      for (const m of data) noteSeq(groupId, chatId, m.updated_seq)
+      setHasOlder(prev => ({ ...prev, [`${groupId}:${chatId}`]: data.length >= MESSAGES_PAGE_SIZE }))
+      setGroups(prev => prev.map(group => group.id === groupId ? {
+        ...group,
+        chats: group.chats.map(c => {
+          if (c.id !== chatId) return c
+          const known = new Set(c.messages.map(m => m.id))
+          const older = data.map(toMessage).filter((m: Message) => !known.has(m.id))
+          return { ...c, messages: [...older, ...c.messages] }
+        })
+      } : group))
+    } catch (err) {
+      console.error("Failed to load older messages", err)
+      setError("Failed to load older messages")
+    } finally {
+      loadingOlderRef.current = false
+    }
+  }
+
 
   // SEND MESSAGE (OPTIMISTIC)
   // SEND MESSAGE (OPTIMISTIC)
   const sendMessage = (text: string, triggerAi: boolean = false, replyTo?: Message['replyTo']) => {
     if (!text.trim()) return
 
+    const clientId = crypto.randomUUID()
     setGroups(prev =>
       prev.map(group =>
         group.id === activeGroupId
@@ -341,7 +571,7 @@ export function useWorkspace() {
                   messages: [
                     ...chat.messages,
                     {
-                      id: crypto.randomUUID(),
+                      id: clientId,
                       role: "user",
                       content: text,
                       sender: userEmail,
@@ -362,7 +592,8 @@ export function useWorkspace() {
       chat_id: activeChatId,
       content: text,
       trigger_ai: triggerAi,
-      replyTo
+      replyTo,
+      client_id: clientId
     })
   }
 
@@ -641,6 +872,10 @@ export function useWorkspace() {
     setActiveChatId,
     isTyping,
     isConnected,
+    onlineInChat: presence[`${activeGroupId}:${activeChatId}`] || [],
+    onlineInGroup: presence[`group:${activeGroupId}`] || [],
+    hasOlderMessages: !!hasOlder[`${activeGroupId}:${activeChatId}`],
+    loadOlderMessages,
     error,
     sendMessage,
     createGroup,
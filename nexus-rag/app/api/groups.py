@@ -2,7 +2,9 @@ from fastapi import APIRouter, Depends, HTTPException, Body
 from typing import List
 from pydantic import BaseModel, Field
 from app.auth.dependencies import get_current_user
-from app.core.mongo import get_db
+from app.storage import storage
+from app.services.membership import membership_index
+from app.services.message_store import message_store
 
 router = APIRouter(prefix="/api/groups", tags=["Groups"])
 
@@ -24,21 +26,12 @@ class CreateChatRequest(BaseModel):
     title: str
 
 @router.get("", response_model=List[Group])
-def get_user_groups(user=Depends(get_current_user)):
-    db = get_db()
-    
+async def get_user_groups(user=Depends(get_current_user)):
     # Fetch groups where user is the owner OR a member
     # Backward compatibility: user_id field for owner
     # New model: members list containing email
-    groups_cursor = db.groups.find({
-        "$or": [
-            {"user_id": user["email"]},
-            {"members": user["email"]}
-        ]
-    })
-    
     groups = []
-    for g in groups_cursor:
+    for g in await storage.groups.for_member(user["email"]):
         chats = g.get("chats", [])
         groups.append(Group(
             id=str(g["_id"]),
@@ -50,20 +43,14 @@ def get_user_groups(user=Depends(get_current_user)):
     
     # Synthesize "Personal" group from message history
     personal_group_id = f"personal_{user['email']}"
-    messages_col = db.messages
-    personal_chats = messages_col.aggregate([
-        {"$match": {"user_id": user["email"], "group_id": personal_group_id}},
-        {"$group": {"_id": "$chat_id"}},
-    ])
+    found_chats = await message_store.chat_ids(personal_group_id, user["email"])
     
     p_chats = []
     # If no chats found, default to 'general' so it matches frontend default
-    found_chats = list(personal_chats)
     if not found_chats:
          p_chats.append(Chat(id="general", title="General"))
     else:
-         for c in found_chats:
-             cid = c["_id"]
+         for cid in found_chats:
              title = "General" if cid == "general" else f"Chat {cid[:4]}"
              p_chats.append(Chat(id=cid, title=title))
              
@@ -79,12 +66,10 @@ def get_user_groups(user=Depends(get_current_user)):
     return groups
 
 @router.post("", response_model=Group)
-def create_group(
+async def create_group(
     request: CreateGroupRequest,
     user=Depends(get_current_user)
 ):
-    db = get_db()
-    
     new_group = {
         "user_id": user["email"],
         "name": request.name,
@@ -92,19 +77,17 @@ def create_group(
         "chats": []
     }
     
-    result = db.groups.insert_one(new_group)
+    group_oid = await storage.groups.insert(new_group)
     
     # Add a default chat?
     default_chat_id = "general"
     default_chat = {"id": default_chat_id, "title": "General"}
     
-    db.groups.update_one(
-        {"_id": result.inserted_id},
-        {"$push": {"chats": default_chat}}
-    )
+    await storage.groups.add_chat(group_oid, default_chat)
+    membership_index.add_group(str(group_oid), user["email"], [user["email"]], [default_chat_id])
     
     return Group(
-        id=str(result.inserted_id),
+        id=str(group_oid),
         name=request.name,
         user_id=user["email"],
         members=[user["email"]],
@@ -112,13 +95,12 @@ def create_group(
     )
 
 @router.delete("/{group_id}")
-def delete_group(
+async def delete_group(
     group_id: str,
     user=Depends(get_current_user)
 ):
     import bson
     from bson.errors import InvalidId
-    db = get_db()
 
     # Cannot delete Personal Group Root (it's virtual/persistent)
     if group_id.startswith("personal_"):
@@ -127,7 +109,7 @@ def delete_group(
     try:
         oid = bson.ObjectId(group_id)
         # Check ownership
-        group = db.groups.find_one({"_id": oid})
+        group = await storage.groups.get(oid)
         if not group:
             raise HTTPException(status_code=404, detail="Group not found")
         
@@ -135,10 +117,11 @@ def delete_group(
              raise HTTPException(status_code=403, detail="Only the owner can delete this group")
 
         # Delete Group
-        db.groups.delete_one({"_id": oid})
+        await storage.groups.delete(oid)
+        membership_index.remove_group(group_id)
         
         # Delete associated messages
-        db.messages.delete_many({"group_id": group_id})
+        await message_store.delete(group_id)
         
         return {"status": "deleted", "group_id": group_id}
 
@@ -146,19 +129,18 @@ def delete_group(
         raise HTTPException(status_code=400, detail="Invalid Group ID")
 
 @router.post("/{group_id}/chats", response_model=Chat)
-def create_chat(
+async def create_chat(
     group_id: str,
     request: CreateChatRequest,
     user=Depends(get_current_user)
 ):
     import bson
     from bson.errors import InvalidId
-    db = get_db()
     
     # Logic for Personal Group
     personal_group_id = f"personal_{user['email']}"
     if group_id == personal_group_id:
-        personal_group = db.groups.find_one({"user_id": user["email"], "is_personal": True})
+        personal_group = await storage.groups.get_personal(user["email"])
         
         if not personal_group:
             new_group = {
@@ -168,8 +150,7 @@ def create_chat(
                 "chats": [],
                 "members": [user["email"]]
             }
-            result = db.groups.insert_one(new_group)
-            oid = result.inserted_id
+            oid = await storage.groups.insert(new_group)
         else:
             oid = personal_group["_id"]
             
@@ -180,14 +161,8 @@ def create_chat(
         except InvalidId:
             raise HTTPException(status_code=400, detail="Invalid Group ID")
             
-        group = db.groups.find_one({
-            "_id": oid, 
-            "$or": [
-                {"user_id": user["email"]},
-                {"members": user["email"]}
-            ]
-        })
-        if not group:
+        group = await storage.groups.get(oid)
+        if not group or (user["email"] != group.get("user_id") and user["email"] not in group.get("members", [])):
              raise HTTPException(status_code=404, detail="Group not found or access denied")
 
     # Common: Create and Push Chat
@@ -197,22 +172,19 @@ def create_chat(
         "title": request.title
     }
     
-    db.groups.update_one(
-        {"_id": oid},
-        {"$push": {"chats": new_chat}}
-    )
+    await storage.groups.add_chat(oid, new_chat)
+    membership_index.add_chat(group_id, new_chat_id)
     
     return Chat(id=new_chat_id, title=request.title)
 
 @router.delete("/{group_id}/chats/{chat_id}")
-def delete_chat(
+async def delete_chat(
     group_id: str,
     chat_id: str,
     user=Depends(get_current_user)
 ):
     import bson
     from bson.errors import InvalidId
-    db = get_db()
     
     personal_group_id = f"personal_{user['email']}"
     
@@ -223,15 +195,12 @@ def delete_chat(
         # So we should remove it from there too if it exists.)
         
         # 1. Delete messages
-        db.messages.delete_many({"group_id": group_id, "chat_id": chat_id})
+        await message_store.delete(group_id, chat_id)
         
         # 2. Try to pull from Personal Group doc if it exists
-        personal_group = db.groups.find_one({"user_id": user["email"], "is_personal": True})
+        personal_group = await storage.groups.get_personal(user["email"])
         if personal_group:
-             db.groups.update_one(
-                {"_id": personal_group["_id"]},
-                {"$pull": {"chats": {"id": chat_id}}}
-            )
+             await storage.groups.remove_chat(personal_group["_id"], chat_id)
         
         return {"status": "deleted", "chat_id": chat_id}
 
@@ -239,7 +208,7 @@ def delete_chat(
         # Regular Group
         try:
             oid = bson.ObjectId(group_id)
-            group = db.groups.find_one({"_id": oid})
+            group = await storage.groups.get(oid)
             if not group:
                 raise HTTPException(status_code=404, detail="Group not found")
             
@@ -250,13 +219,11 @@ def delete_chat(
                  raise HTTPException(status_code=403, detail="Only the group owner can delete chats")
 
             # 1. Pull from chats array
-            db.groups.update_one(
-                {"_id": oid},
-                {"$pull": {"chats": {"id": chat_id}}}
-            )
+            await storage.groups.remove_chat(oid, chat_id)
+            membership_index.remove_chat(group_id, chat_id)
             
             # 2. Delete messages
-            db.messages.delete_many({"group_id": group_id, "chat_id": chat_id})
+            await message_store.delete(group_id, chat_id)
 
             return {"status": "deleted", "chat_id": chat_id}
 
@@ -265,27 +232,24 @@ def delete_chat(
 
 
 @router.post("/join")
-def join_group(
+async def join_group(
     group_id: str = Body(..., embed=True),
     user=Depends(get_current_user)
 ):
     import bson
     from bson.errors import InvalidId
-    db = get_db()
     
     try:
         oid = bson.ObjectId(group_id)
-        group = db.groups.find_one({"_id": oid})
+        group = await storage.groups.get(oid)
         
         if not group:
             raise HTTPException(status_code=404, detail="Group not found")
             
         # Add user to members if not already present
         if user["email"] not in group.get("members", []):
-            db.groups.update_one(
-                {"_id": oid},
-                {"$addToSet": {"members": user["email"]}}
-            )
+            await storage.groups.add_member(oid, user["email"])
+        membership_index.add_member(group_id, user["email"])
             
         return {"status": "joined", "group_id": group_id, "name": group["name"]}
 
@@ -293,17 +257,16 @@ def join_group(
         raise HTTPException(status_code=400, detail="Invalid Group ID")
 
 @router.post("/{group_id}/leave")
-def leave_group(
+async def leave_group(
     group_id: str,
     user=Depends(get_current_user)
 ):
     import bson
     from bson.errors import InvalidId
-    db = get_db()
     
     try:
         oid = bson.ObjectId(group_id)
-        group = db.groups.find_one({"_id": oid})
+        group = await storage.groups.get(oid)
         
         if not group:
             raise HTTPException(status_code=404, detail="Group not found")
@@ -316,12 +279,10 @@ def leave_group(
              raise HTTPException(status_code=400, detail="Owner cannot leave the group. Delete the group instead.")
         
         # Remove user from members
-        result = db.groups.update_one(
-            {"_id": oid},
-            {"$pull": {"members": user["email"]}}
-        )
+        removed = await storage.groups.remove_member(oid, user["email"])
+        membership_index.remove_member(group_id, user["email"])
         
-        if result.modified_count == 0:
+        if not removed:
              # Either user wasn't in members or group doesn't exist (handled above)
              pass
              
@@ -331,18 +292,17 @@ def leave_group(
         raise HTTPException(status_code=400, detail="Invalid Group ID")
 
 @router.delete("/{group_id}/members/{email}")
-def remove_member(
+async def remove_member(
     group_id: str,
     email: str,
     user=Depends(get_current_user)
 ):
     import bson
     from bson.errors import InvalidId
-    db = get_db()
     
     try:
         oid = bson.ObjectId(group_id)
-        group = db.groups.find_one({"_id": oid})
+        group = await storage.groups.get(oid)
         
         if not group:
             raise HTTPException(status_code=404, detail="Group not found")
@@ -356,12 +316,44 @@ def remove_member(
              raise HTTPException(status_code=400, detail="Owner cannot be removed. Transfer ownership or delete group.")
              
         # Remove the specific member
-        db.groups.update_one(
-            {"_id": oid},
-            {"$pull": {"members": email}}
-        )
+        await storage.groups.remove_member(oid, email)
+        membership_index.remove_member(group_id, email)
         
         return {"status": "removed", "member": email, "group_id": group_id}
 
     except InvalidId:
         raise HTTPException(status_code=400, detail="Invalid Group ID")
+
+@router.get("/{group_id}/presence")
+async def get_group_presence(
+    group_id: str,
+    user=Depends(get_current_user)
+):
+    """Online members of the group and online counts per chat"""
+    import bson
+    from bson.errors import InvalidId
+    from app.socketio import presence
+    from app.services.presence import group_room
+
+    try:
+        oid = bson.ObjectId(group_id)
+    except InvalidId:
+        raise HTTPException(status_code=400, detail="Invalid Group ID")
+
+    group = await storage.groups.get(oid, {"user_id": 1, "members": 1, "chats.id": 1})
+    if not group:
+        raise HTTPException(status_code=404, detail="Group not found")
+
+    if user["email"] != group.get("user_id") and user["email"] not in group.get("members", []):
+        raise HTTPException(status_code=403, detail="Not a member of this group")
+
+    chat_rooms = {chat["id"]: f"{group_id}:{chat['id']}" for chat in group.get("chats", []) if chat.get("id")}
+    counts = await presence.counts(chat_rooms.values())
+    online = await presence.members(group_room(group_id))
+
+    return {
+        "group_id": group_id,
+        "online": online,
+        "count": len(online),
+        "chats": {chat_id: counts[room] for chat_id, room in chat_rooms.items()},
+    }
@@ -1,37 +1,33 @@
+import logging
 from fastapi import APIRouter
-from app.embeddings.embedder import embed_text
+from app.embeddings.batcher import embedding_batcher
 from app.vectorstore.store import vector_store
 
 router = APIRouter()
+logger = logging.getLogger(__name__)
 
 @router.post("/ingest")
-def ingest_text(room_id: str, text: str):
+async def ingest_text(room_id: str, text: str):
     # MOVED INSIDE: Calculate embedding for the specific text received in this request
-    embedding = embed_text(text)
+    embedding = await embedding_batcher.embed(text)
 
-    existing_docs = vector_store.search(query_vector=embedding, limit=1)
+    existing_docs = await vector_store.search(query_vector=embedding, limit=1)
 
     if existing_docs:
         top_match = existing_docs[0]
-        print(f"DEBUG: Top match keys are: {top_match.keys()}")
-        print(f"DEBUG: Top match data: {top_match}")
+        logger.debug(f"Top match: {top_match}")
 
         if top_match['score'] > 0.95:
              found_text = top_match.get('text', top_match.get('content', 'UNKNOWN'))
-             print(f"Duplicate detected: '{text}' is too similar to '{found_text}'")
+             logger.info(f"Duplicate detected: '{text}' is too similar to '{found_text}'")
              return {"status": "ignored", "reason": "Duplicate content exists"}
 
-    doc = {
-        "room_id": room_id,
-        "text": text,
-        "embedding": embedding,
-    }
-    
-    vector_store.store_message(
-        group_id=room_id, 
-        chat_id="default", 
+    await vector_store.store_message(
+        group_id=room_id,
+        chat_id="default",
         content=text,
-        role="user"
+        role="user",
+        embedding=embedding,
     )
-    
-    return {"status": "stored"}
\ No newline at end of file
+
+    return {"status": "stored"}
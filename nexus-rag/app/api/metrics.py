@@ -0,0 +1,63 @@
+from fastapi import APIRouter, Depends, Header, HTTPException
+from typing import Optional
+from app.core.config import METRICS_TOKEN, DEBUG
+from app.services.profile_cache import profile_cache
+from app.services.membership import membership_index
+from app.services.history_buffer import room_history
+from app.services.message_log import message_log
+from app.services.archiver import archiver
+from app.vectorstore.ingestion import ingestion_pipeline
+from app.embeddings.batcher import embedding_batcher
+from app.embeddings.cache import embedding_cache
+from app.core.rate_limit import flood_control
+from app.core import logging as log_pipeline
+from app.core.db_monitor import command_monitor
+from app.core.read_profiles import describe as read_profiles
+from app.storage import storage
+from app.socketio import typing_aggregator, room_emitter, ai_scheduler, presence
+
+router = APIRouter(prefix="/internal/metrics", tags=["Internal"])
+
+
+def require_metrics_access(x_metrics_token: Optional[str] = Header(default=None)):
+    """Allow access with the configured METRICS_TOKEN, or freely in DEBUG mode when no token is set."""
+    if METRICS_TOKEN:
+        if x_metrics_token != METRICS_TOKEN:
+            raise HTTPException(status_code=403, detail="Invalid metrics token")
+    elif not DEBUG:
+        raise HTTPException(status_code=404, detail="Not Found")
+
+
+@router.get("", dependencies=[Depends(require_metrics_access)])
+def get_metrics():
+    """In-process counters for this worker"""
+    return {
+        "ingestion": ingestion_pipeline.stats(),
+        "embeddings": embedding_batcher.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "profile_cache": profile_cache.stats(),
+        "membership_index": membership_index.stats(),
+        "history_buffer": room_history.stats(),
+        "message_sync": message_log.stats(),
+        "typing": typing_aggregator.stats(),
+        "emit_batching": room_emitter.stats(),
+        "ai_scheduler": ai_scheduler.stats(),
+        "presence": presence.stats(),
+        "flood_control": flood_control.stats(),
+        "logging": log_pipeline.stats(),
+        "mongo": command_monitor.stats(),
+        "archive": archiver.stats(),
+        "storage": storage.stats(),
+    }
+
+
+@router.get("/mongo", dependencies=[Depends(require_metrics_access)])
+def get_mongo_metrics():
+    """Mongo command latency per collection/command, commands per server, read profiles and recent slow queries"""
+    return {**command_monitor.report(), "read_profiles": read_profiles()}
+
+
+@router.get("/archive", dependencies=[Depends(require_metrics_access)])
+async def get_archive_metrics():
+    """Archiver counters, and data/index size of the hot collections and the archive"""
+    return {**archiver.stats(), "sizes": await archiver.tier_sizes()}
@@ -2,11 +2,12 @@ from fastapi import APIRouter, HTTPException, Depends
 from pydantic import BaseModel, Field
 from typing import List, Optional
 from app.auth.dependencies import get_current_user
-from app.core.mongo import get_message_collection
+from app.services.message_log import message_log
 from datetime import datetime
 from app.rag.retriever import retrieve_context
 from app.generator.prompt import build_prompt
 from app.generator.service import generate_answer
+from app.services.history_buffer import room_history
 
 router = APIRouter()
 class ChatMessage(BaseModel):
@@ -41,8 +42,7 @@ async def query_rag(
     user=Depends(get_current_user)
 ):
     try:
-        messages = get_message_collection()
-        messages.insert_one({
+        await message_log.insert({
             "user_id": user["email"], 
             "group_id": request.group_id,
             "chat_id": request.chat_id,
@@ -52,13 +52,15 @@ async def query_rag(
         })
 
         from app.services.chat_service import process_chat_message
-        answer, documents = await process_chat_message(
+        answer, documents, _, _ = await process_chat_message(
             user_query=request.query,
             group_id=request.group_id,
             chat_id=request.chat_id,
             user_email=user["email"],
             history=request.history
         )
+        # Written outside the socket handlers; reload the room's buffer on next use
+        room_history.invalidate(f"{request.group_id}:{request.chat_id}")
 
         return {
             "answer": answer,
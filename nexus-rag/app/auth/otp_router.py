@@ -2,8 +2,9 @@ from fastapi import APIRouter, HTTPException, Body
 from pydantic import BaseModel, EmailStr
 from app.auth.otp_service import create_otp, verify_otp
 from app.auth.otp_utils import validate_email_address
-from app.core.mongo import get_db
+from app.storage import storage
 from app.auth.service import hash_password, create_access_token
+from starlette.concurrency import run_in_threadpool
 import logging
 
 router = APIRouter(prefix="/auth", tags=["OTP Auth"])
@@ -28,24 +29,23 @@ class ResetPasswordWithTokenRequest(BaseModel):
 
 # 1. Register OTP
 @router.post("/request-register-otp")
-def request_register_otp(data: OTPRequest):
+async def request_register_otp(data: OTPRequest):
     # Validate Email Deliverability first
     try:
-        validate_email_address(data.email)
+        await run_in_threadpool(validate_email_address, data.email)  # DNS lookup
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Invalid email: {str(e)}")
 
     # Check database for existing user
-    db = get_db()
-    if db.users.find_one({"email": data.email}):
+    if await storage.users.get_by_email(data.email):
         raise HTTPException(status_code=400, detail="Email already registered")
         
-    create_otp(data.email, "register")
+    await create_otp(data.email, "register")
     return {"message": "OTP sent to email"}
 
 @router.post("/verify-register-otp")
-def verify_register_otp(data: OTPVerifyRequest):
-    if verify_otp(data.email, data.otp, "register"):
+async def verify_register_otp(data: OTPVerifyRequest):
+    if await verify_otp(data.email, data.otp, "register"):
         # Return a simple success message. 
         # The client can now proceed to /auth/signup.
         # NOTE: Ideally we return a signed token "register_token" that /auth/signup requires
@@ -57,15 +57,14 @@ def verify_register_otp(data: OTPVerifyRequest):
 
 # 2. Reset OTP
 @router.post("/request-reset-otp")
-def request_reset_otp(data: OTPRequest):
+async def request_reset_otp(data: OTPRequest):
     # Validate Email Deliverability
     try:
-        validate_email_address(data.email)
+        await run_in_threadpool(validate_email_address, data.email)  # DNS lookup
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Invalid email: {str(e)}")
 
-    db = get_db()
-    user = db.users.find_one({"email": data.email})
+    user = await storage.users.get_by_email(data.email)
     if not user:
         # Don't reveal if user exists? Or just 404? 
         # For UX, 404 is clearer but less secure. Let's use generic message or 404 if safe.
@@ -73,13 +72,13 @@ def request_reset_otp(data: OTPRequest):
         # Let's say "If user exists, OTP sent".
         raise HTTPException(status_code=404, detail="User not found")
         
-    create_otp(data.email, "reset")
+    await create_otp(data.email, "reset")
     return {"message": "OTP sent to email"}
 
 @router.post("/verify-reset-otp")
-def verify_reset_otp(data: OTPVerifyRequest):
+async def verify_reset_otp(data: OTPVerifyRequest):
     # Consumes OTP, returns token
-    if verify_otp(data.email, data.otp, "reset"):
+    if await verify_otp(data.email, data.otp, "reset"):
         from datetime import timedelta
         # Create token valid for 5 minutes
         token = create_access_token(
@@ -89,7 +88,7 @@ def verify_reset_otp(data: OTPVerifyRequest):
         return {"message": "OTP Verified", "reset_token": token}
 
 @router.post("/reset-password")
-def reset_password(
+async def reset_password(
     data: ResetPasswordWithTokenRequest
 ):
     try:
@@ -102,15 +101,11 @@ def reset_password(
             raise HTTPException(status_code=401, detail="Invalid token scope")
             
         # Perform Password Reset
-        db = get_db()
-        hashed_pw = hash_password(data.new_password)
+        hashed_pw = await run_in_threadpool(hash_password, data.new_password)
         
-        result = db.users.update_one(
-            {"email": email},
-            {"$set": {"password_hash": hashed_pw}}
-        )
+        matched = await storage.users.update_by_email(email, {"password_hash": hashed_pw})
         
-        if result.matched_count == 0:
+        if not matched:
             raise HTTPException(status_code=404, detail="User not found")
             
         return {"message": "Password reset successfully"}
@@ -1,29 +1,27 @@
 from datetime import datetime, timedelta, timezone
+from starlette.concurrency import run_in_threadpool
 from app.core.mongo import get_db
+from app.storage import storage
+from app.storage.mongo import OTP_COLLECTION
 from app.auth.otp_utils import generate_otp, hash_otp, send_email, verify_otp_hash
 from fastapi import HTTPException
 import logging
 
 logger = logging.getLogger(__name__)
 
-OTP_COLLECTION = "otps"
 OTP_EXPIRY_MINUTES = 10
 MAX_ATTEMPTS = 3
 
-def create_otp(email: str, purpose: str):
+async def create_otp(email: str, purpose: str):
     """
     Generate, hash, and save an OTP for the given email and purpose.
     Sends the OTP via email.
     """
-    db = get_db()
-    
     email = email.lower().strip()
     
     # Check rate limit/existing valid OTP? 
     # For now, just overwrite or allow multiple? 
-    # Better to delete existing for this email+purpose to avoid clutter
-    db[OTP_COLLECTION].delete_many({"email": email, "purpose": purpose})
-    
+    # Better to delete existing for this email+purpose to avoid clutter (replace() does)
     otp = generate_otp()
     hashed = hash_otp(otp)
     expires_at = datetime.now(timezone.utc) + timedelta(minutes=OTP_EXPIRY_MINUTES)
@@ -37,29 +35,29 @@ def create_otp(email: str, purpose: str):
         "created_at": datetime.now(timezone.utc)
     }
     
-    db[OTP_COLLECTION].insert_one(otp_doc)
+    await storage.otps.replace(otp_doc)
     
     # Send Email
     subject = f"Your Verification Code for {purpose.title()} - Nexus Chat"
     body = f"Your verification code is: {otp}\n\nIt expires in {OTP_EXPIRY_MINUTES} minutes.\n\nIf you did not request this, please ignore."
     
     try:
-        send_email(email, subject, body)
+        # SMTP is blocking
+        await run_in_threadpool(send_email, email, subject, body)
     except Exception as e:
         # If email fails, delete the OTP so user can try again
-        db[OTP_COLLECTION].delete_one({"email": email, "purpose": purpose})
+        await storage.otps.clear(email, purpose)
         raise HTTPException(status_code=500, detail="Failed to send email. Please try again.")
     
     return True
 
-def verify_otp(email: str, otp: str, purpose: str):
+async def verify_otp(email: str, otp: str, purpose: str):
     """
     Verify the provided OTP.
     Returns True if valid, raises HTTPException otherwise.
     """
-    db = get_db()
     email = email.lower().strip()
-    record = db[OTP_COLLECTION].find_one({"email": email, "purpose": purpose})
+    record = await storage.otps.get(email, purpose)
     
     if not record:
         logger.warning(f"Verify OTP failed for {email}: No record found")
@@ -67,25 +65,22 @@ def verify_otp(email: str, otp: str, purpose: str):
         
     if record["attempts"] >= MAX_ATTEMPTS:
         logger.warning(f"Verify OTP failed for {email}: Max attempts reached")
-        db[OTP_COLLECTION].delete_one({"_id": record["_id"]})
+        await storage.otps.delete(record["_id"])
         raise HTTPException(status_code=400, detail="Too many failed attempts. Request a new OTP.")
         
     if datetime.now(timezone.utc) > record["expires_at"].replace(tzinfo=timezone.utc):
         logger.warning(f"Verify OTP failed for {email}: Expired")
-        db[OTP_COLLECTION].delete_one({"_id": record["_id"]})
+        await storage.otps.delete(record["_id"])
         raise HTTPException(status_code=400, detail="OTP has expired.")
         
     if not verify_otp_hash(otp.strip(), record["otp_hash"]):
         logger.warning(f"Verify OTP failed for {email}: Hash mismatch")
         # Increment attempts
-        db[OTP_COLLECTION].update_one(
-            {"_id": record["_id"]},
-            {"$inc": {"attempts": 1}}
-        )
+        await storage.otps.add_attempt(record["_id"])
         raise HTTPException(status_code=400, detail="Invalid OTP")
         
     # Success: Delete OTP
-    db[OTP_COLLECTION].delete_one({"_id": record["_id"]})
+    await storage.otps.delete(record["_id"])
     return True
 
 def ensure_otp_indexes():
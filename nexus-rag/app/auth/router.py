@@ -1,10 +1,12 @@
 from fastapi import APIRouter, HTTPException, Depends, UploadFile, File, Request
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel, EmailStr
 from app.auth.service import hash_password, verify_password, create_access_token
-from app.core.mongo import get_db
+from app.storage import storage
 from app.auth.dependencies import get_current_user
 from app.auth.oauth import oauth
+from app.socketio import push_profile_update
 from app.core.config import ALLOWED_ORIGINS
 import random
 import string
@@ -30,17 +32,16 @@ class LoginRequest(BaseModel):
 
 
 @router.post("/signup")
-def signup(data: SignupRequest):
-    db = get_db()
-    users = db.users
+async def signup(data: SignupRequest):
+    users = storage.users
 
-    if users.find_one({"email": data.email}):
+    if await users.get_by_email(data.email):
         raise HTTPException(status_code=400, detail="User already exists")
 
     final_username = data.username
 
     if final_username:
-        if users.find_one({"username": final_username}):
+        if await users.get_by_username(final_username):
             raise HTTPException(status_code=400, detail="Username already exists")
     else:
         # Auto-generate username
@@ -48,14 +49,16 @@ def signup(data: SignupRequest):
         final_username = base_username
         
         # Check for collision and append random suffix if needed
-        while users.find_one({"username": final_username}):
+        while await users.get_by_username(final_username):
             suffix = ''.join(random.choices(string.digits, k=4))
             final_username = f"{base_username}{suffix}"
 
-    users.insert_one({
+    # bcrypt is slow on purpose; keep it off the event loop
+    password_hash = await run_in_threadpool(hash_password, hashlib.sha256(data.password.encode()).hexdigest())
+    await users.insert({
         "username": final_username,
         "email": data.email,
-        "password_hash": hash_password(hashlib.sha256(data.password.encode()).hexdigest()),
+        "password_hash": password_hash,
     })
 
     token = create_access_token({"sub": data.email, "username": final_username})
@@ -63,19 +66,11 @@ def signup(data: SignupRequest):
 
 
 @router.post("/login")
-def login(data: LoginRequest):
-    db = get_db()
-    users = db.users
-
+async def login(data: LoginRequest):
     # Find user by email OR username
-    user = users.find_one({
-        "$or": [
-            {"email": data.identifier},
-            {"username": data.identifier}
-        ]
-    })
+    user = await storage.users.get_by_login(data.identifier)
 
-    if not user or not verify_password(data.password, user["password_hash"]):
+    if not user or not await run_in_threadpool(verify_password, data.password, user["password_hash"]):
         raise HTTPException(status_code=401, detail="Invalid credentials")
 
     username = user.get("username", user["email"].split("@")[0])
@@ -92,19 +87,18 @@ class ProfileUpdateRequest(BaseModel):
 
 
 @router.put("/profile")
-def update_profile(data: ProfileUpdateRequest, current_user: dict = Depends(get_current_user)):
-    db = get_db()
-    users = db.users
+async def update_profile(data: ProfileUpdateRequest, current_user: dict = Depends(get_current_user)):
+    users = storage.users
     
     update_fields = {}
     
     if data.email and data.email != current_user["email"]:
-        if users.find_one({"email": data.email}):
+        if await users.get_by_email(data.email):
             raise HTTPException(status_code=400, detail="Email already in use")
         update_fields["email"] = data.email
         
     if data.username and data.username != current_user.get("username"):
-        if users.find_one({"username": data.username}):
+        if await users.get_by_username(data.username):
             raise HTTPException(status_code=400, detail="Username already taken")
         update_fields["username"] = data.username
 
@@ -120,7 +114,10 @@ def update_profile(data: ProfileUpdateRequest, current_user: dict = Depends(get_
     if not update_fields:
         return {"message": "No changes made"}
         
-    users.update_one({"_id": current_user["_id"]}, {"$set": update_fields})
+    await users.update(current_user["_id"], update_fields)
+
+    # Live sockets keep the old email as identity until they reconnect
+    await push_profile_update(current_user["email"], update_fields)
     
     # Generate new token with updated info
     new_email = update_fields.get("email", current_user["email"])
@@ -189,12 +186,10 @@ async def upload_avatar(
     avatar_url = f"/static/avatars/{filename}"
     
     # Update DB
-    db = get_db()
-    result = db.users.update_one(
-        {"_id": current_user["_id"]},
-        {"$set": {"profile_image": avatar_url}}
-    )
-    logger.info(f"DB Update Result - Matched: {result.matched_count}, Modified: {result.modified_count} for URL: {avatar_url}")
+    matched = await storage.users.update(current_user["_id"], {"profile_image": avatar_url})
+    logger.info(f"DB Update Result - Matched: {matched} for URL: {avatar_url}")
+
+    await push_profile_update(current_user["email"], {"profile_image": avatar_url})
     
     return {"message": "Avatar uploaded successfully", "profile_image": avatar_url}
 
@@ -231,10 +226,9 @@ async def oauth_callback(provider: str, request: Request):
     if not email:
          raise HTTPException(status_code=400, detail="Email not provided by provider")
          
-    db = get_db()
-    users = db.users
+    users = storage.users
     
-    user = users.find_one({"email": email})
+    user = await users.get_by_email(email)
     
     if not user:
         # Create new user
@@ -243,28 +237,29 @@ async def oauth_callback(provider: str, request: Request):
         final_username = base_username
         
         # Handle collision
-        while users.find_one({"username": final_username}):
+        while await users.get_by_username(final_username):
             suffix = ''.join(random.choices(string.digits, k=4))
             final_username = f"{base_username}{suffix}"
             
         # Create user with random password (they can't login with password unless they reset it)
         # We assume email is verified since it comes from Google
+        random_password = ''.join(random.choices(string.ascii_letters + string.digits, k=32))
         new_user = {
             "username": final_username,
             "email": email,
             "full_name": name,
             "profile_image": picture,
-            "password_hash": hash_password(''.join(random.choices(string.ascii_letters + string.digits, k=32))),
+            "password_hash": await run_in_threadpool(hash_password, random_password),
             "auth_provider": provider
         }
-        users.insert_one(new_user)
+        await users.insert(new_user)
         user = new_user
     else:
         # Update profile picture if not set locally
         if picture and not user.get("profile_image"):
-             users.update_one({"_id": user["_id"]}, {"$set": {"profile_image": picture}})
+             await users.update(user["_id"], {"profile_image": picture})
         # Update provider info
-        users.update_one({"_id": user["_id"]}, {"$set": {"auth_provider": provider}})
+        await users.update(user["_id"], {"auth_provider": provider})
 
     # Generate JWT
     username = user.get("username", user["email"].split("@")[0])
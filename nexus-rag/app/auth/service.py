@@ -16,18 +16,11 @@ pwd_context = CryptContext(
 # -------------------------------------------------------------------
 
 def normalize_password(password: str) -> str:
-    # Debug print
-    print(f"DEBUG: normalizing password of len {len(password)}")
-    hashed = hashlib.sha256(password.encode("utf-8")).hexdigest()
-    print(f"DEBUG: normalized to {hashed}")
-    return hashed
+    return hashlib.sha256(password.encode("utf-8")).hexdigest()
 
 def hash_password(password: str) -> str:
     """Hash a password securely."""
-    print(f"DEBUG: hash_password called for len {len(password)}")
-    norm = normalize_password(password)
-    print(f"DEBUG: passing {norm} to pwd_context")
-    return pwd_context.hash(norm)
+    return pwd_context.hash(normalize_password(password))
 
 
 def verify_password(plain: str, hashed: str) -> bool:
@@ -0,0 +1,138 @@
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.errors import ConnectionFailure, ServerSelectionTimeoutError
+import logging
+from typing import Optional
+
+from app.core.config import (
+    MONGO_URI,
+    MONGO_DB_NAME,
+    VECTOR_COLLECTION_NAME,
+    MESSAGE_BUCKET_COLLECTION_NAME,
+    ARCHIVE_COLLECTION_NAME,
+    MONGO_MAX_POOL_SIZE,
+    MONGO_MIN_POOL_SIZE,
+    MONGO_SERVER_SELECTION_TIMEOUT_MS,
+)
+from app.core.db_monitor import command_monitor
+
+logger = logging.getLogger(__name__)
+
+# Async client used from inside the event loop (Socket.IO handlers, async routers).
+# The synchronous client in app.core.mongo stays for scripts, index creation and
+# code that already runs in a worker thread.
+_client: Optional[AsyncIOMotorClient] = None
+_db = None
+
+
+async def initialize_async_database():
+    """
+    Initialize the async MongoDB client.
+    Should be called on application startup, after initialize_database().
+    """
+    global _client, _db
+
+    if _client is not None:
+        logger.warning("Async database already initialized")
+        return
+
+    try:
+        logger.info("Initializing async MongoDB connection...")
+        _client = AsyncIOMotorClient(
+            MONGO_URI,
+            maxPoolSize=MONGO_MAX_POOL_SIZE,
+            minPoolSize=MONGO_MIN_POOL_SIZE,
+            serverSelectionTimeoutMS=MONGO_SERVER_SELECTION_TIMEOUT_MS,
+            retryWrites=True,
+            retryReads=True,
+            connectTimeoutMS=10000,
+            socketTimeoutMS=30000,
+            event_listeners=command_monitor.event_listeners(),
+        )
+
+        # Verify connection
+        await _client.admin.command('ping')
+        _db = _client[MONGO_DB_NAME]
+
+        logger.info(f"Async MongoDB connected successfully to database: {MONGO_DB_NAME}")
+
+    except (ConnectionFailure, ServerSelectionTimeoutError) as e:
+        logger.error(f"Failed to connect async MongoDB client: {e}")
+        _client = None
+        raise RuntimeError(f"Could not connect to MongoDB: {e}")
+    except Exception as e:
+        logger.error(f"Unexpected error during async MongoDB initialization: {e}")
+        _client = None
+        raise
+
+
+def close_async_database():
+    """
+    Close the async MongoDB client.
+    Should be called on application shutdown.
+    """
+    global _client, _db
+
+    if _client is not None:
+        logger.info("Closing async MongoDB connection...")
+        _client.close()
+        _client = None
+        _db = None
+        logger.info("Async MongoDB connection closed")
+
+
+async def check_async_health() -> bool:
+    """
+    Check if the async database connection is healthy.
+    Returns True if healthy, False otherwise.
+    """
+    try:
+        if _client is None:
+            return False
+        await _client.admin.command('ping')
+        return True
+    except Exception as e:
+        logger.error(f"Async database health check failed: {e}")
+        return False
+
+
+def get_async_db():
+    """Get async database instance"""
+    if _db is None:
+        raise RuntimeError("Async database not initialized. Call initialize_async_database() first.")
+    return _db
+
+
+def get_async_vector_collection():
+    """Get async vector collection instance"""
+    db = get_async_db()
+    return db[VECTOR_COLLECTION_NAME]
+
+
+def get_async_message_collection():
+    """Get async messages collection instance"""
+    db = get_async_db()
+    return db["messages"]
+
+
+def get_async_message_bucket_collection():
+    """Get async message bucket collection instance (MESSAGE_STORAGE=buckets)"""
+    db = get_async_db()
+    return db[MESSAGE_BUCKET_COLLECTION_NAME]
+
+
+def get_async_archive_collection():
+    """Get async message archive collection instance (cold tier)"""
+    db = get_async_db()
+    return db[ARCHIVE_COLLECTION_NAME]
+
+
+def get_async_users_collection():
+    """Get async users collection instance"""
+    db = get_async_db()
+    return db["users"]
+
+
+def get_async_groups_collection():
+    """Get async groups collection instance"""
+    db = get_async_db()
+    return db["groups"]
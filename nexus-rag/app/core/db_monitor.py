@@ -0,0 +1,321 @@
+import bisect
+import logging
+import queue
+import threading
+import time
+from collections import deque
+from datetime import datetime, timezone
+from typing import Optional
+
+from pymongo import monitoring
+
+from app.core.config import (
+    MONGO_MONITORING_ENABLED,
+    MONGO_SLOW_QUERY_MS,
+    MONGO_EXPLAIN_SLOW_QUERIES,
+    MONGO_EXPLAIN_COOLDOWN_SECONDS,
+    MONGO_SLOW_QUERY_LOG_SIZE,
+)
+from app.core.logging import log_event
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds (ms) of the latency histogram buckets; the last bucket is open
+BUCKETS_MS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000)
+
+# Driver housekeeping, not worth a histogram
+IGNORED_COMMANDS = frozenset({
+    "hello", "ismaster", "isMaster", "ping", "buildInfo", "buildinfo", "saslStart",
+    "saslContinue", "endSessions", "killCursors", "explain", "getLastError",
+})
+
+# Commands whose plan can be explained, and the field holding their filter
+EXPLAINABLE = {
+    "find": "filter",
+    "aggregate": "pipeline",
+    "count": "query",
+    "distinct": "query",
+    "findAndModify": "query",
+    "update": "updates",
+    "delete": "deletes",
+}
+
+# Per-request fields the driver adds that explain() must not see
+_SESSION_FIELDS = ("lsid", "txnNumber", "autocommit", "startTransaction", "readConcern")
+
+
+def query_shape(value):
+    """A filter/pipeline with every value replaced by "?" (no user data in logs)."""
+    if isinstance(value, dict):
+        return {key: query_shape(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        shapes = [query_shape(item) for item in value]
+        # $in lists etc. collapse to one element
+        return shapes[:1] if shapes and all(s == shapes[0] for s in shapes) else shapes
+    return "?"
+
+
+def _find_key(doc, key: str):
+    if isinstance(doc, dict):
+        if key in doc:
+            return doc[key]
+        items = doc.values()
+    elif isinstance(doc, list):
+        items = doc
+    else:
+        return None
+    for item in items:
+        found = _find_key(item, key)
+        if found is not None:
+            return found
+    return None
+
+
+def plan_summary(explain: dict) -> Optional[str]:
+    """Winning plan as "FETCH > IXSCAN(group_id_1_chat_id_1)" (first plan found in the explain output)."""
+    plan = _find_key(explain, "winningPlan")
+    if plan is None:
+        return None
+    # Newer servers nest the classic plan under queryPlan
+    plan = plan.get("queryPlan", plan)
+    stages = []
+    while isinstance(plan, dict) and plan.get("stage"):
+        stage = plan["stage"]
+        if plan.get("indexName"):
+            stage += f"({plan['indexName']})"
+        stages.append(stage)
+        plan = plan.get("inputStage") or (plan.get("inputStages") or [None])[0]
+    return " > ".join(stages) or None
+
+
+def _has_collscan(doc) -> bool:
+    if isinstance(doc, dict):
+        if doc.get("stage") == "COLLSCAN":
+            return True
+        return any(_has_collscan(item) for item in doc.values())
+    if isinstance(doc, list):
+        return any(_has_collscan(item) for item in doc)
+    return False
+
+
+class _Histogram:
+    __slots__ = ("count", "failures", "total_ms", "max_ms", "buckets")
+
+    def __init__(self):
+        self.count = 0
+        self.failures = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(BUCKETS_MS) + 1)
+
+    def add(self, ms: float):
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.buckets[bisect.bisect_left(BUCKETS_MS, ms)] += 1
+
+    def percentile(self, pct: float) -> float:
+        """Upper bound of the bucket holding the pct-th percentile."""
+        target = self.count * pct / 100
+        seen = 0
+        for i, n in enumerate(self.buckets):
+            seen += n
+            if n and seen >= target:
+                return float(BUCKETS_MS[i]) if i < len(BUCKETS_MS) else self.max_ms
+        return 0.0
+
+    def as_dict(self) -> dict:
+        return {
+            "count": self.count,
+            "failures": self.failures,
+            "mean_ms": round(self.total_ms / self.count, 2) if self.count else 0,
+            "p50_ms": self.percentile(50),
+            "p95_ms": self.percentile(95),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max_ms, 2),
+            "buckets": {
+                f"le_{bound}ms" if i < len(BUCKETS_MS) else "inf": n
+                for i, (bound, n) in enumerate(zip(BUCKETS_MS + (None,), self.buckets))
+                if n
+            },
+        }
+
+
+class CommandMonitor(monitoring.CommandListener):
+    """
+    pymongo command listener recording latency per (collection, command).
+
+    Registered on both the sync and the async client. Listener callbacks run on
+    whatever thread does the I/O, so they only update counters under a lock.
+    A command slower than `slow_ms` is logged (shape only, no values) and kept
+    in a bounded slow-query log; when explaining is enabled, a background
+    thread runs explain("queryPlanner") for it with the sync client, at most
+    once per query shape per `explain_cooldown` seconds, and records the
+    winning plan and whether it scans the whole collection.
+    """
+
+    def __init__(
+        self,
+        enabled: bool = MONGO_MONITORING_ENABLED,
+        slow_ms: float = MONGO_SLOW_QUERY_MS,
+        explain: bool = MONGO_EXPLAIN_SLOW_QUERIES,
+        explain_cooldown: int = MONGO_EXPLAIN_COOLDOWN_SECONDS,
+        log_size: int = MONGO_SLOW_QUERY_LOG_SIZE,
+    ):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.explain = explain
+        self.explain_cooldown = explain_cooldown
+        self._lock = threading.Lock()
+        self._inflight: dict = {}  # (connection_id, request_id) -> (collection, command name, command)
+        self._histograms: dict = {}  # (collection, command name) -> _Histogram
+        self._servers: dict = {}  # "host:port" -> commands served (shows where reads are routed)
+        self.slow_queries: deque = deque(maxlen=log_size)
+        self._explained: dict = {}  # shape key -> last explain time
+        self._explain_queue: queue.Queue = queue.Queue(maxsize=100)
+        self._explain_thread: Optional[threading.Thread] = None
+        self._client = None
+
+        self.slow_count = 0
+        self.collscans = 0
+
+    def attach(self, client):
+        """Sync MongoClient used to run explain() (set once the database is initialized)."""
+        self._client = client
+        if self.explain and self._explain_thread is None:
+            self._explain_thread = threading.Thread(target=self._explain_worker, name="mongo-explain", daemon=True)
+            self._explain_thread.start()
+
+    # --- listener callbacks -------------------------------------------------
+
+    def started(self, event):
+        name = event.command_name
+        if name in IGNORED_COMMANDS:
+            return
+        target = event.command.get(name)
+        if name == "getMore":
+            target = event.command.get("collection")
+        collection = target if isinstance(target, str) else "<db>"
+        command = event.command if name in EXPLAINABLE else None
+        with self._lock:
+            self._inflight[(event.connection_id, event.request_id)] = (event.database_name, collection, name, command)
+
+    def succeeded(self, event):
+        with self._lock:
+            entry = self._inflight.pop((event.connection_id, event.request_id), None)
+            if entry is None:
+                return
+            database, collection, name, command = entry
+            ms = event.duration_micros / 1000
+            histogram = self._histograms.get((collection, name))
+            if histogram is None:
+                histogram = self._histograms[(collection, name)] = _Histogram()
+            histogram.add(ms)
+            server = "%s:%s" % event.connection_id
+            self._servers[server] = self._servers.get(server, 0) + 1
+        if ms >= self.slow_ms:
+            self._record_slow(database, collection, name, command, ms)
+
+    def failed(self, event):
+        with self._lock:
+            entry = self._inflight.pop((event.connection_id, event.request_id), None)
+            if entry is None:
+                return
+            _, collection, name, _ = entry
+            histogram = self._histograms.get((collection, name))
+            if histogram is None:
+                histogram = self._histograms[(collection, name)] = _Histogram()
+            histogram.failures += 1
+
+    # --- slow queries -------------------------------------------------------
+
+    def _record_slow(self, database: str, collection: str, name: str, command: Optional[dict], ms: float):
+        shape = query_shape(command.get(EXPLAINABLE[name])) if command else None
+        if command and name == "find" and command.get("sort"):
+            shape = {"filter": shape, "sort": dict(command["sort"])}
+        record = {
+            "ts": datetime.now(timezone.utc).isoformat(),
+            "collection": collection,
+            "command": name,
+            "duration_ms": round(ms, 2),
+            "shape": shape,
+            "plan": None,
+            "collscan": None,
+        }
+        with self._lock:
+            self.slow_count += 1
+            self.slow_queries.append(record)
+
+        log_event(logger, logging.WARNING, "mongo.slow_query",
+                  f"Slow {name} on {collection}: {ms:.1f}ms",
+                  collection=collection, command=name, duration_ms=round(ms, 2), shape=shape)
+
+        if not (self.explain and command and self._client is not None):
+            return
+        key = (collection, name, repr(shape))
+        now = time.monotonic()
+        with self._lock:
+            last = self._explained.get(key)
+            if last is not None and now - last < self.explain_cooldown:
+                return
+            self._explained[key] = now
+        try:
+            self._explain_queue.put_nowait((database, command, record))
+        except queue.Full:
+            pass
+
+    def _explain_worker(self):
+        while True:
+            database, command, record = self._explain_queue.get()
+            try:
+                cmd = {k: v for k, v in command.items() if not k.startswith("$") and k not in _SESSION_FIELDS}
+                result = self._client[database].command({"explain": cmd, "verbosity": "queryPlanner"})
+                plan = plan_summary(result)
+                collscan = _has_collscan(_find_key(result, "winningPlan") or result)
+                with self._lock:
+                    record["plan"] = plan
+                    record["collscan"] = collscan
+                    if collscan:
+                        self.collscans += 1
+                level = logging.WARNING if collscan else logging.INFO
+                log_event(logger, level, "mongo.slow_query_plan",
+                          f"{'COLLSCAN: ' if collscan else ''}plan of slow {record['command']} on {record['collection']}: {plan}",
+                          collection=record["collection"], command=record["command"], plan=plan,
+                          collscan=collscan, shape=record["shape"])
+            except Exception as e:
+                logger.debug(f"explain of slow {record['command']} on {record['collection']} failed: {e}")
+
+    # --- reporting ----------------------------------------------------------
+
+    def stats(self) -> dict:
+        """Summary for /internal/metrics (no histograms)."""
+        with self._lock:
+            return {
+                "enabled": self.enabled,
+                "commands": sum(h.count for h in self._histograms.values()),
+                "failures": sum(h.failures for h in self._histograms.values()),
+                "slow_queries": self.slow_count,
+                "collscans": self.collscans,
+            }
+
+    def report(self) -> dict:
+        """Histograms per collection and command, plus the recent slow queries."""
+        with self._lock:
+            commands = {}
+            for (collection, name), histogram in sorted(self._histograms.items()):
+                commands.setdefault(collection, {})[name] = histogram.as_dict()
+            return {
+                "slow_query_ms": self.slow_ms,
+                "bucket_bounds_ms": list(BUCKETS_MS),
+                "commands": commands,
+                "servers": dict(self._servers),
+                "collscans": self.collscans,
+                "slow_queries": [dict(record) for record in reversed(self.slow_queries)],
+            }
+
+    def event_listeners(self) -> list:
+        """Listeners to pass to MongoClient/AsyncIOMotorClient."""
+        return [self] if self.enabled else []
+
+
+command_monitor = CommandMonitor()
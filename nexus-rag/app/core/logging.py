@@ -1,8 +1,176 @@
+import atexit
+import json
 import logging
+import queue
+import random
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from typing import Optional
 
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s | %(levelname)s | %(message)s",
-)
+TEXT_FORMAT = "%(asctime)s - %(name)s - %(levelname)s - %(message)s"
 
-logger = logging.getLogger("nexus-rag")
+# Debug traces (chat history dumps, reply context, ...) that used to be printed or
+# appended to debug_nexus_*.txt go to this logger; its level is set separately
+# from LOG_LEVEL so traces can be off in production without hiding INFO logs.
+trace_logger = logging.getLogger("nexus.trace")
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the background writer without ever blocking the caller.
+
+    The message is rendered here (so args can't change before the writer sees
+    them) but formatting and disk I/O happen on the listener thread. When the
+    queue is full the record is dropped and counted.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.message = record.getMessage()
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.msg = record.message
+        record.args = None
+        record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps a fraction of the records for an event, e.g. {"socket.connect": 0.1}.
+    Records without an `event` attribute, or for events not listed, always pass.
+    """
+
+    def __init__(self, rates: dict):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        rate = self.rates.get(getattr(record, "event", None))
+        if rate is None:
+            return True
+        return rate > 0 and (rate >= 1 or random.random() < rate)
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line, including the fields passed to log_event()"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": datetime.fromtimestamp(record.created, timezone.utc).isoformat(),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+        event = getattr(record, "event", None)
+        if event:
+            entry["event"] = event
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str, ensure_ascii=False)
+
+
+class TextFormatter(logging.Formatter):
+    """The classic text format, with log_event() fields appended as key=value"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " | " + " ".join(f"{key}={value!r}" for key, value in fields.items())
+        return line
+
+
+def _parse_level(name: str) -> int:
+    """Level name to number; OFF disables the logger entirely."""
+    if name.upper() == "OFF":
+        return logging.CRITICAL + 1
+    return getattr(logging, name.upper())
+
+
+def setup_logging(
+    level: str = "INFO",
+    fmt: str = "text",
+    log_file: Optional[str] = None,
+    queue_size: int = 10000,
+    sample_rates: Optional[dict] = None,
+    trace_level: str = "OFF",
+):
+    """
+    Route every log record through a bounded queue to a background writer thread.
+
+    Code on the event loop only pays for building the record; formatting and
+    writing to stderr / `log_file` happen on the listener thread. Called once from
+    app.core.config at import time.
+    """
+    global _listener, _queue_handler
+
+    formatter = JsonFormatter() if fmt == "json" else TextFormatter(TEXT_FORMAT)
+    handlers = [logging.StreamHandler()]
+    if log_file:
+        handlers.append(RotatingFileHandler(log_file, maxBytes=10 * 1024 * 1024, backupCount=5, encoding="utf-8"))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    if _listener is not None:
+        _listener.stop()
+
+    _queue_handler = NonBlockingQueueHandler(queue.Queue(maxsize=queue_size))
+    _queue_handler.addFilter(SamplingFilter(sample_rates or {}))
+    _listener = QueueListener(_queue_handler.queue, *handlers, respect_handler_level=True)
+    _listener.start()
+
+    root = logging.getLogger()
+    for handler in list(root.handlers):
+        root.removeHandler(handler)
+    root.addHandler(_queue_handler)
+    root.setLevel(_parse_level(level))
+
+    trace_logger.setLevel(_parse_level(trace_level))
+
+    atexit.register(shutdown_logging)
+
+
+def shutdown_logging():
+    """Flush queued records and stop the writer thread."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def log_event(logger: logging.Logger, level: int, event: str, message: str, exc_info=None, **fields):
+    """
+    Structured log record: `event` names it (and is what sampling keys on),
+    `fields` become JSON keys / key=value pairs. Nothing is built when the
+    level is disabled.
+    """
+    if logger.isEnabledFor(level):
+        logger.log(level, message, exc_info=exc_info, extra={"event": event, "fields": fields})
+
+
+def trace(event: str, message: str, **fields):
+    """Debug trace through the nexus.trace logger (off unless TRACE_LOG_LEVEL allows DEBUG)."""
+    log_event(trace_logger, logging.DEBUG, event, message, **fields)
+
+
+def stats() -> dict:
+    return {
+        "queue_depth": _queue_handler.queue.qsize() if _queue_handler else 0,
+        "dropped": _queue_handler.dropped if _queue_handler else 0,
+    }
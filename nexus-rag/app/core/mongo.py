@@ -11,10 +11,37 @@ from app.core.config import (
     MONGO_MAX_POOL_SIZE,
     MONGO_MIN_POOL_SIZE,
     MONGO_SERVER_SELECTION_TIMEOUT_MS,
+    MESSAGE_STORAGE,
+    MESSAGE_BUCKET_COLLECTION_NAME,
+    ARCHIVE_ENABLED,
+    ARCHIVE_COLLECTION_NAME,
 )
+from app.core.db_monitor import command_monitor
 
 logger = logging.getLogger(__name__)
 
+# Indexes of the bucketed message layout (MESSAGE_STORAGE=buckets)
+MESSAGE_BUCKET_INDEXES = [
+    # Open bucket of a chat to append to
+    [("group_id", ASCENDING), ("chat_id", ASCENDING), ("count", ASCENDING)],
+    # Pages: buckets by time range
+    [("group_id", ASCENDING), ("chat_id", ASCENDING), ("end", ASCENDING)],
+    [("group_id", ASCENDING), ("chat_id", ASCENDING), ("start", ASCENDING)],
+    # Resume after reconnect: buckets holding a change after a sequence number
+    [("group_id", ASCENDING), ("chat_id", ASCENDING), ("updated_seq", ASCENDING)],
+    # Edits and deletes find a message's bucket by its id
+    [("messages._id", ASCENDING)],
+]
+
+# Indexes of the message archive (cold tier)
+ARCHIVE_INDEXES = [
+    [("group_id", ASCENDING), ("chat_id", ASCENDING), ("end", ASCENDING)],
+    [("group_id", ASCENDING), ("chat_id", ASCENDING), ("start", ASCENDING)],
+    # Cursors and lookups by message id
+    [("message_ids", ASCENDING)],
+    [("group_id", ASCENDING), ("user_ids", ASCENDING)],
+]
+
 # Global client instance (singleton pattern)
 _client: Optional[MongoClient] = None
 _db = None
@@ -42,11 +69,14 @@ def initialize_database():
             retryReads=True,
             connectTimeoutMS=10000,
             socketTimeoutMS=30000,
+            # Latency histograms / slow-query capture (app/core/db_monitor.py)
+            event_listeners=command_monitor.event_listeners(),
         )
         
         # Verify connection
         _client.admin.command('ping')
         _db = _client[MONGO_DB_NAME]
+        command_monitor.attach(_client)
         
         logger.info(f"MongoDB connected successfully to database: {MONGO_DB_NAME}")
         
@@ -70,7 +100,17 @@ def _create_indexes():
         messages_col = _db["messages"]
         messages_col.create_index([("user_id", ASCENDING), ("group_id", ASCENDING), ("chat_id", ASCENDING)])
         messages_col.create_index([("created_at", DESCENDING)])
-        messages_col.create_index([("group_id", ASCENDING), ("chat_id", ASCENDING), ("created_at", DESCENDING)])
+        # Chat history pages: keyset on (created_at, _id), also serves "latest N" reads
+        messages_col.create_index([("group_id", ASCENDING), ("chat_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)])
+        # Resume after reconnect: messages changed since a sequence number
+        messages_col.create_index([("group_id", ASCENDING), ("chat_id", ASCENDING), ("updated_seq", ASCENDING)])
+
+        if MESSAGE_STORAGE == "buckets":
+            for keys in MESSAGE_BUCKET_INDEXES:
+                _db[MESSAGE_BUCKET_COLLECTION_NAME].create_index(keys)
+        if ARCHIVE_ENABLED:
+            for keys in ARCHIVE_INDEXES:
+                _db[ARCHIVE_COLLECTION_NAME].create_index(keys)
         
         # Users collection indexes
         users_col = _db["users"]
@@ -86,6 +126,8 @@ def _create_indexes():
         vector_col = _db[VECTOR_COLLECTION_NAME]
         vector_col.create_index([("group_id", ASCENDING), ("chat_id", ASCENDING)])
         vector_col.create_index([("created_at", DESCENDING)])
+        # Edits and deletes find a message's vectors by its id
+        vector_col.create_index([("message_id", ASCENDING)])
         
         logger.info("Database indexes created successfully")
         
@@ -142,6 +184,18 @@ def get_message_collection():
     return db["messages"]
 
 
+def get_message_bucket_collection():
+    """Get message bucket collection instance (MESSAGE_STORAGE=buckets)"""
+    db = get_db()
+    return db[MESSAGE_BUCKET_COLLECTION_NAME]
+
+
+def get_archive_collection():
+    """Get message archive collection instance (cold tier)"""
+    db = get_db()
+    return db[ARCHIVE_COLLECTION_NAME]
+
+
 def get_users_collection():
     """Get users collection instance"""
     db = get_db()
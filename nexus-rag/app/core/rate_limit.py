@@ -0,0 +1,132 @@
+import time
+import logging
+from collections import OrderedDict
+from typing import Optional
+
+from app.core.config import (
+    SOCKET_RATE_LIMIT_ENABLED,
+    SOCKET_USER_EVENTS_PER_SECOND,
+    SOCKET_USER_EVENT_BURST,
+    SOCKET_ROOM_EVENTS_PER_SECOND,
+    SOCKET_ROOM_EVENT_BURST,
+    SOCKET_TYPING_PER_SECOND,
+    SOCKET_TYPING_BURST,
+    AI_TRIGGER_USER_PER_MINUTE,
+    AI_TRIGGER_USER_BURST,
+    AI_TRIGGER_ROOM_PER_MINUTE,
+    AI_TRIGGER_ROOM_BURST,
+    SOCKET_RATE_LIMIT_MAX_KEYS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class TokenBucketLimiter:
+    """
+    Keyed token buckets with lazy refill.
+
+    Each key holds [tokens, last_refill]; a check refills by elapsed time and
+    takes one token, so every operation is O(1). Keys live in an OrderedDict used
+    as an LRU, and the least recently used key is evicted past `max_keys` - an
+    evicted key simply starts again with a full bucket.
+    """
+
+    def __init__(self, name: str, rate: float, burst: int, max_keys: int = SOCKET_RATE_LIMIT_MAX_KEYS):
+        self.name = name
+        self.rate = rate
+        self.burst = burst
+        self.max_keys = max_keys
+        self._buckets: "OrderedDict[str, list]" = OrderedDict()
+        self.allowed = 0
+        self.rejected = 0
+
+    def _refill(self, key: str, now: float) -> list:
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            bucket = self._buckets[key] = [float(self.burst), now]
+            if len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        else:
+            self._buckets.move_to_end(key)
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+        return bucket
+
+    def retry_after(self, key: str, now: Optional[float] = None) -> float:
+        """Seconds until `key` has a token again (0 if it has one now)."""
+        bucket = self._refill(key, now if now is not None else time.monotonic())
+        if bucket[0] >= 1 or self.rate <= 0:
+            return 0.0
+        return (1 - bucket[0]) / self.rate
+
+    def has_token(self, key: str, now: float) -> bool:
+        return self._refill(key, now)[0] >= 1
+
+    def take(self, key: str, now: float):
+        self._refill(key, now)[0] -= 1
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._buckets),
+            "rate_per_second": self.rate,
+            "burst": self.burst,
+            "allowed": self.allowed,
+            "rejected": self.rejected,
+        }
+
+
+class SocketFloodControl:
+    """
+    Per-user and per-room budgets for Socket.IO events.
+
+    check() only consumes tokens when every bucket involved has one, so a
+    rejection at the room level does not also burn the user's budget. It returns
+    None when allowed, or the number of seconds to wait before retrying.
+    """
+
+    def __init__(self, enabled: bool = SOCKET_RATE_LIMIT_ENABLED):
+        self.enabled = enabled
+        self.user_events = TokenBucketLimiter("user_events", SOCKET_USER_EVENTS_PER_SECOND, SOCKET_USER_EVENT_BURST)
+        self.room_events = TokenBucketLimiter("room_events", SOCKET_ROOM_EVENTS_PER_SECOND, SOCKET_ROOM_EVENT_BURST)
+        self.typing = TokenBucketLimiter("typing", SOCKET_TYPING_PER_SECOND, SOCKET_TYPING_BURST)
+        self.ai_user = TokenBucketLimiter("ai_user", AI_TRIGGER_USER_PER_MINUTE / 60, AI_TRIGGER_USER_BURST)
+        self.ai_room = TokenBucketLimiter("ai_room", AI_TRIGGER_ROOM_PER_MINUTE / 60, AI_TRIGGER_ROOM_BURST)
+
+    def _check(self, *limits) -> Optional[float]:
+        """`limits` are (limiter, key) pairs that must all have a token."""
+        if not self.enabled:
+            return None
+
+        now = time.monotonic()
+        blocked = [(limiter, key) for limiter, key in limits if not limiter.has_token(key, now)]
+        if blocked:
+            for limiter, _ in blocked:
+                limiter.rejected += 1
+            return max(limiter.retry_after(key, now) for limiter, key in blocked)
+
+        for limiter, key in limits:
+            limiter.take(key, now)
+            limiter.allowed += 1
+        return None
+
+    def check_message_event(self, user: str, room: str) -> Optional[float]:
+        """send_message / edit_message / delete_message"""
+        return self._check((self.user_events, user), (self.room_events, room))
+
+    def check_typing(self, user: str) -> Optional[float]:
+        return self._check((self.typing, user))
+
+    def check_ai_trigger(self, user: str, room: str) -> Optional[float]:
+        return self._check((self.ai_user, user), (self.ai_room, room))
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            **{
+                limiter.name: limiter.stats()
+                for limiter in (self.user_events, self.room_events, self.typing, self.ai_user, self.ai_room)
+            },
+        }
+
+
+flood_control = SocketFloodControl()
@@ -0,0 +1,67 @@
+import logging
+
+from pymongo.read_preferences import (
+    Nearest,
+    Primary,
+    PrimaryPreferred,
+    Secondary,
+    SecondaryPreferred,
+)
+
+from app.core.config import (
+    MONGO_HISTORY_READ_PREFERENCE,
+    MONGO_HISTORY_MAX_STALENESS_SECONDS,
+    MONGO_ANALYTICS_READ_PREFERENCE,
+    MONGO_ANALYTICS_MAX_STALENESS_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+_MODES = {
+    "primary": Primary,
+    "primarypreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondarypreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+# Servers reject a max staleness below 90 seconds
+MIN_MAX_STALENESS_SECONDS = 90
+
+
+def build_read_preference(mode: str, max_staleness: int = 0):
+    """pymongo read preference for a mode name ("secondaryPreferred", ...) and staleness bound (0 = none)."""
+    cls = _MODES.get(mode.lower())
+    if cls is None:
+        logger.warning(f"Unknown read preference {mode!r}, using primary")
+        cls = Primary
+    if cls is Primary:
+        return Primary()
+    if max_staleness > 0:
+        return cls(max_staleness=max(max_staleness, MIN_MAX_STALENESS_SECONDS))
+    return cls()
+
+
+READ_PROFILES = {
+    # Auth, writes, and reads that must see the caller's own writes
+    "primary": Primary(),
+    # Chat history pages and per-user history
+    "history": build_read_preference(MONGO_HISTORY_READ_PREFERENCE, MONGO_HISTORY_MAX_STALENESS_SECONDS),
+    # Aggregations, reports, exports
+    "analytics": build_read_preference(MONGO_ANALYTICS_READ_PREFERENCE, MONGO_ANALYTICS_MAX_STALENESS_SECONDS),
+}
+
+
+def with_profile(collection, profile: str):
+    """The collection (sync or Motor) with the read preference of a named profile."""
+    if profile not in READ_PROFILES:
+        raise ValueError(f"Unknown read profile {profile!r}")
+    return collection.with_options(read_preference=READ_PROFILES[profile])
+
+
+def describe() -> dict:
+    """Profiles as {name: {mode, max_staleness}} for /internal/metrics."""
+    return {
+        name: {"mode": pref.mongos_mode, "max_staleness": pref.max_staleness}
+        for name, pref in READ_PROFILES.items()
+    }
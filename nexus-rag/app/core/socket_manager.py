@@ -0,0 +1,107 @@
+import asyncio
+import json
+import logging
+from typing import Optional
+
+import socketio
+from socketio.async_pubsub_manager import AsyncPubSubManager
+
+from app.core.config import SOCKETIO_MANAGER, SOCKETIO_MESSAGE_QUEUE, SOCKETIO_CHANNEL
+
+logger = logging.getLogger(__name__)
+
+
+class RemoteEventTap:
+    """
+    Mixin for pub/sub managers that reports room emits which originated on
+    another host to local listeners, so per-worker caches can follow events
+    their own handlers never saw. Emits from this host are not reported.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._remote_event_listeners = []
+
+    def add_remote_event_listener(self, listener):
+        """`listener(event, data, room)` runs on the event loop and must not block."""
+        self._remote_event_listeners.append(listener)
+
+    async def _handle_emit(self, message):
+        if message.get("host_id") != self.host_id and message.get("room") and not message.get("binary"):
+            data = message.get("data")
+            if isinstance(data, list) and len(data) == 1:
+                data = data[0]
+            for listener in self._remote_event_listeners:
+                try:
+                    listener(message["event"], data, message["room"])
+                except Exception as e:
+                    logger.error(f"Remote event listener failed for {message['event']}: {e}", exc_info=True)
+        await super()._handle_emit(message)
+
+
+class RedisManager(RemoteEventTap, socketio.AsyncRedisManager):
+    pass
+
+
+class AioPikaManager(RemoteEventTap, socketio.AsyncAioPikaManager):
+    pass
+
+
+class InMemoryPubSubManager(RemoteEventTap, AsyncPubSubManager):
+    """
+    Pub/sub client manager backed by an in-process bus.
+
+    Every manager on the same channel receives every published message, exactly
+    like Redis/RabbitMQ subscribers would, so several AsyncServer instances in one
+    process can stand in for several workers in tests. Messages are JSON-encoded
+    on publish to catch payloads a real broker could not carry.
+    """
+
+    name = "memory"
+    _bus: dict = {}  # channel -> list of subscriber queues
+
+    def __init__(self, channel: str = "socketio", write_only: bool = False, logger=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger)
+        self._queue: Optional[asyncio.Queue] = None
+
+    async def _publish(self, data):
+        payload = json.dumps(data)
+        for queue in self._bus.get(self.channel, []):
+            queue.put_nowait(payload)
+
+    async def _listen(self):
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+            self._bus.setdefault(self.channel, []).append(self._queue)
+        while True:
+            yield await self._queue.get()
+
+    @classmethod
+    def reset(cls):
+        """Drop all subscribers (between tests)."""
+        cls._bus.clear()
+
+
+def create_client_manager() -> Optional[socketio.AsyncManager]:
+    """
+    Build the Socket.IO client manager selected by SOCKETIO_MANAGER.
+    Returns None for the default in-process manager.
+    """
+    backend = SOCKETIO_MANAGER
+
+    if backend == "local":
+        return None
+
+    if backend == "memory":
+        logger.info("Socket.IO using in-memory pub/sub manager")
+        return InMemoryPubSubManager(channel=SOCKETIO_CHANNEL)
+
+    if backend == "redis":
+        logger.info("Socket.IO using Redis pub/sub manager")
+        return RedisManager(SOCKETIO_MESSAGE_QUEUE, channel=SOCKETIO_CHANNEL)
+
+    if backend == "aiopika":
+        logger.info("Socket.IO using RabbitMQ (aio_pika) manager")
+        return AioPikaManager(SOCKETIO_MESSAGE_QUEUE, channel=SOCKETIO_CHANNEL)
+
+    raise RuntimeError(f"Unknown SOCKETIO_MANAGER '{backend}' (expected local, memory, redis or aiopika)")
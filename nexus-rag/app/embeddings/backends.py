@@ -0,0 +1,145 @@
+import json
+import logging
+import os
+from typing import List, Optional, Union
+
+import numpy as np
+
+from app.core.config import EMBEDDING_MODEL, EMBEDDING_BACKEND, EMBEDDING_ONNX_QUANTIZED, EMBEDDING_ONNX_PATH
+
+logger = logging.getLogger(__name__)
+
+BACKENDS = ("torch", "onnx")
+
+# Graphs as published in the sentence-transformers Hugging Face repos, and as
+# written by export_onnx_model.py into EMBEDDING_ONNX_PATH
+HUB_ONNX_FILE = "onnx/model.onnx"
+HUB_ONNX_QUANTIZED_FILE = "onnx/model_quint8_avx2.onnx"
+LOCAL_ONNX_FILE = "model.onnx"
+LOCAL_ONNX_QUANTIZED_FILE = "model_qint8.onnx"
+
+DEFAULT_MAX_SEQ_LENGTH = 256
+
+# Minimum cosine similarity to the torch vectors of the same text
+PARITY_MIN_COSINE = 0.999
+PARITY_MIN_COSINE_INT8 = 0.97
+
+
+def model_id(backend: str = EMBEDDING_BACKEND, quantized: bool = EMBEDDING_ONNX_QUANTIZED) -> str:
+    """Model name plus the backend variant, for keys of cached vectors (quantized vectors differ slightly)."""
+    if backend == "onnx":
+        return f"{EMBEDDING_MODEL}@onnx{'-int8' if quantized else ''}"
+    return EMBEDDING_MODEL
+
+
+class OnnxEncoder:
+    """
+    Sentence-transformers style encoder on onnxruntime: tokenize, run the
+    transformer graph, mean-pool over the attention mask and L2-normalize,
+    the same pipeline as all-MiniLM-L6-v2's SentenceTransformer modules.
+    encode() mirrors SentenceTransformer.encode for the arguments we use.
+    """
+
+    def __init__(self, model_path: str, tokenizer_path: str, max_seq_length: int = DEFAULT_MAX_SEQ_LENGTH):
+        import onnxruntime
+        from tokenizers import Tokenizer
+
+        self.model_path = model_path
+        self.max_seq_length = max_seq_length
+        self.tokenizer = Tokenizer.from_file(tokenizer_path)
+        self.tokenizer.enable_truncation(max_length=max_seq_length)
+        pad_id = self.tokenizer.token_to_id("[PAD]") or 0
+        self.tokenizer.enable_padding(pad_id=pad_id, pad_token="[PAD]")
+
+        options = onnxruntime.SessionOptions()
+        options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = onnxruntime.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = {i.name for i in self.session.get_inputs()}
+
+    def encode(self, sentences: Union[str, List[str]], batch_size: int = 32,
+               normalize_embeddings: bool = False) -> np.ndarray:
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, 0), dtype=np.float32)
+
+        # Similar lengths in one batch pad less
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        embeddings: List[Optional[np.ndarray]] = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            chunk = order[start:start + batch_size]
+            for i, embedding in zip(chunk, self._encode_batch([texts[i] for i in chunk])):
+                embeddings[i] = embedding
+
+        result = np.stack(embeddings)
+        if normalize_embeddings:
+            result = result / np.clip(np.linalg.norm(result, axis=1, keepdims=True), 1e-12, None)
+        return result[0] if single else result
+
+    def _encode_batch(self, texts: List[str]) -> np.ndarray:
+        encodings = self.tokenizer.encode_batch(texts)
+        mask = np.asarray([e.attention_mask for e in encodings], dtype=np.int64)
+        feeds = {
+            "input_ids": np.asarray([e.ids for e in encodings], dtype=np.int64),
+            "attention_mask": mask,
+            "token_type_ids": np.asarray([e.type_ids for e in encodings], dtype=np.int64),
+        }
+        token_embeddings = self.session.run(None, {k: v for k, v in feeds.items() if k in self.input_names})[0]
+
+        weights = mask[..., None].astype(np.float32)
+        summed = (token_embeddings * weights).sum(axis=1)
+        return summed / np.clip(weights.sum(axis=1), 1e-9, None)
+
+
+def _model_file(filename: str) -> Optional[str]:
+    """Path of a file of EMBEDDING_MODEL, from a local model directory or the Hugging Face hub."""
+    if os.path.isdir(EMBEDDING_MODEL):
+        path = os.path.join(EMBEDDING_MODEL, filename)
+        return path if os.path.exists(path) else None
+
+    from huggingface_hub import hf_hub_download
+    try:
+        return hf_hub_download(EMBEDDING_MODEL, filename)
+    except Exception as e:
+        logger.debug(f"{EMBEDDING_MODEL} has no {filename}: {e}")
+        return None
+
+
+def _max_seq_length(config_path: Optional[str]) -> int:
+    if not config_path:
+        return DEFAULT_MAX_SEQ_LENGTH
+    with open(config_path) as f:
+        return json.load(f).get("max_seq_length", DEFAULT_MAX_SEQ_LENGTH)
+
+
+def load_onnx_model(quantized: bool = EMBEDDING_ONNX_QUANTIZED, path: str = EMBEDDING_ONNX_PATH) -> OnnxEncoder:
+    if path:
+        model_path = os.path.join(path, LOCAL_ONNX_QUANTIZED_FILE if quantized else LOCAL_ONNX_FILE)
+        tokenizer_path = os.path.join(path, "tokenizer.json")
+        config_path = os.path.join(path, "sentence_bert_config.json")
+        config_path = config_path if os.path.exists(config_path) else None
+    else:
+        model_path = _model_file(HUB_ONNX_QUANTIZED_FILE if quantized else HUB_ONNX_FILE)
+        tokenizer_path = _model_file("tokenizer.json")
+        config_path = _model_file("sentence_bert_config.json")
+
+    if not model_path or not os.path.exists(model_path) or not tokenizer_path:
+        raise RuntimeError(
+            f"No ONNX export of {EMBEDDING_MODEL} found (quantized={quantized}); "
+            f"create one with export_onnx_model.py and set EMBEDDING_ONNX_PATH"
+        )
+
+    encoder = OnnxEncoder(model_path, tokenizer_path, _max_seq_length(config_path))
+    logger.info(f"Embedding model {EMBEDDING_MODEL} on onnxruntime ({os.path.basename(model_path)})")
+    return encoder
+
+
+def load_model(backend: str = EMBEDDING_BACKEND, quantized: bool = EMBEDDING_ONNX_QUANTIZED):
+    """The embedding model for `backend`; both expose encode(texts, batch_size, normalize_embeddings)."""
+    if backend not in BACKENDS:
+        raise ValueError(f"EMBEDDING_BACKEND must be one of {BACKENDS}, got {backend!r}")
+    if backend == "onnx":
+        return load_onnx_model(quantized)
+
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBEDDING_MODEL)
@@ -0,0 +1,173 @@
+import asyncio
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, List, Optional
+
+from app.core.config import EMBED_BATCHING_ENABLED, EMBED_BATCH_WINDOW_MS, EMBED_BATCH_MAX
+from app.embeddings.cache import EmbeddingCache, embedding_cache
+
+logger = logging.getLogger(__name__)
+
+
+def _embed_texts(texts: List[str], batch_size: int) -> List[List[float]]:
+    # Imported on first use: loading the embedding model is slow
+    from app.embeddings.embedder import embed_texts
+    return embed_texts(texts, batch_size)
+
+
+class EmbeddingBatcher:
+    """
+    Micro-batching of embedding requests across callers.
+
+    Concurrent embed()/embed_many() calls are collected for `window_ms` (or
+    until `max_batch` texts are waiting) and encoded together with one
+    `encode(texts, batch_size)` call on a dedicated thread, instead of one
+    model call per text. Identical texts in a batch are encoded once. While a
+    batch is being encoded, new texts keep collecting and go out as the next
+    batch as soon as the model is free, so batches grow with load instead of
+    queueing behind each other. Each caller gets its own vectors, or the
+    batch's exception. Texts already in the embedding cache's memory tier are
+    answered right away, without waiting for a window.
+
+    Disabled, every call runs the model on its own (in a worker thread).
+    """
+
+    def __init__(
+        self,
+        encode: Callable[[List[str], int], List[List[float]]] = _embed_texts,
+        enabled: bool = EMBED_BATCHING_ENABLED,
+        window_ms: float = EMBED_BATCH_WINDOW_MS,
+        max_batch: int = EMBED_BATCH_MAX,
+        cache: Optional[EmbeddingCache] = embedding_cache,
+    ):
+        self._encode = encode
+        self.cache = cache
+        self.enabled = enabled
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending: list = []  # (text, future) in arrival order
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._busy = False
+        self._due = False  # the window closed while the model was busy
+        self._batches: set = set()
+        # One thread: the model runs one batch at a time
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="embed")
+
+        self.requested = 0
+        self.cached = 0
+        self.batches = 0
+        self.encoded = 0
+        self.deduplicated = 0
+        self.failed = 0
+        self.max_batch_seen = 0
+        self.encode_ms = 0.0
+
+    async def embed(self, text: str) -> List[float]:
+        """Embedding of one text (normalized)."""
+        return (await self.embed_many([text]))[0]
+
+    async def embed_many(self, texts: List[str]) -> List[List[float]]:
+        """Embeddings of `texts`, in order; they may share model calls with other callers."""
+        if not texts:
+            return []
+        self.requested += len(texts)
+        results = self.cache.lookup(texts, disk=False) if self.cache else [None] * len(texts)
+        missing = [i for i, embedding in enumerate(results) if embedding is None]
+        self.cached += len(texts) - len(missing)
+        if not missing:
+            return results
+
+        loop = asyncio.get_running_loop()
+        if not self.enabled:
+            embeddings = await loop.run_in_executor(None, self._encode, [texts[i] for i in missing], self.max_batch)
+        else:
+            futures = []
+            for i in missing:
+                future = loop.create_future()
+                self._pending.append((texts[i], future))
+                futures.append(future)
+
+            if len(self._pending) >= self.max_batch:
+                self._dispatch()
+            elif self._timer is None and not self._due:
+                self._timer = loop.call_later(self.window, self._dispatch)
+            embeddings = await asyncio.gather(*futures)
+
+        for i, embedding in zip(missing, embeddings):
+            results[i] = embedding
+        return results
+
+    def _dispatch(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._busy:
+            self._due = True
+            return
+        self._due = False
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if not batch:
+            return
+        self._busy = True
+        task = asyncio.create_task(self._run(batch))
+        self._batches.add(task)
+        task.add_done_callback(self._batches.discard)
+
+    async def _run(self, batch: list):
+        texts = list(dict.fromkeys(text for text, _ in batch))
+        self.batches += 1
+        self.encoded += len(texts)
+        self.deduplicated += len(batch) - len(texts)
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+        started = time.perf_counter()
+        try:
+            embeddings = await asyncio.get_running_loop().run_in_executor(
+                self._executor, self._encode, texts, len(texts)
+            )
+        except Exception as e:
+            logger.error(f"Embedding batch of {len(texts)} text(s) failed: {e}")
+            self.failed += len(batch)
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        else:
+            by_text = dict(zip(texts, embeddings))
+            for text, future in batch:
+                if not future.done():
+                    future.set_result(by_text[text])
+        finally:
+            self.encode_ms += (time.perf_counter() - started) * 1000
+            self._busy = False
+            # Whatever arrived during this batch goes next, without another window
+            if self._due or len(self._pending) >= self.max_batch:
+                self._dispatch()
+            elif self._pending and self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.window, self._dispatch)
+
+    async def flush(self):
+        """Encode whatever is waiting and wait for batches in flight (shutdown)."""
+        while self._pending or self._batches:
+            if self._pending and not self._busy:
+                self._dispatch()
+            if self._batches:
+                await asyncio.gather(*list(self._batches), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "window_ms": self.window * 1000,
+            "max_batch": self.max_batch,
+            "requested": self.requested,
+            "cached": self.cached,
+            "batches": self.batches,
+            "encoded": self.encoded,
+            "deduplicated": self.deduplicated,
+            "failed": self.failed,
+            "avg_batch_size": round((self.encoded + self.deduplicated) / self.batches, 2) if self.batches else 0,
+            "max_batch_seen": self.max_batch_seen,
+            "avg_encode_ms": round(self.encode_ms / self.batches, 2) if self.batches else 0,
+        }
+
+
+embedding_batcher = EmbeddingBatcher()
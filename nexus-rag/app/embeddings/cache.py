@@ -0,0 +1,216 @@
+import hashlib
+import logging
+import sqlite3
+import threading
+import unicodedata
+from collections import OrderedDict
+from typing import List, Optional
+
+import numpy as np
+
+from app.core.config import (
+    EMBEDDING_CACHE_ENABLED,
+    EMBEDDING_CACHE_MAX_BYTES,
+    EMBEDDING_CACHE_PATH,
+    EMBEDDING_CACHE_DISK_MAX_BYTES,
+)
+from app.embeddings.backends import model_id
+
+logger = logging.getLogger(__name__)
+
+# Approximate per-entry cost on top of the vector: digest, dict slot, array header
+ENTRY_OVERHEAD_BYTES = 200
+
+
+def normalize_text(text: str) -> str:
+    """Text as it is keyed: NFKC, surrounding and repeated whitespace collapsed."""
+    return " ".join(unicodedata.normalize("NFKC", text).split())
+
+
+class EmbeddingCache:
+    """
+    Bounded LRU cache of normalized-text hash -> float32 embedding.
+
+    Keys are sha256(model id + normalized text), so switching EMBEDDING_MODEL
+    or its backend never serves vectors from another model. The memory tier is
+    bounded by `max_bytes` and evicts least recently used entries. With `path`,
+    entries are also written to a SQLite file and read back on memory misses
+    (after a restart, or once evicted); that tier is pruned oldest-first above
+    `disk_max_bytes`. Thread-safe: the model runs on worker threads.
+    """
+
+    def __init__(
+        self,
+        model_name: str = model_id(),
+        enabled: bool = EMBEDDING_CACHE_ENABLED,
+        max_bytes: int = EMBEDDING_CACHE_MAX_BYTES,
+        path: str = EMBEDDING_CACHE_PATH,
+        disk_max_bytes: int = EMBEDDING_CACHE_DISK_MAX_BYTES,
+    ):
+        self.model_name = model_name
+        self.enabled = enabled and max_bytes > 0
+        self.max_bytes = max_bytes
+        self.path = path
+        self.disk_max_bytes = disk_max_bytes
+        self._entries: OrderedDict = OrderedDict()  # key -> np.float32 vector
+        self._lock = threading.Lock()
+        self._db: Optional[sqlite3.Connection] = None
+        self._db_lock = threading.Lock()
+        self._disk_rows = 0
+
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.disk_hits = 0
+        self.disk_writes = 0
+        self.disk_pruned = 0
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\0{normalize_text(text)}".encode()).digest()
+
+    def lookup(self, texts: List[str], disk: bool = True) -> List[Optional[List[float]]]:
+        """Cached embedding for each text, or None. `disk=False` only checks memory (safe on the event loop)."""
+        if not self.enabled:
+            return [None] * len(texts)
+
+        keys = [self.key(text) for text in texts]
+        found: List[Optional[np.ndarray]] = [None] * len(texts)
+        with self._lock:
+            for i, key in enumerate(keys):
+                vector = self._entries.get(key)
+                if vector is not None:
+                    self._entries.move_to_end(key)
+                    found[i] = vector
+
+        missing = [i for i, vector in enumerate(found) if vector is None]
+        if disk and missing and self.path:
+            from_disk = self._disk_get([keys[i] for i in missing])
+            with self._lock:
+                for i in missing:
+                    vector = from_disk.get(keys[i])
+                    if vector is not None:
+                        found[i] = vector
+                        self.disk_hits += 1
+                        self._put(keys[i], vector)
+
+        hits = sum(1 for vector in found if vector is not None)
+        with self._lock:
+            self.hits += hits
+            # A memory-only pre-check is followed by a full lookup of its misses, which counts them
+            if disk:
+                self.misses += len(texts) - hits
+        return [vector.tolist() if vector is not None else None for vector in found]
+
+    def store(self, texts: List[str], embeddings: List[List[float]]):
+        """Remember freshly computed embeddings (memory, and disk when configured)."""
+        if not self.enabled or not texts:
+            return
+        rows = {self.key(text): np.asarray(embedding, dtype=np.float32) for text, embedding in zip(texts, embeddings)}
+        with self._lock:
+            for key, vector in rows.items():
+                self._put(key, vector)
+        if self.path:
+            self._disk_put(rows)
+
+    def _put(self, key: bytes, vector: np.ndarray):
+        size = vector.nbytes + ENTRY_OVERHEAD_BYTES
+        if size > self.max_bytes:
+            return
+        previous = self._entries.pop(key, None)
+        if previous is not None:
+            self.bytes -= previous.nbytes + ENTRY_OVERHEAD_BYTES
+        self._entries[key] = vector
+        self.bytes += size
+        while self.bytes > self.max_bytes:
+            _, evicted = self._entries.popitem(last=False)
+            self.bytes -= evicted.nbytes + ENTRY_OVERHEAD_BYTES
+            self.evictions += 1
+
+    def _connection(self) -> Optional[sqlite3.Connection]:
+        if self._db is None:
+            try:
+                self._db = sqlite3.connect(self.path, check_same_thread=False)
+                self._db.execute("CREATE TABLE IF NOT EXISTS embeddings (key BLOB PRIMARY KEY, vector BLOB NOT NULL)")
+                self._db.commit()
+                self._disk_rows = self._db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                logger.info(f"Embedding cache: {self._disk_rows} entries on disk at {self.path}")
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache disk tier disabled ({self.path}): {e}")
+                self.path = ""
+                self._db = None
+        return self._db
+
+    def _disk_get(self, keys: List[bytes]) -> dict:
+        with self._db_lock:
+            db = self._connection()
+            if db is None:
+                return {}
+            rows = []
+            try:
+                # Chunked: older SQLite builds allow at most 999 bound parameters
+                for start in range(0, len(keys), 500):
+                    chunk = keys[start:start + 500]
+                    placeholders = ",".join("?" * len(chunk))
+                    rows += db.execute(f"SELECT key, vector FROM embeddings WHERE key IN ({placeholders})", chunk).fetchall()
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache disk read failed: {e}")
+                return {}
+        return {bytes(key): np.frombuffer(vector, dtype=np.float32) for key, vector in rows}
+
+    def _disk_put(self, rows: dict):
+        with self._db_lock:
+            db = self._connection()
+            if db is None:
+                return
+            try:
+                # A key always maps to the same vector, so rows already on disk are left as they are
+                inserted = db.executemany(
+                    "INSERT OR IGNORE INTO embeddings (key, vector) VALUES (?, ?)",
+                    [(key, vector.tobytes()) for key, vector in rows.items()],
+                ).rowcount
+                self.disk_writes += inserted
+                self._disk_rows += inserted
+                row_bytes = next(iter(rows.values())).nbytes + 64
+                max_rows = self.disk_max_bytes // row_bytes
+                if self._disk_rows > max_rows:
+                    # Drop the oldest tenth below the cap in one go instead of on every write
+                    excess = self._disk_rows - max_rows + max_rows // 10
+                    pruned = db.execute(
+                        "DELETE FROM embeddings WHERE rowid IN (SELECT rowid FROM embeddings ORDER BY rowid LIMIT ?)",
+                        (excess,),
+                    ).rowcount
+                    self.disk_pruned += pruned
+                    self._disk_rows = db.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+                db.commit()
+            except sqlite3.Error as e:
+                logger.warning(f"Embedding cache disk write failed: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "model": self.model_name,
+            "entries": len(self._entries),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0,
+            "evictions": self.evictions,
+            "disk": {
+                "path": self.path or None,
+                "entries": self._disk_rows,
+                "hits": self.disk_hits,
+                "writes": self.disk_writes,
+                "pruned": self.disk_pruned,
+            },
+        }
+
+
+embedding_cache = EmbeddingCache()
@@ -1,22 +1,54 @@
 from typing import List
-from app.core.config import EMBEDDING_MODEL
-from sentence_transformers import SentenceTransformer
+from app.embeddings.backends import load_model
+from app.embeddings.cache import embedding_cache
+
+EMBEDDING_DIM = 384
 
 _model = None
 
 def get_model():
     global _model
     if _model is None:
-        _model = SentenceTransformer(EMBEDDING_MODEL)
+        _model = load_model()
     return _model
 
 def embed_text(text: str) -> List[float]:
+    cached = embedding_cache.lookup([text])[0]
+    if cached is not None:
+        return cached
+
     model = get_model()
     embedding = model.encode(text, normalize_embeddings=True)
 
-    if len(embedding) != 384:
+    if len(embedding) != EMBEDDING_DIM:
+        raise ValueError(
+            f"Embedding dimension mismatch: expected {EMBEDDING_DIM}, got {len(embedding)}"
+        )
+
+    embedding = embedding.tolist()
+    embedding_cache.store([text], [embedding])
+    return embedding
+
+def embed_texts(texts: List[str], batch_size: int = 64) -> List[List[float]]:
+    """Embed many texts with a single batched model call (cached texts are skipped)."""
+    if not texts:
+        return []
+
+    results = embedding_cache.lookup(texts)
+    missing = [i for i, embedding in enumerate(results) if embedding is None]
+    if not missing:
+        return results
+
+    model = get_model()
+    embeddings = model.encode([texts[i] for i in missing], batch_size=batch_size, normalize_embeddings=True)
+
+    if embeddings.shape[1] != EMBEDDING_DIM:
         raise ValueError(
-            f"Embedding dimension mismatch: expected 384, got {len(embedding)}"
+            f"Embedding dimension mismatch: expected {EMBEDDING_DIM}, got {embeddings.shape[1]}"
         )
 
-    return embedding.tolist()
\ No newline at end of file
+    embeddings = embeddings.tolist()
+    embedding_cache.store([texts[i] for i in missing], embeddings)
+    for i, embedding in zip(missing, embeddings):
+        results[i] = embedding
+    return results
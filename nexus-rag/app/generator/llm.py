@@ -1,6 +1,7 @@
 import os
 import logging
 import asyncio
+from typing import AsyncIterator
 from groq import AsyncGroq
 from groq import RateLimitError, APIError
 from dotenv import load_dotenv
@@ -83,3 +84,91 @@ async def generate_answer(prompt: str, temperature: float = 0.2) -> str:
     
     # This should never be reached, but just in case
     return "Failed to generate a response. Please try again."
+
+
+async def stream_answer(prompt: str, temperature: float = 0.2) -> AsyncIterator[str]:
+    """
+    Stream an answer from the LLM, yielding text deltas as they arrive.
+    
+    Connection errors, timeouts and rate limits before the first token are retried
+    like generate_answer(); if every attempt fails, the same user-facing fallback
+    text is yielded instead. Once tokens have been yielded a failure can no longer
+    be retried and is raised to the caller.
+    
+    Args:
+        prompt: The prompt to send to the LLM
+        temperature: Temperature for generation (0.0-1.0)
+    
+    Yields:
+        Text deltas of the answer
+    """
+    if not client:
+        logger.error("Groq client not initialized - missing API key")
+        yield "AI service is not configured. Please check your API key settings."
+        return
+    
+    for attempt in range(LLM_MAX_RETRIES):
+        started = False
+        try:
+            logger.debug(f"LLM streaming attempt {attempt + 1}/{LLM_MAX_RETRIES}")
+            
+            stream = await asyncio.wait_for(
+                client.chat.completions.create(
+                    model=LLM_MODEL,
+                    messages=[{"role": "user", "content": prompt}],
+                    temperature=temperature,
+                    max_tokens=2048,
+                    stream=True,
+                ),
+                timeout=LLM_TIMEOUT
+            )
+            
+            chunks = stream.__aiter__()
+            try:
+                while True:
+                    # Each gap between chunks gets the full timeout
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), timeout=LLM_TIMEOUT)
+                    except StopAsyncIteration:
+                        break
+                    if not chunk.choices:
+                        continue
+                    delta = chunk.choices[0].delta.content
+                    if delta:
+                        started = True
+                        yield delta
+            finally:
+                # Also runs when the consumer is cancelled; releases the HTTP stream
+                await stream.close()
+            
+            if not started:
+                logger.warning("Empty streamed response from LLM")
+                yield "I apologize, but I couldn't generate a response. Please try again."
+            return
+            
+        except asyncio.TimeoutError:
+            if started:
+                raise RuntimeError("LLM stream stalled mid-answer")
+            logger.warning(f"LLM stream timeout (attempt {attempt + 1}/{LLM_MAX_RETRIES})")
+            if attempt == LLM_MAX_RETRIES - 1:
+                yield "The AI service is taking too long to respond. Please try again later."
+                return
+            await asyncio.sleep(1 * (attempt + 1))
+            
+        except RateLimitError as e:
+            if started:
+                raise
+            logger.warning(f"Rate limit hit: {e}")
+            if attempt == LLM_MAX_RETRIES - 1:
+                yield "The AI service is currently at capacity. Please try again in a moment."
+                return
+            await asyncio.sleep(2 * (attempt + 1))
+            
+        except APIError as e:
+            if started:
+                raise
+            logger.error(f"Groq API error: {e}")
+            if attempt == LLM_MAX_RETRIES - 1:
+                yield "There was an issue with the AI service. Please try again later."
+                return
+            await asyncio.sleep(1 * (attempt + 1))
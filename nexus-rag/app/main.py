@@ -17,10 +17,16 @@ from app.api.ingest import router as ingest_router
 from app.api.query import router as query_router
 from app.api.messages import router as messages_router
 from app.api.groups import router as groups_router
-from app.socketio import sio
+from app.api.metrics import router as metrics_router
+from app.socketio import sio, typing_aggregator, room_emitter, ai_scheduler, presence
 from app.core.config import ALLOWED_ORIGINS, RATE_LIMIT_ENABLED, RATE_LIMIT_PER_MINUTE, DEBUG
 from app.core.middleware import RequestLoggingMiddleware, RateLimitMiddleware
 from app.core.mongo import initialize_database, close_database, check_health
+from app.core.async_mongo import initialize_async_database, close_async_database
+from app.vectorstore.ingestion import ingestion_pipeline
+from app.services.message_log import message_log
+from app.services.archiver import archiver
+from app.storage import storage
 
 logger = logging.getLogger(__name__)
 
@@ -59,6 +65,7 @@ fastapi_app.include_router(ingest_router, prefix="/api")
 fastapi_app.include_router(messages_router)
 fastapi_app.include_router(history_router)
 fastapi_app.include_router(groups_router)
+fastapi_app.include_router(metrics_router)
 
 
 @fastapi_app.get("/")
@@ -74,6 +81,9 @@ def root():
 @fastapi_app.get("/health")
 def health():
     """Enhanced health check with database connectivity"""
+    if storage.is_memory:
+        return {"status": "healthy", "database": "memory", "service": "running"}
+
     db_healthy = check_health()
     
     return {
@@ -83,14 +93,7 @@ def health():
     }
 
 
-# Lifecycle events
-@fastapi_app.on_event("startup")
-async def startup_event():
-    """Initialize services on startup"""
-    logger.info("=" * 50)
-    logger.info("Starting Nexus RAG Service...")
-    logger.info("=" * 50)
-    
+async def _start_database():
     # Initialize database with proper pooling
     try:
         initialize_database()
@@ -101,6 +104,41 @@ async def startup_event():
         logger.error(f"✗ Failed to initialize database: {e}")
         logger.error("Application starting in DEGRADED mode (Database unavailable)")
         # raise  <-- Commented out to allow startup
+
+    # Async client used by Socket.IO handlers and async routers
+    try:
+        await initialize_async_database()
+        logger.info("✓ Async database client initialized successfully")
+    except Exception as e:
+        logger.error(f"✗ Failed to initialize async database client: {e}")
+
+
+# Lifecycle events
+@fastapi_app.on_event("startup")
+async def startup_event():
+    """Initialize services on startup"""
+    logger.info("=" * 50)
+    logger.info("Starting Nexus RAG Service...")
+    logger.info("=" * 50)
+    
+    if storage.is_memory:
+        # Load tests / offline benchmarks: no database at all
+        logger.info("✓ In-memory storage (STORAGE_BACKEND=memory)")
+    else:
+        await _start_database()
+
+    # Background vector ingestion worker
+    ingestion_pipeline.start()
+
+    # Periodic archival of old history (ARCHIVE_INTERVAL_MINUTES); works on the Mongo collections
+    if not storage.is_memory:
+        archiver.start()
+
+    # Presence diffs / shared presence backend
+    try:
+        await presence.start()
+    except Exception as e:
+        logger.error(f"✗ Failed to start presence backend: {e}")
     
     # Log registered routes for debugging
     logger.info("Registered routes:")
@@ -118,6 +156,15 @@ async def startup_event():
 async def shutdown_event():
     """Cleanup on shutdown"""
     logger.info("Shutting down Nexus RAG Service...")
+    # Flush queued embeddings while the database is still open
+    await ingestion_pipeline.stop()
+    await ai_scheduler.stop()
+    await presence.stop()
+    await typing_aggregator.stop()
+    await room_emitter.flush_all()
+    await message_log.flush()
+    await archiver.stop()
+    close_async_database()
     close_database()
     logger.info("Shutdown complete")
 
@@ -1,9 +1,12 @@
+import logging
 from typing import List, Dict
-from app.embeddings.embedder import embed_text
-from app.core.mongo import get_vector_collection
+from app.embeddings.batcher import embedding_batcher
+from app.storage import storage
 
+logger = logging.getLogger(__name__)
 
-def retrieve_context(
+
+async def retrieve_context(
     query: str,
     group_id: str,
     chat_id: str,
@@ -14,50 +17,14 @@ def retrieve_context(
     Scoped by group_id and chat_id (Nexus-safe)
     """
 
-    collection = get_vector_collection()
-
-    # 1️⃣ Embed query
-    query_embedding = embed_text(query)
-
-    # 2️⃣ Vector search with strict filtering
-    pipeline = [
-        {
-            "$vectorSearch": {
-                "index": "embedding_index",   # Mongo Atlas vector index name
-                "path": "embedding",
-                "queryVector": query_embedding,
-                "numCandidates": 100,
-                "limit": top_k,
-                "filter": {
-                    "group_id": group_id,
-                    "chat_id": chat_id
-                }
-            }
-        },
-        {
-            "$project": {
-                "_id": 1,
-                "content": 1,
-                "score": { "$meta": "vectorSearchScore" }
-            }
-        }
-    ]
+    # 1️⃣ Embed query (micro-batched with concurrent queries, off the event loop)
+    query_embedding = await embedding_batcher.embed(query)
 
+    # 2️⃣ Vector search with strict filtering, normalized for generator & frontend
     try:
-        results = collection.aggregate(pipeline)
-        
-        # 3️⃣ Normalize output for generator & frontend
-        documents = []
-        for doc in results:
-            documents.append({
-                "id": str(doc["_id"]),
-                "content": doc.get("content", ""),
-                "score": float(doc.get("score", 0.0)),
-            })
-            
-        return documents
+        return await storage.vectors.search(query_embedding, top_k, group_id=group_id, chat_id=chat_id)
 
     except Exception as e:
-        print(f"RAG Retrieval warning (likely local Mongo): {e}")
+        logger.warning(f"RAG retrieval failed (likely local Mongo without vector search): {e}")
         # Return empty context if vector search fails (e.g. local mongo)
         return []
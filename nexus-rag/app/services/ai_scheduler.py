@@ -0,0 +1,219 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from app.core.config import AI_COALESCE_WINDOW_MS, AI_MAX_RESTARTS
+
+logger = logging.getLogger(__name__)
+
+
+class AITrigger:
+    """One message that asked for an AI reply"""
+
+    __slots__ = ("user_query", "user_email", "user_name", "reply_to_context", "at", "launched")
+
+    def __init__(self, user_query: str, user_email: str, user_name: Optional[str], reply_to_context: Optional[str] = None):
+        self.user_query = user_query
+        self.user_email = user_email
+        self.user_name = user_name
+        self.reply_to_context = reply_to_context
+        self.at = time.monotonic()
+        self.launched = False  # already part of a (possibly superseded) generation
+
+
+def merge_triggers(triggers: list) -> dict:
+    """Fold several triggers into the keyword arguments of one AI reply."""
+    last = triggers[-1]
+    if len(triggers) == 1:
+        return {
+            "user_query": last.user_query,
+            "user_email": last.user_email,
+            "user_name": last.user_name,
+            "reply_to_context": last.reply_to_context,
+        }
+
+    names = list(dict.fromkeys(t.user_name or t.user_email for t in triggers))
+    query = "Several messages asked for your reply; answer all of them in one response:\n" + "\n".join(
+        f"- {t.user_name or t.user_email}: {t.user_query}" for t in triggers
+    )
+    contexts = [t.reply_to_context for t in triggers if t.reply_to_context]
+    return {
+        "user_query": query,
+        "user_email": last.user_email,
+        "user_name": ", ".join(names),
+        "reply_to_context": "\n".join(contexts) or None,
+    }
+
+
+class _RoomSchedule:
+    __slots__ = ("group_id", "chat_id", "pending", "restarts", "timer", "running", "running_triggers",
+                 "running_restarts", "committed")
+
+    def __init__(self, group_id: str, chat_id: str):
+        self.group_id = group_id
+        self.chat_id = chat_id
+        self.pending: list = []
+        self.restarts = 0
+        self.timer: Optional[asyncio.Task] = None
+        self.running: Optional[asyncio.Task] = None
+        self.running_triggers: list = []
+        self.running_restarts = 0
+        self.committed = False  # the running generation has started storing its answer
+
+
+class AIReplyScheduler:
+    """
+    One AI generation at a time per room, shared by every trigger that needs it.
+
+    The first trigger opens a `window_ms` collection window; triggers arriving
+    inside it are merged into the same generation (one retrieval, one LLM call,
+    one prompt covering all of them). A trigger arriving while a generation is
+    in flight makes it stale: the generation is cancelled and restarted with its
+    own triggers plus the new ones. After `max_restarts` restarts in a row new
+    triggers wait for the running generation instead, so a busy room can't keep
+    the AI from ever answering.
+
+    `run(room, group_id=..., chat_id=..., user_query=..., ..., on_commit=...)`
+    performs the generation; cancelling it passes the reason as the
+    CancelledError message. It calls on_commit() right before storing the
+    answer: from then on the generation is never cancelled (the reply is
+    persisted once and delivered), and new triggers wait for it instead.
+    """
+
+    def __init__(
+        self,
+        run: Callable[..., Awaitable],
+        window_ms: int = AI_COALESCE_WINDOW_MS,
+        max_restarts: int = AI_MAX_RESTARTS,
+    ):
+        self._run = run
+        self.window = window_ms / 1000
+        self.max_restarts = max_restarts
+        self._rooms: dict = {}  # room -> _RoomSchedule
+
+        self.triggers = 0
+        self.answered_triggers = 0
+        self.generations = 0
+        self.merged = 0
+        self.superseded = 0
+        self.cancelled = 0
+
+    def trigger(self, room: str, group_id: str, chat_id: str, trigger: AITrigger):
+        """Queue an AI reply for the room; returns immediately."""
+        self.triggers += 1
+        state = self._rooms.get(room)
+        if state is None:
+            state = self._rooms[room] = _RoomSchedule(group_id, chat_id)
+        state.pending.append(trigger)
+
+        running = state.running
+        if running is not None and not running.done() and state.running_triggers and not state.committed:
+            if state.running_restarts < self.max_restarts:
+                # The answer being generated no longer covers the conversation;
+                # restart it with everything it was answering plus the new trigger
+                state.pending[:0] = state.running_triggers
+                state.restarts = state.running_restarts + 1
+                state.running_triggers = []
+                self.superseded += 1
+                running.cancel("superseded")
+
+        if state.timer is None:
+            state.timer = asyncio.create_task(self._launch(room, state))
+
+    async def _launch(self, room: str, state: _RoomSchedule):
+        try:
+            await asyncio.sleep(self.window)
+            # Never two generations in one room: wait out (or for the cancellation of) the current one
+            if state.running is not None and not state.running.done():
+                await asyncio.wait([state.running])
+        except asyncio.CancelledError:
+            # cancel() already cleared the slot; a newer window may be in it by now
+            if state.timer is asyncio.current_task():
+                state.timer = None
+            self._forget_if_idle(room, state)
+            raise
+        state.timer = None
+
+        triggers, state.pending = state.pending, []
+        restarts, state.restarts = state.restarts, 0
+        if not triggers:
+            self._forget_if_idle(room, state)
+            return
+
+        self.generations += 1
+        self.merged += len(triggers) - 1
+        for t in triggers:
+            if not t.launched:
+                t.launched = True
+                self.answered_triggers += 1
+        if len(triggers) > 1:
+            logger.info(f"Merged {len(triggers)} AI triggers into one reply in {room}")
+
+        state.running_triggers = triggers
+        state.running_restarts = restarts
+        state.committed = False
+
+        def _commit():
+            if state.running is task:
+                state.committed = True
+
+        task = asyncio.create_task(
+            self._run(room, group_id=state.group_id, chat_id=state.chat_id, on_commit=_commit,
+                      **merge_triggers(triggers))
+        )
+        state.running = task
+
+        def _done(finished):
+            if state.running is finished:
+                state.running = None
+                state.running_triggers = []
+                state.committed = False
+            self._forget_if_idle(room, state)
+
+        task.add_done_callback(_done)
+
+    def _forget_if_idle(self, room: str, state: _RoomSchedule):
+        if state.running is None and state.timer is None and not state.pending and self._rooms.get(room) is state:
+            del self._rooms[room]
+
+    def is_active(self, room: str) -> bool:
+        return room in self._rooms
+
+    def cancel(self, room: str, reason: str):
+        """Drop queued triggers and cancel the in-flight generation of a room (unless it is storing its answer)."""
+        state = self._rooms.get(room)
+        if state is None:
+            return
+        logger.info(f"Cancelling AI reply in {room}: {reason}")
+        self.cancelled += len(state.pending) + (0 if state.committed else len(state.running_triggers))
+        state.pending = []
+        state.running_triggers = []
+        if state.timer is not None:
+            # Cleared right away so a trigger arriving before it unwinds opens a new window
+            state.timer.cancel()
+            state.timer = None
+        if state.running is not None and not state.running.done() and not state.committed:
+            state.running.cancel(reason)
+
+    async def stop(self):
+        """Cancel everything (shutdown)."""
+        tasks = []
+        for room, state in list(self._rooms.items()):
+            tasks.extend(t for t in (state.timer, state.running) if t is not None)
+            self.cancel(room, "shutdown")
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "active_rooms": len(self._rooms),
+            "triggers": self.triggers,
+            "generations": self.generations,
+            "merged_triggers": self.merged,
+            "superseded": self.superseded,
+            "cancelled_triggers": self.cancelled,
+            # LLM calls avoided compared to one generation per trigger
+            # (restarts after a supersede count as calls made)
+            "llm_calls_saved": self.answered_triggers - self.generations,
+        }
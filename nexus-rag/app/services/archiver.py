@@ -0,0 +1,278 @@
+"""
+Moves old chat history from the hot collections to the compressed archive.
+
+Messages older than ARCHIVE_AFTER_DAYS are read per chat, oldest first, and
+written as blocks of ARCHIVE_BLOCK_SIZE messages (zlib-compressed BSON, see
+pack_block) to ARCHIVE_COLLECTION_NAME; each block is deleted from the hot
+collection once it is stored. A block's _id is its first message's id, so a
+run interrupted between the two steps rewrites the same block next time.
+With ARCHIVE_ENABLED, reads fall through to the archive (TieredMessageStore).
+
+Run from nexus-rag/ (prints the hot/cold collection sizes before and after):
+
+    python -m app.services.archiver [--older-than-days N] [--dry-run]
+
+or set ARCHIVE_INTERVAL_MINUTES to run it in the background; across workers a
+lease in `archive_lease` makes sure only one of them archives at a time.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+from datetime import datetime, timedelta
+from typing import Optional
+
+from pymongo import ReturnDocument
+from pymongo.errors import DuplicateKeyError
+
+from app.core.async_mongo import (
+    initialize_async_database,
+    get_async_db,
+    get_async_message_collection,
+    get_async_message_bucket_collection,
+    get_async_archive_collection,
+    get_async_vector_collection,
+)
+from app.core.config import (
+    MESSAGE_STORAGE,
+    ARCHIVE_AFTER_DAYS,
+    ARCHIVE_BLOCK_SIZE,
+    ARCHIVE_INTERVAL_MINUTES,
+    ARCHIVE_DROP_VECTORS,
+)
+from app.core.mongo import ARCHIVE_INDEXES
+from app.core.read_profiles import with_profile
+from app.services.message_store import message_store, pack_block
+
+logger = logging.getLogger(__name__)
+
+LEASE_COLLECTION = "archive_lease"
+
+
+async def collection_sizes(collection) -> dict:
+    """Document count, data size and index sizes of a collection ($collStats)."""
+    try:
+        cursor = with_profile(collection, "analytics").aggregate([{"$collStats": {"storageStats": {}}}])
+        stats = (await cursor.to_list(length=1))[0]["storageStats"]
+    except Exception as e:
+        return {"error": str(e)}
+    return {
+        "count": stats.get("count", 0),
+        "data_mb": round(stats.get("size", 0) / 2**20, 2),
+        "storage_mb": round(stats.get("storageSize", 0) / 2**20, 2),
+        "index_mb": round(stats.get("totalIndexSize", 0) / 2**20, 2),
+        "indexes_mb": {name: round(size / 2**20, 2) for name, size in stats.get("indexSizes", {}).items()},
+    }
+
+
+class MessageArchiver:
+    """Archives old messages chat by chat; see the module docstring."""
+
+    def __init__(
+        self,
+        after_days: float = ARCHIVE_AFTER_DAYS,
+        block_size: int = ARCHIVE_BLOCK_SIZE,
+        interval_minutes: float = ARCHIVE_INTERVAL_MINUTES,
+        drop_vectors: bool = ARCHIVE_DROP_VECTORS,
+        layout: str = MESSAGE_STORAGE,
+    ):
+        self.after = timedelta(days=after_days)
+        self.block_size = block_size
+        self.interval = interval_minutes * 60
+        self.drop_vectors = drop_vectors
+        self.layout = layout
+        self.worker_id = f"{os.uname().nodename}:{os.getpid()}"
+        self._task: Optional[asyncio.Task] = None
+        self._indexes_ready = False
+
+        self.runs = 0
+        self.chats = 0
+        self.messages_archived = 0
+        self.blocks_written = 0
+        self.vectors_removed = 0
+        self.last_run_at: Optional[str] = None
+        self.last_run_ms = 0.0
+        self.last_error: Optional[str] = None
+
+    def _hot(self):
+        if self.layout == "buckets":
+            return get_async_message_bucket_collection()
+        return get_async_message_collection()
+
+    async def tier_sizes(self) -> dict:
+        return {
+            "hot_messages": await collection_sizes(self._hot()),
+            "hot_vectors": await collection_sizes(get_async_vector_collection()),
+            "archive": await collection_sizes(get_async_archive_collection()),
+        }
+
+    async def run_once(self, after: Optional[timedelta] = None, dry_run: bool = False) -> dict:
+        """Archive everything older than `after` (default ARCHIVE_AFTER_DAYS); returns what was moved."""
+        started = time.perf_counter()
+        cutoff = datetime.utcnow() - (after or self.after)
+        if not dry_run and not self._indexes_ready:
+            for keys in ARCHIVE_INDEXES:
+                await get_async_archive_collection().create_index(keys)
+            self._indexes_ready = True
+
+        if self.layout == "buckets":
+            match, count = {"end": {"$lt": cutoff}}, "$count"
+        else:
+            match, count = {"created_at": {"$lt": cutoff}}, 1
+        cursor = self._hot().aggregate([
+            {"$match": match},
+            {"$group": {"_id": {"group_id": "$group_id", "chat_id": "$chat_id"}, "messages": {"$sum": count}}},
+        ])
+        chats = await cursor.to_list(length=None)
+
+        report = {"cutoff": cutoff.isoformat(), "chats": len(chats), "messages": 0, "blocks": 0, "vectors": 0}
+        for chat in chats:
+            group_id, chat_id = chat["_id"]["group_id"], chat["_id"]["chat_id"]
+            if dry_run:
+                report["messages"] += chat["messages"]
+                report["blocks"] += -(-chat["messages"] // self.block_size)
+                continue
+            if self.layout == "buckets":
+                await self._archive_buckets(group_id, chat_id, cutoff, report)
+            else:
+                await self._archive_documents(group_id, chat_id, cutoff, report)
+
+        if not dry_run:
+            self.runs += 1
+            self.chats += report["chats"]
+            self.messages_archived += report["messages"]
+            self.blocks_written += report["blocks"]
+            self.vectors_removed += report["vectors"]
+            self.last_run_at = datetime.utcnow().isoformat()
+            self.last_run_ms = round((time.perf_counter() - started) * 1000, 1)
+        logger.info(f"Archived {report['messages']} messages of {report['chats']} chats "
+                    f"in {report['blocks']} blocks (cutoff {report['cutoff']}{', dry run' if dry_run else ''})")
+        return report
+
+    async def _archive_documents(self, group_id: str, chat_id: str, cutoff: datetime, report: dict):
+        messages = get_async_message_collection()
+        cursor = messages.find(
+            {"group_id": group_id, "chat_id": chat_id, "created_at": {"$lt": cutoff}}
+        ).sort([("created_at", 1), ("_id", 1)]).batch_size(self.block_size)
+
+        chunk = []
+        async for doc in cursor:
+            chunk.append(doc)
+            if len(chunk) == self.block_size:
+                await self._store_block(group_id, chat_id, chunk, report)
+                await messages.delete_many({"_id": {"$in": [m["_id"] for m in chunk]}})
+                chunk = []
+        if chunk:
+            await self._store_block(group_id, chat_id, chunk, report)
+            await messages.delete_many({"_id": {"$in": [m["_id"] for m in chunk]}})
+
+    async def _archive_buckets(self, group_id: str, chat_id: str, cutoff: datetime, report: dict):
+        buckets = get_async_message_bucket_collection()
+        cursor = buckets.find(
+            {"group_id": group_id, "chat_id": chat_id, "end": {"$lt": cutoff}}
+        ).sort("start", 1).batch_size(4)
+
+        # Whole buckets go into a block until it holds at least block_size messages
+        bucket_ids, chunk = [], []
+        async for bucket in cursor:
+            bucket_ids.append(bucket["_id"])
+            chunk.extend(bucket.get("messages", ()))
+            if len(chunk) >= self.block_size:
+                await self._store_block(group_id, chat_id, chunk, report)
+                await buckets.delete_many({"_id": {"$in": bucket_ids}})
+                bucket_ids, chunk = [], []
+        if chunk:
+            await self._store_block(group_id, chat_id, chunk, report)
+            await buckets.delete_many({"_id": {"$in": bucket_ids}})
+
+    async def _store_block(self, group_id: str, chat_id: str, messages: list, report: dict):
+        messages.sort(key=lambda m: (m["created_at"], m["_id"]))
+        block = pack_block(group_id, chat_id, messages)
+        await get_async_archive_collection().replace_one({"_id": block["_id"]}, block, upsert=True)
+        report["messages"] += len(messages)
+        report["blocks"] += 1
+        if self.drop_vectors:
+            result = await get_async_vector_collection().delete_many(
+                {"message_id": {"$in": [str(m["_id"]) for m in messages]}}
+            )
+            report["vectors"] += result.deleted_count
+
+    # --- background runs ----------------------------------------------------
+
+    async def _acquire_lease(self) -> bool:
+        now = datetime.utcnow()
+        try:
+            await get_async_db()[LEASE_COLLECTION].find_one_and_update(
+                {"_id": "archiver", "until": {"$lt": now}},
+                {"$set": {"until": now + timedelta(seconds=self.interval), "owner": self.worker_id}},
+                upsert=True,
+                return_document=ReturnDocument.AFTER,
+            )
+            return True
+        except DuplicateKeyError:
+            # Lease document exists and has not expired: another worker holds it
+            return False
+
+    async def _run(self):
+        while True:
+            try:
+                if await self._acquire_lease():
+                    await self.run_once()
+                    self.last_error = None
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.last_error = str(e)
+                logger.error(f"Archiving failed: {e}", exc_info=True)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """Run periodically when ARCHIVE_INTERVAL_MINUTES is set. Call from the application startup hook."""
+        if self.interval <= 0 or self._task is not None:
+            return
+        self._task = asyncio.create_task(self._run(), name="archiver")
+        logger.info(f"Archiver started (every {self.interval / 60:g} min, older than {self.after.days} days)")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    def stats(self) -> dict:
+        return {
+            "scheduled": self._task is not None,
+            "runs": self.runs,
+            "chats": self.chats,
+            "messages_archived": self.messages_archived,
+            "blocks_written": self.blocks_written,
+            "vectors_removed": self.vectors_removed,
+            "last_run_at": self.last_run_at,
+            "last_run_ms": self.last_run_ms,
+            "last_error": self.last_error,
+            "archive_reads": getattr(message_store, "archive_reads", None),
+        }
+
+
+archiver = MessageArchiver()
+
+
+async def _main(args):
+    await initialize_async_database()
+    after = timedelta(days=args.older_than_days) if args.older_than_days is not None else None
+    before = await archiver.tier_sizes()
+    result = await archiver.run_once(after, dry_run=args.dry_run)
+    after_sizes = before if args.dry_run else await archiver.tier_sizes()
+    print(json.dumps({"archived": result, "before": before, "after": after_sizes}, indent=2))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move old chat history to the compressed archive")
+    parser.add_argument("--older-than-days", type=float, help=f"default ARCHIVE_AFTER_DAYS ({ARCHIVE_AFTER_DAYS:g})")
+    parser.add_argument("--dry-run", action="store_true", help="only count what would be archived")
+    asyncio.run(_main(parser.parse_args()))
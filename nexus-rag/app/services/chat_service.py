@@ -1,107 +1,191 @@
 from datetime import datetime
 import logging
-import asyncio
+from typing import Awaitable, Callable
 
-from app.core.mongo import get_message_collection
 from app.rag.retriever import retrieve_context
 from app.generator.prompt import build_prompt
 from app.generator.service import generate_answer
+from app.generator.llm import stream_answer
+from app.services.history_buffer import room_history
+from app.services.presence import group_room
+from app.services.message_log import message_log
+from app.core.logging import trace
+from app.storage import storage
 
 logger = logging.getLogger(__name__)
 
 
+async def _fetch_group_members(group_id: str, user_email: str) -> list:
+    """Member list for the prompt, online members marked; personal spaces only contain the owner."""
+    import bson
+
+    try:
+        if group_id.startswith("personal_"):
+            return [user_email]
+
+        oid = bson.ObjectId(group_id)
+        group_doc = await storage.groups.get(oid)
+        group_members = []
+        if group_doc:
+            group_members = group_doc.get("members", [])
+            if not group_members and group_doc.get("user_id"):
+                group_members = [group_doc["user_id"]]
+    except Exception as e:
+        logger.error(f"Error fetching group members: {e}")
+        return [user_email]
+
+    # Tell the model who is around right now
+    try:
+        from app.socketio import presence
+        online = set(await presence.members(group_room(group_id)))
+    except Exception as e:
+        logger.warning(f"Could not read presence for {group_id}: {e}")
+        return group_members
+    return [f"{m} (online)" if m in online else m for m in group_members]
+
+
+async def _prepare_prompt(
+    user_query: str,
+    group_id: str,
+    chat_id: str,
+    user_email: str,
+    user_name: str | None,
+    history: list | None,
+    reply_to_context: str | None,
+):
+    """Retrieve context and build the prompt. Returns (prompt, retrieved_documents)."""
+    if history is None:
+        # Recent messages of the room from the in-memory ring buffer (Mongo only on a miss)
+        room = f"{group_id}:{chat_id}"
+        history = await room_history.get(room, group_id, chat_id)
+        trace("ai.history", "AI history loaded", room=room, count=len(history), history=history)
+
+    # Retrieve Context (the query is embedded off the event loop)
+    documents = await retrieve_context(
+        query=user_query,
+        group_id=group_id,
+        chat_id=chat_id,
+        top_k=5,
+    )
+
+    group_members = await _fetch_group_members(group_id, user_email)
+
+    prompt = build_prompt(
+        user_query=user_query,
+        user_name=user_name if user_name else user_email,
+        retrieved_docs=documents,
+        chat_history=history,
+        group_members=group_members,
+        reply_to_context=reply_to_context
+    )
+    return prompt, documents
+
+
+async def _store_assistant_message(user_email: str, group_id: str, chat_id: str, answer: str) -> tuple:
+    """Persist an assistant reply and return (id, sequence number)."""
+    doc = {
+        "user_id": user_email,
+        "group_id": group_id,
+        "chat_id": chat_id,
+        "role": "assistant",
+        "content": answer,
+        "created_at": datetime.utcnow(),
+    }
+    seq = await message_log.insert(doc)
+    return str(doc["_id"]), seq
+
+
 async def process_chat_message(
     user_query: str,
     group_id: str,
     chat_id: str,
     user_email: str,
     user_name: str | None = None,
-    history: list = [],
-    reply_to_context: str | None = None
+    history: list | None = None,
+    reply_to_context: str | None = None,
+    on_commit: Callable[[], None] | None = None
 ):
     """
     Core RAG logic for processing chat messages.
-    
+
     1. Retrieve relevant context from vector store
     2. Build prompt with context and history
     3. Generate AI response
     4. Store response in database
-    
+
     Args:
         user_query: The user's input message
         group_id: Group identifier
         chat_id: Chat identifier
         user_email: User's email (from JWT)
         user_name: User's display name for AI context
-        history: List of recent messages for context
-    
+        history: List of recent messages for context (default: the room's history buffer)
+        on_commit: Called right before the answer is stored
+
     Returns:
-        Tuple of (answer, retrieved_documents)
+        Tuple of (answer, retrieved_documents, message_id, seq); message_id and
+        seq are None when the fallback answer is returned
     """
     try:
         logger.debug(f"Processing chat message for user: {user_email} ({user_name})")
-        
-        # 1. Retrieve Context (Run in executor to avoid blocking)
-        loop = asyncio.get_running_loop()
-        
-        documents = await loop.run_in_executor(
-            None,
-            lambda: retrieve_context(
-                query=user_query,
-                group_id=group_id,
-                chat_id=chat_id,
-                top_k=5,
-            )
-        )
 
-        # 1.5 Fetch Group Members (Context)
-        from app.core.mongo import get_db
-        import bson
-        db = get_db()
-        
-        group_members = []
-        try:
-            if group_id.startswith("personal_"):
-                 group_members = [user_email]
-            else:
-                oid = bson.ObjectId(group_id)
-                group_doc = db.groups.find_one({"_id": oid})
-                if group_doc:
-                    group_members = group_doc.get("members", [])
-                    if not group_members and group_doc.get("user_id"):
-                         group_members = [group_doc["user_id"]]
-        except Exception as e:
-            logger.error(f"Error fetching group members: {e}")
-            group_members = [user_email]
-
-        # 2. Build Prompt
-        prompt = build_prompt(
-            user_query=user_query,
-            user_name=user_name if user_name else user_email,
-            retrieved_docs=documents,
-            chat_history=history,
-            group_members=group_members,
-            reply_to_context=reply_to_context
+        # 1-2. Retrieve context and build prompt
+        prompt, documents = await _prepare_prompt(
+            user_query, group_id, chat_id, user_email, user_name, history, reply_to_context
         )
 
         # 3. Generate Answer
         answer = await generate_answer(prompt)
 
         # 4. Store Assistant Message
-        messages_col = get_message_collection()
-        messages_col.insert_one({
-            "user_id": user_email,
-            "group_id": group_id,
-            "chat_id": chat_id,
-            "role": "assistant",
-            "content": answer,
-            "created_at": datetime.utcnow(),
-        })
-
-        return answer, documents
+        if on_commit:
+            on_commit()
+        message_id, seq = await _store_assistant_message(user_email, group_id, chat_id, answer)
+
+        return answer, documents, message_id, seq
 
     except Exception as e:
         logger.error(f"Error in process_chat_message: {e}", exc_info=True)
         # Return a fallback message or re-raise
         # For now, let's return a generic error message so the client doesn't hang
-        return "I apologize, but I encountered an internal error while processing your request.", []
+        return "I apologize, but I encountered an internal error while processing your request.", [], None, None
+
+
+async def stream_chat_message(
+    user_query: str,
+    group_id: str,
+    chat_id: str,
+    user_email: str,
+    on_delta: Callable[[str], Awaitable[None]],
+    user_name: str | None = None,
+    history: list | None = None,
+    reply_to_context: str | None = None,
+    on_commit: Callable[[], None] | None = None
+):
+    """
+    Streaming variant of process_chat_message.
+
+    Text deltas are passed to `on_delta` as the LLM produces them; the complete
+    answer is stored once, after the stream finishes. If the surrounding task is
+    cancelled mid-stream nothing is stored. `on_commit` is called right before
+    the answer is stored.
+
+    Returns:
+        Tuple of (answer, retrieved_documents, message_id, seq)
+    """
+    logger.debug(f"Streaming chat message for user: {user_email} ({user_name})")
+
+    prompt, documents = await _prepare_prompt(
+        user_query, group_id, chat_id, user_email, user_name, history, reply_to_context
+    )
+
+    parts = []
+    async for delta in stream_answer(prompt):
+        parts.append(delta)
+        await on_delta(delta)
+
+    answer = "".join(parts)
+    if on_commit:
+        on_commit()
+    message_id, seq = await _store_assistant_message(user_email, group_id, chat_id, answer)
+    return answer, documents, message_id, seq
@@ -0,0 +1,139 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from app.core.config import (
+    EMIT_BATCHING_ENABLED,
+    EMIT_BATCH_WINDOW_MS,
+    EMIT_BATCH_HOT_ROOM_RATE,
+    EMIT_BATCH_MAX_EVENTS,
+)
+
+logger = logging.getLogger(__name__)
+
+# Room events that may be merged into one "event_batch" packet
+BATCHED_EVENTS = ("new_message", "message_updated", "message_deleted")
+
+
+class _RoomBatch:
+    __slots__ = ("window_start", "window_count", "pending", "flush_task")
+
+    def __init__(self):
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.pending: list = []
+        self.flush_task: Optional[asyncio.Task] = None
+
+
+class RoomEmitBatcher:
+    """
+    Micro-batches message events for hot rooms.
+
+    Quiet rooms are emitted to immediately. Once a room has seen `hot_rate`
+    batched events within the current second, the next event opens a batch:
+    events arriving during the following `window_ms` are appended in order and
+    sent as a single packet
+
+        event_batch {"events": [{"event": "new_message", "data": {...}}, ...]}
+
+    so N messages to M members cost M frames per window instead of N x M.
+    While a batch is open every batched event for that room goes into it,
+    which keeps the room's events in order.
+    """
+
+    def __init__(
+        self,
+        emit: Callable[..., Awaitable],
+        enabled: bool = EMIT_BATCHING_ENABLED,
+        window_ms: int = EMIT_BATCH_WINDOW_MS,
+        hot_rate: int = EMIT_BATCH_HOT_ROOM_RATE,
+        max_events: int = EMIT_BATCH_MAX_EVENTS,
+    ):
+        self._emit = emit
+        self.enabled = enabled
+        self.window = window_ms / 1000
+        self.hot_rate = hot_rate
+        self.max_events = max_events
+        self._rooms: dict = {}  # room -> _RoomBatch
+
+        self.events = 0
+        self.immediate_emits = 0
+        self.batches = 0
+        self.batched_events = 0
+
+    async def emit(self, event: str, data: dict, room: str):
+        """Emit a room event, batching it if the room is hot."""
+        self.events += 1
+        if not self.enabled or event not in BATCHED_EVENTS:
+            self.immediate_emits += 1
+            await self._emit(event, data, room=room)
+            return
+
+        state = self._rooms.get(room)
+        if state is None:
+            state = self._rooms[room] = _RoomBatch()
+
+        now = time.monotonic()
+        if now - state.window_start >= 1.0:
+            state.window_start = now
+            state.window_count = 0
+        state.window_count += 1
+
+        if state.pending:
+            state.pending.append({"event": event, "data": data})
+            if len(state.pending) >= self.max_events:
+                await self._flush(room, state)
+            return
+
+        if state.window_count > self.hot_rate:
+            state.pending.append({"event": event, "data": data})
+            state.flush_task = asyncio.create_task(self._flush_later(room, state))
+            return
+
+        self.immediate_emits += 1
+        await self._emit(event, data, room=room)
+        self._prune()
+
+    async def _flush_later(self, room: str, state: _RoomBatch):
+        await asyncio.sleep(self.window)
+        state.flush_task = None
+        await self._flush(room, state)
+
+    async def _flush(self, room: str, state: _RoomBatch):
+        if state.flush_task is not None and state.flush_task is not asyncio.current_task():
+            state.flush_task.cancel()
+            state.flush_task = None
+
+        events, state.pending = state.pending, []
+        if not events:
+            return
+        self.batches += 1
+        self.batched_events += len(events)
+        try:
+            await self._emit("event_batch", {"events": events}, room=room)
+        except Exception as e:
+            logger.error(f"Failed to emit event batch of {len(events)} to {room}: {e}", exc_info=True)
+
+    def _prune(self):
+        """Forget rooms that went quiet so the map only holds recently active rooms."""
+        if len(self._rooms) > 10_000:
+            cutoff = time.monotonic() - 60
+            for key, other in list(self._rooms.items()):
+                if not other.pending and other.window_start < cutoff:
+                    del self._rooms[key]
+
+    async def flush_all(self):
+        """Send every open batch now (shutdown)."""
+        for room, state in list(self._rooms.items()):
+            await self._flush(room, state)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "events": self.events,
+            "immediate_emits": self.immediate_emits,
+            "batches": self.batches,
+            "batched_events": self.batched_events,
+            "avg_batch_size": round(self.batched_events / self.batches, 2) if self.batches else 0,
+        }
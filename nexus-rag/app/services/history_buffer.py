@@ -0,0 +1,220 @@
+import asyncio
+import logging
+import sys
+import time
+from collections import OrderedDict, deque
+from typing import Optional
+
+from app.core.config import (
+    HISTORY_BUFFER_SIZE,
+    HISTORY_BUFFER_MAX_ROOMS,
+    HISTORY_BUFFER_IDLE_SECONDS,
+    HISTORY_BUFFER_MAX_AGE_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+AI_SENDER = "Nexus AI"
+DELETED_CONTENT = "This message was deleted"
+
+
+class HistoryEntry:
+    """One message as the AI prompt sees it"""
+
+    __slots__ = ("id", "role", "content", "sender")
+
+    def __init__(self, id: Optional[str], role: str, content: str, sender: str):
+        self.id = id
+        self.role = role
+        self.content = content
+        self.sender = sender
+
+    @classmethod
+    def from_doc(cls, doc: dict) -> "HistoryEntry":
+        role = doc.get("role", "user")
+        sender = doc.get("user_id") if role == "user" else AI_SENDER
+        return cls(str(doc["_id"]) if doc.get("_id") else None, role, doc.get("content", ""), sender)
+
+    def as_dict(self) -> dict:
+        return {"role": self.role, "content": self.content, "sender": self.sender}
+
+
+class _RoomHistory:
+    __slots__ = ("entries", "loaded_at", "last_used", "loading", "pending")
+
+    def __init__(self, size: int):
+        self.entries: deque = deque(maxlen=size)
+        self.loaded_at = 0.0
+        self.last_used = time.monotonic()
+        self.loading: Optional[asyncio.Future] = None
+        self.pending: list = []  # ops that arrived while loading
+
+
+class RoomHistoryBuffer:
+    """
+    Bounded ring buffer of the most recent messages per active room.
+
+    A room is loaded from Mongo once (first join or first AI trigger) and then
+    kept current by the socket handlers: append on send, update on edit/delete.
+    Events from other workers arrive through the client manager's remote event
+    tap (see app/core/socket_manager.py). Reading the AI context is then a copy of
+    at most `size` entries instead of a sorted query.
+
+    Rooms are kept in LRU order and evicted when idle for `idle_seconds` or past
+    `max_rooms`. A buffer older than `max_age_seconds` is reloaded, since writes
+    that bypass the socket handlers (e.g. HTTP /query) are not seen.
+    """
+
+    def __init__(
+        self,
+        size: int = HISTORY_BUFFER_SIZE,
+        max_rooms: int = HISTORY_BUFFER_MAX_ROOMS,
+        idle_seconds: int = HISTORY_BUFFER_IDLE_SECONDS,
+        max_age_seconds: int = HISTORY_BUFFER_MAX_AGE_SECONDS,
+    ):
+        self.size = size
+        self.max_rooms = max_rooms
+        self.idle_seconds = idle_seconds
+        self.max_age_seconds = max_age_seconds
+        self._rooms: "OrderedDict[str, _RoomHistory]" = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _evict(self, now: float):
+        while self._rooms:
+            room, state = next(iter(self._rooms.items()))
+            if len(self._rooms) <= self.max_rooms and now - state.last_used <= self.idle_seconds:
+                break
+            self._rooms.popitem(last=False)
+            self.evictions += 1
+
+    def _touch(self, room: str, now: float) -> Optional[_RoomHistory]:
+        state = self._rooms.get(room)
+        if state is not None:
+            self._rooms.move_to_end(room)
+            state.last_used = now
+        return state
+
+    async def _load(self, room: str, group_id: str, chat_id: str) -> _RoomHistory:
+        from app.services.message_store import message_store
+
+        state = _RoomHistory(self.size)
+        state.loading = asyncio.get_running_loop().create_future()
+        self._rooms[room] = state
+        self._rooms.move_to_end(room)
+        self._evict(time.monotonic())
+
+        try:
+            # From the primary: events after this load are applied on top of it
+            docs = await message_store.page(group_id, chat_id, limit=self.size, profile="primary")
+        except Exception:
+            if self._rooms.get(room) is state:
+                del self._rooms[room]
+            state.loading.set_result(False)
+            state.loading = None
+            raise
+
+        state.entries.extend(HistoryEntry.from_doc(doc) for doc in docs)
+        for op in state.pending:
+            self._apply(state, *op)
+        state.pending = []
+        state.loaded_at = time.monotonic()
+        state.loading.set_result(True)
+        state.loading = None
+        return state
+
+    async def get(self, room: str, group_id: str, chat_id: str) -> list:
+        """Recent history of the room as [{role, content, sender}], oldest first."""
+        now = time.monotonic()
+        state = self._touch(room, now)
+
+        if state is not None and state.loading is not None:
+            # Someone else is loading it; share their query
+            if not await state.loading:
+                raise RuntimeError(f"Loading history for {room} failed")
+            self.hits += 1
+        elif state is None or now - state.loaded_at > self.max_age_seconds:
+            self.misses += 1
+            state = await self._load(room, group_id, chat_id)
+        else:
+            self.hits += 1
+
+        return [entry.as_dict() for entry in state.entries]
+
+    async def warm(self, room: str, group_id: str, chat_id: str):
+        """Load the room if it isn't buffered yet (on join)."""
+        if self._touch(room, time.monotonic()) is None:
+            await self._load(room, group_id, chat_id)
+
+    def _apply(self, state: _RoomHistory, op: str, *args):
+        if op == "append":
+            entry = args[0]
+            if entry.id is not None and any(e.id == entry.id for e in state.entries):
+                return
+            state.entries.append(entry)
+        elif op == "update":
+            message_id, content = args
+            for entry in state.entries:
+                if entry.id == message_id:
+                    entry.content = content
+                    break
+
+    def _record(self, room: str, *op):
+        state = self._rooms.get(room)
+        if state is None:
+            # Not buffered; the next read loads it from Mongo anyway
+            return
+        if state.loading is not None:
+            state.pending.append(op)
+        else:
+            self._apply(state, *op)
+
+    def append(self, room: str, message_id: Optional[str], role: str, content: str, sender: str):
+        self._record(room, "append", HistoryEntry(message_id, role, content, sender))
+
+    def update(self, room: str, message_id: str, content: str):
+        self._record(room, "update", message_id, content)
+
+    def invalidate(self, room: str):
+        self._rooms.pop(room, None)
+
+    def on_room_event(self, event: str, data, room: str):
+        """Follow room events emitted by other workers (remote event tap)."""
+        if event == "event_batch":
+            for item in data.get("events", []):
+                self.on_room_event(item["event"], item["data"], room)
+        elif event == "new_message":
+            if data.get("error"):
+                return
+            role = data.get("role", "user")
+            sender = data.get("sender") if role == "user" else AI_SENDER
+            self.append(room, data.get("id"), role, data.get("content", ""), sender)
+        elif event == "message_updated":
+            self.update(room, data["id"], data["content"])
+        elif event == "message_deleted" and data.get("type") == "everyone":
+            self.update(room, data["id"], DELETED_CONTENT)
+
+    def _room_bytes(self, state: _RoomHistory) -> int:
+        size = sys.getsizeof(state) + sys.getsizeof(state.entries)
+        for entry in state.entries:
+            size += sys.getsizeof(entry) + sys.getsizeof(entry.content)
+            size += sys.getsizeof(entry.id) if entry.id else 0
+        return size
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        total_bytes = sum(self._room_bytes(state) for state in self._rooms.values())
+        return {
+            "rooms": len(self._rooms),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0,
+            "evictions": self.evictions,
+            "bytes_total": total_bytes,
+            "bytes_per_room": total_bytes // len(self._rooms) if self._rooms else 0,
+        }
+
+
+room_history = RoomHistoryBuffer()
@@ -0,0 +1,171 @@
+import sys
+import time
+import logging
+from typing import Iterable, Optional
+
+from app.core.config import MEMBERSHIP_INDEX_TTL_SECONDS, MEMBERSHIP_RECHECK_SECONDS
+
+logger = logging.getLogger(__name__)
+
+
+class GroupMembership:
+    """Members and chat ids of one group, as sets for O(1) lookups."""
+
+    __slots__ = ("owner", "members", "chats", "loaded_at")
+
+    def __init__(self, owner: Optional[str], members: Iterable[str], chats: Iterable[str]):
+        self.owner = sys.intern(owner) if owner else None
+        # Interned so an email shared by many groups is stored once
+        self.members = {sys.intern(m) for m in members}
+        if self.owner:
+            self.members.add(self.owner)
+        self.chats = {sys.intern(c) for c in chats}
+        self.loaded_at = time.monotonic()
+
+    @classmethod
+    def from_doc(cls, doc: Optional[dict]) -> "GroupMembership":
+        if not doc:
+            # Tombstone: remembered as "no such group" until it expires
+            return cls(None, (), ())
+        return cls(
+            doc.get("user_id"),
+            doc.get("members", []),
+            [c["id"] for c in doc.get("chats", []) if c.get("id")],
+        )
+
+
+class MembershipIndex:
+    """
+    Per-worker index answering "may this user use this group_id:chat_id room".
+
+    Groups are loaded from the groups collection when a user's socket connects
+    and kept up to date by the group endpoints on this worker. Changes made on
+    other workers are picked up when an entry expires (ttl_seconds) or, for
+    denials, once it is older than recheck_seconds.
+    """
+
+    def __init__(
+        self,
+        ttl_seconds: int = MEMBERSHIP_INDEX_TTL_SECONDS,
+        recheck_seconds: int = MEMBERSHIP_RECHECK_SECONDS,
+    ):
+        self.ttl_seconds = ttl_seconds
+        self.recheck_seconds = recheck_seconds
+        self._groups: dict = {}  # group_id -> GroupMembership
+        self.checks = 0
+        self.reloads = 0
+        self.denied = 0
+
+    # ----- Loading -----
+
+    def put_doc(self, doc: dict):
+        self._groups[str(doc["_id"])] = GroupMembership.from_doc(doc)
+
+    async def load_for_user(self, email: str) -> list:
+        """Index every group the user owns or belongs to (one query per connection); returns their ids."""
+        from app.storage import storage
+
+        group_ids = []
+        for doc in await storage.groups.for_member(email, {"user_id": 1, "members": 1, "chats.id": 1}):
+            self.put_doc(doc)
+            group_ids.append(str(doc["_id"]))
+        return group_ids
+
+    async def _reload_group(self, group_id: str) -> GroupMembership:
+        from bson import ObjectId
+        from bson.errors import InvalidId
+        from app.storage import storage
+
+        self.reloads += 1
+        try:
+            oid = ObjectId(group_id)
+        except (InvalidId, TypeError):
+            doc = None
+        else:
+            doc = await storage.groups.get(oid, {"user_id": 1, "members": 1, "chats.id": 1})
+        entry = GroupMembership.from_doc(doc)
+        self._groups[group_id] = entry
+        return entry
+
+    # ----- Checks -----
+
+    @staticmethod
+    def _allows(entry: GroupMembership, email: str, chat_id: str) -> bool:
+        return email in entry.members and chat_id in entry.chats
+
+    def can_access(self, email: str, group_id: str, chat_id: str) -> Optional[bool]:
+        """
+        O(1) answer from the index. None means the index can't answer
+        (group not loaded or entry expired) and the caller should use check().
+        """
+        self.checks += 1
+        if group_id == f"personal_{email}":
+            return True
+
+        entry = self._groups.get(group_id)
+        if entry is None:
+            return None
+
+        age = time.monotonic() - entry.loaded_at
+        if age > self.ttl_seconds:
+            return None
+        if self._allows(entry, email, chat_id):
+            return True
+        if age > self.recheck_seconds:
+            return None
+        return False
+
+    async def check(self, email: str, group_id: str, chat_id: str) -> bool:
+        """Authorize a room, falling back to one groups lookup when the index can't answer."""
+        if not group_id or not chat_id:
+            self.denied += 1
+            return False
+
+        allowed = self.can_access(email, group_id, chat_id)
+        if allowed is None:
+            entry = await self._reload_group(group_id)
+            allowed = self._allows(entry, email, chat_id)
+
+        if not allowed:
+            self.denied += 1
+        return allowed
+
+    # ----- Updates from the group endpoints -----
+
+    def add_group(self, group_id: str, owner: str, members: Iterable[str], chats: Iterable[str]):
+        self._groups[group_id] = GroupMembership(owner, members, chats)
+
+    def remove_group(self, group_id: str):
+        self._groups.pop(group_id, None)
+
+    def add_member(self, group_id: str, email: str):
+        entry = self._groups.get(group_id)
+        if entry is not None:
+            entry.members.add(sys.intern(email))
+
+    def remove_member(self, group_id: str, email: str):
+        entry = self._groups.get(group_id)
+        if entry is not None:
+            entry.members.discard(email)
+
+    def add_chat(self, group_id: str, chat_id: str):
+        entry = self._groups.get(group_id)
+        if entry is not None:
+            entry.chats.add(sys.intern(chat_id))
+
+    def remove_chat(self, group_id: str, chat_id: str):
+        entry = self._groups.get(group_id)
+        if entry is not None:
+            entry.chats.discard(chat_id)
+
+    def stats(self) -> dict:
+        return {
+            "groups": len(self._groups),
+            "memberships": sum(len(g.members) for g in self._groups.values()),
+            "checks": self.checks,
+            "reloads": self.reloads,
+            "denied": self.denied,
+        }
+
+
+membership_index = MembershipIndex()
@@ -0,0 +1,163 @@
+"""
+Move chat messages between the document and the bucketed layout.
+
+Run from nexus-rag/ with the app stopped (or with no writes to the chats being
+moved), then set MESSAGE_STORAGE to match:
+
+    python -m app.services.message_buckets_migration --to buckets [--group G [--chat C]] [--delete-source]
+    python -m app.services.message_buckets_migration --to documents [--group G [--chat C]] [--delete-source]
+
+Each chat is copied on its own: its target data is rebuilt from the source
+(so an interrupted run can simply be repeated), the copied message count is
+compared with the source, and only then, with --delete-source, is the source
+removed. --dry-run only reports what would be copied.
+"""
+import argparse
+import json
+import logging
+import math
+from typing import Optional
+
+from pymongo import ReplaceOne
+
+from app.core.config import MESSAGE_BUCKET_SIZE
+from app.core.mongo import (
+    initialize_database,
+    get_message_collection,
+    get_message_bucket_collection,
+    MESSAGE_BUCKET_INDEXES,
+)
+
+logger = logging.getLogger(__name__)
+
+# Bucket documents written per insert_many
+WRITE_BATCH = 50
+
+
+def _scope(group_id: Optional[str], chat_id: Optional[str]) -> dict:
+    scope = {}
+    if group_id:
+        scope["group_id"] = group_id
+    if chat_id:
+        scope["chat_id"] = chat_id
+    return scope
+
+
+def _chats(collection, scope: dict, count_field) -> list:
+    return list(collection.aggregate([
+        {"$match": scope},
+        {"$group": {"_id": {"group_id": "$group_id", "chat_id": "$chat_id"}, "messages": {"$sum": count_field}}},
+    ]))
+
+
+def _bucket(group_id: str, chat_id: str, docs: list) -> dict:
+    seqs = [doc["updated_seq"] for doc in docs if doc.get("updated_seq") is not None]
+    bucket = {
+        "group_id": group_id,
+        "chat_id": chat_id,
+        "count": len(docs),
+        "start": min(doc["created_at"] for doc in docs),
+        "end": max(doc["created_at"] for doc in docs),
+        "messages": [{k: v for k, v in doc.items() if k not in ("group_id", "chat_id")} for doc in docs],
+    }
+    if seqs:
+        bucket["updated_seq"] = max(seqs)
+    return bucket
+
+
+def to_buckets(group_id: Optional[str] = None, chat_id: Optional[str] = None,
+               bucket_size: int = MESSAGE_BUCKET_SIZE, delete_source: bool = False, dry_run: bool = False) -> dict:
+    """Copy message documents into full buckets of `bucket_size`, oldest first."""
+    messages = get_message_collection()
+    buckets = get_message_bucket_collection()
+    if not dry_run:
+        for keys in MESSAGE_BUCKET_INDEXES:
+            buckets.create_index(keys)
+
+    report = {"chats": 0, "messages": 0, "buckets": 0, "mismatched": []}
+    for chat in _chats(messages, _scope(group_id, chat_id), 1):
+        g, c, expected = chat["_id"]["group_id"], chat["_id"]["chat_id"], chat["messages"]
+        report["chats"] += 1
+        if dry_run:
+            report["messages"] += expected
+            report["buckets"] += math.ceil(expected / bucket_size)
+            continue
+
+        buckets.delete_many({"group_id": g, "chat_id": c})
+        copied, pending, chunk = 0, [], []
+        cursor = messages.find({"group_id": g, "chat_id": c}).sort([("created_at", 1), ("_id", 1)])
+        for doc in cursor:
+            chunk.append(doc)
+            if len(chunk) == bucket_size:
+                pending.append(_bucket(g, c, chunk))
+                chunk = []
+            if len(pending) == WRITE_BATCH:
+                buckets.insert_many(pending)
+                copied += sum(b["count"] for b in pending)
+                report["buckets"] += len(pending)
+                pending = []
+        if chunk:
+            pending.append(_bucket(g, c, chunk))
+        if pending:
+            buckets.insert_many(pending)
+            copied += sum(b["count"] for b in pending)
+            report["buckets"] += len(pending)
+
+        report["messages"] += copied
+        if copied != expected:
+            logger.error(f"{g}:{c}: copied {copied} of {expected} messages, keeping the documents")
+            report["mismatched"].append(f"{g}:{c}")
+        elif delete_source:
+            messages.delete_many({"group_id": g, "chat_id": c})
+    return report
+
+
+def to_documents(group_id: Optional[str] = None, chat_id: Optional[str] = None,
+                 delete_source: bool = False, dry_run: bool = False) -> dict:
+    """Copy bucketed messages back to one document per message."""
+    messages = get_message_collection()
+    buckets = get_message_bucket_collection()
+
+    report = {"chats": 0, "messages": 0, "buckets": 0, "mismatched": []}
+    for chat in _chats(buckets, _scope(group_id, chat_id), "$count"):
+        g, c, expected = chat["_id"]["group_id"], chat["_id"]["chat_id"], chat["messages"]
+        report["chats"] += 1
+        if dry_run:
+            report["messages"] += expected
+            report["buckets"] += buckets.count_documents({"group_id": g, "chat_id": c})
+            continue
+
+        copied = 0
+        for bucket in buckets.find({"group_id": g, "chat_id": c}).sort("start", 1).batch_size(WRITE_BATCH):
+            docs = [{**message, "group_id": g, "chat_id": c} for message in bucket.get("messages", ())]
+            if docs:
+                # Upserts by _id, so a repeated run does not duplicate messages
+                messages.bulk_write([ReplaceOne({"_id": doc["_id"]}, doc, upsert=True) for doc in docs], ordered=False)
+            copied += len(docs)
+            report["buckets"] += 1
+
+        report["messages"] += copied
+        if copied != expected:
+            logger.error(f"{g}:{c}: copied {copied} of {expected} messages, keeping the buckets")
+            report["mismatched"].append(f"{g}:{c}")
+        elif delete_source:
+            buckets.delete_many({"group_id": g, "chat_id": c})
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Move chat messages between the document and bucketed layouts")
+    parser.add_argument("--to", choices=("buckets", "documents"), required=True)
+    parser.add_argument("--group", help="only this group_id")
+    parser.add_argument("--chat", help="only this chat_id (with --group)")
+    parser.add_argument("--bucket-size", type=int, default=MESSAGE_BUCKET_SIZE)
+    parser.add_argument("--delete-source", action="store_true", help="remove each chat's source data once copied")
+    parser.add_argument("--dry-run", action="store_true")
+    args = parser.parse_args()
+
+    initialize_database()
+    if args.to == "buckets":
+        result = to_buckets(args.group, args.chat, args.bucket_size, args.delete_source, args.dry_run)
+    else:
+        result = to_documents(args.group, args.chat, args.delete_source, args.dry_run)
+    print(json.dumps(result, indent=2))
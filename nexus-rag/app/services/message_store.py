@@ -0,0 +1,478 @@
+import asyncio
+import logging
+import zlib
+from datetime import timedelta
+from typing import Callable, Optional
+
+import bson
+from bson import Binary, ObjectId
+from pymongo import ASCENDING, DESCENDING
+
+from app.core.async_mongo import (
+    get_async_message_collection,
+    get_async_message_bucket_collection,
+    get_async_archive_collection,
+)
+from app.core.read_profiles import with_profile
+from app.core.config import MESSAGE_STORAGE, MESSAGE_BUCKET_SIZE, MESSAGE_BUCKET_SPAN_HOURS, ARCHIVE_ENABLED
+
+logger = logging.getLogger(__name__)
+
+
+def page_query(group_id: str, chat_id: str, viewer: Optional[str] = None,
+               anchor: Optional[dict] = None, older: bool = True) -> dict:
+    """
+    Filter for one page of a chat, keyed on (created_at, _id).
+
+    With an anchor message, only messages strictly before it (older=True) or
+    after it are matched; _id breaks ties between messages with the same
+    created_at, so pages never skip or repeat a message. With a viewer,
+    messages they deleted for themselves are left out.
+    """
+    query = {"group_id": group_id, "chat_id": chat_id}
+    if viewer is not None:
+        query["deleted_for"] = {"$ne": viewer}
+    if anchor is not None:
+        op = "$lt" if older else "$gt"
+        query["$or"] = [
+            {"created_at": {op: anchor["created_at"]}},
+            {"created_at": anchor["created_at"], "_id": {op: anchor["_id"]}},
+        ]
+    return query
+
+
+def page_sort(older: bool = True) -> list:
+    direction = DESCENDING if older else ASCENDING
+    return [("created_at", direction), ("_id", direction)]
+
+
+def _page_key(doc: dict) -> tuple:
+    return doc["created_at"], doc["_id"]
+
+
+async def _page_from_ranges(collection, group_id: str, chat_id: str, viewer: Optional[str], anchor: Optional[dict],
+                            older: bool, limit: int, unpack: Callable, projection: Optional[dict] = None) -> list:
+    """
+    Keyset page over documents that each hold a run of a chat's messages and
+    their created_at range (`start`/`end`): buckets and archive blocks.
+    `unpack(doc)` returns the messages of one such document.
+    """
+    query = {"group_id": group_id, "chat_id": chat_id}
+    if older:
+        if anchor is not None:
+            query["start"] = {"$lte": anchor["created_at"]}
+        # Newest range first; once `limit` messages are picked, a range
+        # ending before the oldest of them (and every one after it) is out
+        cursor = collection.find(query, projection).sort("end", DESCENDING)
+    else:
+        if anchor is not None:
+            query["end"] = {"$gte": anchor["created_at"]}
+        cursor = collection.find(query, projection).sort("start", ASCENDING)
+    # These documents are large; don't pull a default-sized first batch of them
+    cursor = cursor.batch_size(4)
+
+    bound = _page_key(anchor) if anchor is not None else None
+    picked = []
+    async for doc in cursor:
+        if len(picked) >= limit:
+            edge = picked[-1]["created_at"]
+            if (doc["end"] < edge) if older else (doc["start"] > edge):
+                break
+        for message in unpack(doc):
+            if viewer is not None and viewer in message.get("deleted_for", ()):
+                continue
+            if bound is not None and ((_page_key(message) >= bound) if older else (_page_key(message) <= bound)):
+                continue
+            picked.append(message)
+        picked.sort(key=_page_key, reverse=older)
+        del picked[limit:]
+    await cursor.close()
+
+    picked.sort(key=_page_key)
+    return picked
+
+
+class DocumentMessageStore:
+    """
+    One document per message in `messages` (MESSAGE_STORAGE=documents).
+
+    Lookups by id and resume read the primary; history reads take a read
+    profile (app/core/read_profiles.py), "history" unless the caller needs to
+    see its own writes.
+    """
+
+    layout = "documents"
+
+    def __init__(self, collection: Callable = get_async_message_collection):
+        self._collection = collection
+
+    async def insert_one(self, doc: dict):
+        await self._collection().insert_one(doc)
+
+    async def insert_many(self, docs: list):
+        await self._collection().insert_many(docs, ordered=False)
+
+    async def get(self, group_id: str, chat_id: str, message_id: str) -> Optional[dict]:
+        return await self._collection().find_one(
+            {"_id": ObjectId(message_id), "group_id": group_id, "chat_id": chat_id}
+        )
+
+    async def update(self, group_id: str, chat_id: str, message_id: str, update: dict):
+        await self._collection().update_one(
+            {"_id": ObjectId(message_id), "group_id": group_id, "chat_id": chat_id}, update
+        )
+
+    async def page(self, group_id: str, chat_id: str, viewer: Optional[str] = None,
+                   anchor: Optional[dict] = None, older: bool = True, limit: int = 50,
+                   profile: str = "history") -> list:
+        """Up to `limit` messages before/after the anchor (latest without one), oldest first."""
+        cursor = with_profile(self._collection(), profile).find(
+            page_query(group_id, chat_id, viewer, anchor, older)
+        ).sort(page_sort(older)).limit(limit)
+        docs = await cursor.to_list(length=limit)
+        if older:
+            docs.reverse()
+        return docs
+
+    async def changed_since(self, group_id: str, chat_id: str, floor: int, limit: int) -> list:
+        """Up to `limit` messages with updated_seq > floor, in updated_seq order."""
+        cursor = self._collection().find(
+            {"group_id": group_id, "chat_id": chat_id, "updated_seq": {"$gt": floor}}
+        ).sort("updated_seq", 1).limit(limit)
+        return await cursor.to_list(length=limit)
+
+    async def user_messages(self, group_id: str, chat_id: str, user_id: str, profile: str = "history") -> list:
+        """Every message of one sender in a chat, oldest first."""
+        cursor = with_profile(self._collection(), profile).find(
+            {"user_id": user_id, "group_id": group_id, "chat_id": chat_id}
+        ).sort("created_at", 1)
+        return await cursor.to_list(length=None)
+
+    async def chat_ids(self, group_id: str, user_id: str, profile: str = "analytics") -> list:
+        """Ids of the chats of a group that `user_id` wrote in."""
+        cursor = with_profile(self._collection(), profile).aggregate([
+            {"$match": {"user_id": user_id, "group_id": group_id}},
+            {"$group": {"_id": "$chat_id"}},
+        ])
+        return [doc["_id"] async for doc in cursor]
+
+    async def delete(self, group_id: str, chat_id: Optional[str] = None):
+        """Drop the messages of a chat, or of every chat of a group."""
+        query = {"group_id": group_id}
+        if chat_id is not None:
+            query["chat_id"] = chat_id
+        await self._collection().delete_many(query)
+
+
+class BucketMessageStore:
+    """
+    Messages grouped into bucket documents (MESSAGE_STORAGE=buckets).
+
+    A bucket holds up to `bucket_size` messages of one chat in a `messages`
+    array, appended with $push, plus the summary fields reads need: `count`,
+    the `start`/`end` of its created_at range and the highest `updated_seq` of
+    its messages. With `span_hours`, a bucket whose first message is older
+    than that takes no more appends, so idle chats get time-bounded buckets.
+
+    Messages keep their `_id`, `seq` and other fields; group_id and chat_id are
+    stored once per bucket and put back on read, so callers get the same
+    documents as from DocumentMessageStore. Edits and deletes update the one
+    array element through an array filter. A page reads buckets newest range
+    first until no remaining bucket can hold a message of the page, so a
+    history read touches a handful of documents instead of one per message.
+    """
+
+    layout = "buckets"
+
+    def __init__(
+        self,
+        collection: Callable = get_async_message_bucket_collection,
+        bucket_size: int = MESSAGE_BUCKET_SIZE,
+        span_hours: float = MESSAGE_BUCKET_SPAN_HOURS,
+    ):
+        self._collection = collection
+        self.bucket_size = bucket_size
+        self.span = timedelta(hours=span_hours) if span_hours > 0 else None
+
+    @staticmethod
+    def _pack(doc: dict) -> dict:
+        return {k: v for k, v in doc.items() if k not in ("group_id", "chat_id")}
+
+    @staticmethod
+    def _unpack(bucket: dict, message: dict) -> dict:
+        return {**message, "group_id": bucket["group_id"], "chat_id": bucket["chat_id"]}
+
+    async def _append(self, group_id: str, chat_id: str, docs: list):
+        for doc in docs:
+            doc.setdefault("_id", ObjectId())
+        for i in range(0, len(docs), self.bucket_size):
+            chunk = docs[i:i + self.bucket_size]
+            times = [doc["created_at"] for doc in chunk]
+            query = {"group_id": group_id, "chat_id": chat_id, "count": {"$lte": self.bucket_size - len(chunk)}}
+            if self.span is not None:
+                query["start"] = {"$gt": min(times) - self.span}
+            update = {
+                "$push": {"messages": {"$each": [self._pack(doc) for doc in chunk]}},
+                "$inc": {"count": len(chunk)},
+                "$min": {"start": min(times)},
+                "$max": {"end": max(times)},
+            }
+            seqs = [doc["updated_seq"] for doc in chunk if doc.get("updated_seq") is not None]
+            if seqs:
+                update["$max"]["updated_seq"] = max(seqs)
+            # No open bucket matches -> the upsert starts a new one
+            await self._collection().update_one(query, update, upsert=True)
+
+    async def insert_one(self, doc: dict):
+        await self._append(doc["group_id"], doc["chat_id"], [doc])
+
+    async def insert_many(self, docs: list):
+        chats: dict = {}
+        for doc in docs:
+            chats.setdefault((doc["group_id"], doc["chat_id"]), []).append(doc)
+        results = await asyncio.gather(
+            *[self._append(group_id, chat_id, chat_docs) for (group_id, chat_id), chat_docs in chats.items()],
+            return_exceptions=True,
+        )
+        for result in results:
+            if isinstance(result, BaseException):
+                raise result
+
+    async def get(self, group_id: str, chat_id: str, message_id: str) -> Optional[dict]:
+        bucket = await self._collection().find_one(
+            {"group_id": group_id, "chat_id": chat_id, "messages._id": ObjectId(message_id)},
+            {"group_id": 1, "chat_id": 1, "messages.$": 1},
+        )
+        if not bucket or not bucket.get("messages"):
+            return None
+        return self._unpack(bucket, bucket["messages"][0])
+
+    async def update(self, group_id: str, chat_id: str, message_id: str, update: dict):
+        oid = ObjectId(message_id)
+        nested = {
+            op: {f"messages.$[m].{field}": value for field, value in fields.items()}
+            for op, fields in update.items()
+        }
+        seq = update.get("$set", {}).get("updated_seq")
+        if seq is not None:
+            nested.setdefault("$max", {})["updated_seq"] = seq
+        await self._collection().update_one(
+            {"group_id": group_id, "chat_id": chat_id, "messages._id": oid},
+            nested,
+            array_filters=[{"m._id": oid}],
+        )
+
+    async def page(self, group_id: str, chat_id: str, viewer: Optional[str] = None,
+                   anchor: Optional[dict] = None, older: bool = True, limit: int = 50,
+                   profile: str = "history") -> list:
+        """Up to `limit` messages before/after the anchor (latest without one), oldest first."""
+        return await _page_from_ranges(
+            with_profile(self._collection(), profile), group_id, chat_id, viewer, anchor, older, limit,
+            lambda bucket: [self._unpack(bucket, message) for message in bucket.get("messages", ())],
+        )
+
+    async def changed_since(self, group_id: str, chat_id: str, floor: int, limit: int) -> list:
+        """Up to `limit` messages with updated_seq > floor, in updated_seq order."""
+        cursor = self._collection().aggregate([
+            {"$match": {"group_id": group_id, "chat_id": chat_id, "updated_seq": {"$gt": floor}}},
+            {"$unwind": "$messages"},
+            {"$match": {"messages.updated_seq": {"$gt": floor}}},
+            {"$sort": {"messages.updated_seq": 1}},
+            {"$limit": limit},
+        ])
+        return [self._unpack(bucket, bucket["messages"]) async for bucket in cursor]
+
+    async def user_messages(self, group_id: str, chat_id: str, user_id: str, profile: str = "history") -> list:
+        """Every message of one sender in a chat, oldest first."""
+        cursor = with_profile(self._collection(), profile).aggregate([
+            {"$match": {"group_id": group_id, "chat_id": chat_id, "messages.user_id": user_id}},
+            {"$unwind": "$messages"},
+            {"$match": {"messages.user_id": user_id}},
+            {"$sort": {"messages.created_at": 1, "messages._id": 1}},
+        ])
+        return [self._unpack(bucket, bucket["messages"]) async for bucket in cursor]
+
+    async def chat_ids(self, group_id: str, user_id: str, profile: str = "analytics") -> list:
+        """Ids of the chats of a group that `user_id` wrote in."""
+        cursor = with_profile(self._collection(), profile).aggregate([
+            {"$match": {"group_id": group_id, "messages.user_id": user_id}},
+            {"$group": {"_id": "$chat_id"}},
+        ])
+        return [doc["_id"] async for doc in cursor]
+
+    async def delete(self, group_id: str, chat_id: Optional[str] = None):
+        """Drop the messages of a chat, or of every chat of a group."""
+        query = {"group_id": group_id}
+        if chat_id is not None:
+            query["chat_id"] = chat_id
+        await self._collection().delete_many(query)
+
+
+def pack_block(group_id: str, chat_id: str, messages: list) -> dict:
+    """Archive block: a run of a chat's messages as zlib-compressed BSON, plus what reads filter on."""
+    messages = [{k: v for k, v in m.items() if k not in ("group_id", "chat_id")} for m in messages]
+    return {
+        "_id": messages[0]["_id"],
+        "group_id": group_id,
+        "chat_id": chat_id,
+        "count": len(messages),
+        "start": min(m["created_at"] for m in messages),
+        "end": max(m["created_at"] for m in messages),
+        "message_ids": [m["_id"] for m in messages],
+        "user_ids": sorted({m["user_id"] for m in messages if m.get("user_id")}),
+        "codec": "zlib",
+        "data": Binary(zlib.compress(bson.encode({"messages": messages}))),
+    }
+
+
+def unpack_block(block: dict) -> list:
+    messages = bson.decode(zlib.decompress(block["data"]))["messages"]
+    return [
+        {**m, "group_id": block["group_id"], "chat_id": block["chat_id"], "archived": True}
+        for m in messages
+    ]
+
+
+class ArchiveMessageStore:
+    """
+    Read side of the cold tier: archived messages in compressed blocks
+    (written by app/services/archiver.py). Archived messages are read-only and
+    come back with `archived: True`.
+    """
+
+    layout = "archive"
+
+    # Page reads don't need the per-block id lists
+    _PAGE_FIELDS = {"message_ids": 0, "user_ids": 0}
+
+    def __init__(self, collection: Callable = get_async_archive_collection):
+        self._collection = collection
+
+    async def get(self, group_id: str, chat_id: str, message_id: str) -> Optional[dict]:
+        oid = ObjectId(message_id)
+        block = await self._collection().find_one(
+            {"group_id": group_id, "chat_id": chat_id, "message_ids": oid}, self._PAGE_FIELDS,
+        )
+        if block is None:
+            return None
+        return next((m for m in unpack_block(block) if m["_id"] == oid), None)
+
+    async def page(self, group_id: str, chat_id: str, viewer: Optional[str] = None,
+                   anchor: Optional[dict] = None, older: bool = True, limit: int = 50,
+                   profile: str = "history") -> list:
+        return await _page_from_ranges(
+            with_profile(self._collection(), profile), group_id, chat_id, viewer, anchor, older, limit,
+            unpack_block, self._PAGE_FIELDS,
+        )
+
+    async def user_messages(self, group_id: str, chat_id: str, user_id: str, profile: str = "history") -> list:
+        cursor = with_profile(self._collection(), profile).find(
+            {"group_id": group_id, "chat_id": chat_id, "user_ids": user_id}, self._PAGE_FIELDS,
+        ).sort("start", ASCENDING)
+        messages = []
+        async for block in cursor:
+            messages.extend(m for m in unpack_block(block) if m.get("user_id") == user_id)
+        messages.sort(key=_page_key)
+        return messages
+
+    async def chat_ids(self, group_id: str, user_id: str, profile: str = "analytics") -> list:
+        return await with_profile(self._collection(), profile).distinct("chat_id", {"group_id": group_id, "user_ids": user_id})
+
+    async def delete(self, group_id: str, chat_id: Optional[str] = None):
+        query = {"group_id": group_id}
+        if chat_id is not None:
+            query["chat_id"] = chat_id
+        await self._collection().delete_many(query)
+
+
+class TieredMessageStore:
+    """
+    Hot store in front of the archive (ARCHIVE_ENABLED).
+
+    Writes and resume go to the hot store only. A page that runs past the
+    oldest hot message continues in the archive, and a cursor pointing at an
+    archived message pages through the archive and back into the hot tier, so
+    clients don't see where one ends. The archiver moves a chat's messages
+    oldest first, so everything archived is older than everything hot.
+    """
+
+    def __init__(self, hot, archive):
+        self.hot = hot
+        self.archive = archive
+        self.layout = f"{hot.layout}+archive"
+
+        self.archive_reads = 0
+
+    async def insert_one(self, doc: dict):
+        await self.hot.insert_one(doc)
+
+    async def insert_many(self, docs: list):
+        await self.hot.insert_many(docs)
+
+    async def update(self, group_id: str, chat_id: str, message_id: str, update: dict):
+        await self.hot.update(group_id, chat_id, message_id, update)
+
+    async def changed_since(self, group_id: str, chat_id: str, floor: int, limit: int) -> list:
+        return await self.hot.changed_since(group_id, chat_id, floor, limit)
+
+    async def get(self, group_id: str, chat_id: str, message_id: str) -> Optional[dict]:
+        doc = await self.hot.get(group_id, chat_id, message_id)
+        if doc is None:
+            doc = await self.archive.get(group_id, chat_id, message_id)
+        return doc
+
+    async def page(self, group_id: str, chat_id: str, viewer: Optional[str] = None,
+                   anchor: Optional[dict] = None, older: bool = True, limit: int = 50,
+                   profile: str = "history") -> list:
+        archived_anchor = anchor is not None and anchor.get("archived")
+        if older:
+            # Nothing hot is older than an archived message
+            docs = [] if archived_anchor else await self.hot.page(group_id, chat_id, viewer, anchor, older, limit, profile)
+            if len(docs) < limit:
+                self.archive_reads += 1
+                edge = docs[0] if docs else anchor
+                docs = await self.archive.page(group_id, chat_id, viewer, edge, older, limit - len(docs), profile) + docs
+            return docs
+
+        if not archived_anchor:
+            return await self.hot.page(group_id, chat_id, viewer, anchor, older, limit, profile)
+        self.archive_reads += 1
+        docs = await self.archive.page(group_id, chat_id, viewer, anchor, older, limit, profile)
+        if len(docs) < limit:
+            edge = docs[-1] if docs else anchor
+            docs += await self.hot.page(group_id, chat_id, viewer, edge, older, limit - len(docs), profile)
+        return docs
+
+    async def user_messages(self, group_id: str, chat_id: str, user_id: str, profile: str = "history") -> list:
+        return (await self.archive.user_messages(group_id, chat_id, user_id, profile)
+                + await self.hot.user_messages(group_id, chat_id, user_id, profile))
+
+    async def chat_ids(self, group_id: str, user_id: str, profile: str = "analytics") -> list:
+        hot = await self.hot.chat_ids(group_id, user_id, profile)
+        archived = await self.archive.chat_ids(group_id, user_id, profile)
+        return list(dict.fromkeys(hot + archived))
+
+    async def delete(self, group_id: str, chat_id: Optional[str] = None):
+        await self.hot.delete(group_id, chat_id)
+        await self.archive.delete(group_id, chat_id)
+
+
+def create_message_store(layout: str = MESSAGE_STORAGE, archive: bool = ARCHIVE_ENABLED):
+    from app.storage import storage
+
+    if storage.is_memory:
+        # In-process backend for load tests: one layout, no archive
+        from app.storage.memory import MemoryMessageStore
+        return MemoryMessageStore(storage.latency)
+    if layout == "buckets":
+        store = BucketMessageStore()
+    else:
+        if layout != "documents":
+            logger.warning(f"Unknown MESSAGE_STORAGE {layout!r}, using documents")
+        store = DocumentMessageStore()
+    if archive:
+        store = TieredMessageStore(store, ArchiveMessageStore())
+    return store
+
+
+message_store = create_message_store()
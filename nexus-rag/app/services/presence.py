@@ -0,0 +1,337 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Awaitable, Callable, Iterable, Optional
+
+from app.core.config import (
+    PRESENCE_BACKEND,
+    PRESENCE_REDIS_URL,
+    PRESENCE_EMIT_INTERVAL_MS,
+    PRESENCE_HEARTBEAT_SECONDS,
+    PRESENCE_WORKER_TTL_SECONDS,
+)
+
+logger = logging.getLogger(__name__)
+
+
+def group_room(group_id: str) -> str:
+    """Room holding every connected member of a group"""
+    return f"group:{group_id}"
+
+
+class LocalPresenceBackend:
+    """Socket counts per (room, user) in this process (single worker)."""
+
+    name = "local"
+
+    def __init__(self):
+        self._rooms: dict = {}  # room -> {email: sockets}
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def incr(self, room: str, email: str) -> bool:
+        """Count one more socket; True if the user just came online in the room."""
+        users = self._rooms.setdefault(room, {})
+        users[email] = users.get(email, 0) + 1
+        return users[email] == 1
+
+    async def decr(self, room: str, email: str) -> bool:
+        """Count one socket less; True if the user just went offline in the room."""
+        users = self._rooms.get(room)
+        if not users or email not in users:
+            return False
+        users[email] -= 1
+        if users[email] > 0:
+            return False
+        del users[email]
+        if not users:
+            del self._rooms[room]
+        return True
+
+    async def members(self, room: str) -> list:
+        return list(self._rooms.get(room, ()))
+
+    async def counts(self, rooms: Iterable[str]) -> dict:
+        return {room: len(self._rooms.get(room, ())) for room in rooms}
+
+    async def reap(self) -> list:
+        return []
+
+
+# Shared counts: presence:<room> is a hash {email: sockets}. Each worker also keeps
+# its own share in presence:worker:<id> ({"<room>\n<email>": sockets}) and a
+# heartbeat in the presence:workers zset, so the share of a crashed worker can be
+# subtracted by the survivors.
+_INCR_SCRIPT = """
+redis.call('HINCRBY', KEYS[2], ARGV[2], 1)
+return redis.call('HINCRBY', KEYS[1], ARGV[1], 1)
+"""
+
+_DECR_SCRIPT = """
+local mine = redis.call('HINCRBY', KEYS[2], ARGV[2], -1)
+if mine <= 0 then redis.call('HDEL', KEYS[2], ARGV[2]) end
+if mine < 0 then return -1 end
+local n = redis.call('HINCRBY', KEYS[1], ARGV[1], -1)
+if n <= 0 then redis.call('HDEL', KEYS[1], ARGV[1]) end
+return n
+"""
+
+_REAP_SCRIPT = """
+local share = redis.call('HGETALL', KEYS[1])
+local gone = {}
+for i = 1, #share, 2 do
+  local sep = string.find(share[i], '\\n', 1, true)
+  local room = string.sub(share[i], 1, sep - 1)
+  local email = string.sub(share[i], sep + 1)
+  local n = redis.call('HINCRBY', ARGV[1] .. room, email, -tonumber(share[i + 1]))
+  if n <= 0 then
+    redis.call('HDEL', ARGV[1] .. room, email)
+    table.insert(gone, share[i])
+  end
+end
+redis.call('DEL', KEYS[1])
+return gone
+"""
+
+
+class RedisPresenceBackend:
+    """
+    Socket counts shared by all workers through Redis.
+
+    Every update is one Lua script call, so counts stay consistent when tabs of
+    the same user sit on different workers. The scripts touch keys derived from
+    their arguments, so this needs a single Redis (not Redis Cluster).
+    """
+
+    name = "redis"
+    prefix = "presence:"
+
+    def __init__(
+        self,
+        url: str = PRESENCE_REDIS_URL,
+        heartbeat_seconds: int = PRESENCE_HEARTBEAT_SECONDS,
+        worker_ttl_seconds: int = PRESENCE_WORKER_TTL_SECONDS,
+    ):
+        import redis.asyncio as aioredis
+
+        self._redis = aioredis.from_url(url, decode_responses=True)
+        self.worker_id = uuid.uuid4().hex
+        self.heartbeat_seconds = heartbeat_seconds
+        self.worker_ttl_seconds = worker_ttl_seconds
+        self._worker_key = f"{self.prefix}worker:{self.worker_id}"
+        self._workers_key = f"{self.prefix}workers"
+        self._incr = self._redis.register_script(_INCR_SCRIPT)
+        self._decr = self._redis.register_script(_DECR_SCRIPT)
+        self._reap = self._redis.register_script(_REAP_SCRIPT)
+
+    async def start(self):
+        await self.heartbeat()
+
+    async def stop(self):
+        # Remove our share right away instead of waiting for another worker to reap it
+        await self._reap(keys=[self._worker_key], args=[self.prefix])
+        await self._redis.zrem(self._workers_key, self.worker_id)
+        await self._redis.aclose()
+
+    async def heartbeat(self):
+        await self._redis.zadd(self._workers_key, {self.worker_id: time.time()})
+
+    async def incr(self, room: str, email: str) -> bool:
+        n = await self._incr(keys=[self.prefix + room, self._worker_key], args=[email, f"{room}\n{email}"])
+        return int(n) == 1
+
+    async def decr(self, room: str, email: str) -> bool:
+        n = await self._decr(keys=[self.prefix + room, self._worker_key], args=[email, f"{room}\n{email}"])
+        return int(n) == 0
+
+    async def members(self, room: str) -> list:
+        return await self._redis.hkeys(self.prefix + room)
+
+    async def counts(self, rooms: Iterable[str]) -> dict:
+        rooms = list(rooms)
+        async with self._redis.pipeline(transaction=False) as pipe:
+            for room in rooms:
+                pipe.hlen(self.prefix + room)
+            results = await pipe.execute()
+        return dict(zip(rooms, results))
+
+    async def reap(self) -> list:
+        """Subtract the shares of workers that stopped heartbeating; returns [(room, email)] now offline."""
+        await self.heartbeat()
+        cutoff = time.time() - self.worker_ttl_seconds
+        dead = await self._redis.zrangebyscore(self._workers_key, "-inf", cutoff)
+        offline = []
+        for worker_id in dead:
+            logger.warning(f"Removing presence of unresponsive worker {worker_id}")
+            gone = await self._reap(keys=[f"{self.prefix}worker:{worker_id}"], args=[self.prefix])
+            await self._redis.zrem(self._workers_key, worker_id)
+            offline.extend(tuple(item.split("\n", 1)) for item in gone)
+        return offline
+
+
+def create_presence_backend():
+    if PRESENCE_BACKEND == "local":
+        return LocalPresenceBackend()
+    if PRESENCE_BACKEND == "redis":
+        logger.info("Presence using Redis backend")
+        return RedisPresenceBackend()
+    raise RuntimeError(f"Unknown PRESENCE_BACKEND '{PRESENCE_BACKEND}' (expected local or redis)")
+
+
+class _RoomDiff:
+    __slots__ = ("online", "offline")
+
+    def __init__(self):
+        self.online: set = set()
+        self.offline: set = set()
+
+
+class PresenceService:
+    """
+    Who is online, per chat room ("group_id:chat_id") and per group ("group:<id>").
+
+    A socket counts once per room it is in; the backend adds up sockets per user,
+    so several tabs (possibly on several workers) keep a user online until the
+    last one leaves. Transitions are collected per room and sent every
+    `interval_ms` as one diff:
+
+        presence {"room", "online": [...], "offline": [...], "count": n}
+
+    Clients get the full list once (presence_snapshot) when they join, and apply
+    diffs after that.
+    """
+
+    def __init__(
+        self,
+        emit: Callable[..., Awaitable],
+        backend=None,
+        interval_ms: int = PRESENCE_EMIT_INTERVAL_MS,
+        heartbeat_seconds: int = PRESENCE_HEARTBEAT_SECONDS,
+    ):
+        self._emit = emit
+        self.backend = backend or create_presence_backend()
+        self.interval = interval_ms / 1000
+        self.heartbeat_seconds = heartbeat_seconds
+        self._sids: dict = {}  # sid -> (email, set of rooms)
+        self._diffs: dict = {}  # room -> _RoomDiff
+        self._task: Optional[asyncio.Task] = None
+
+        self.transitions = 0
+        self.diffs_sent = 0
+
+    async def start(self):
+        await self.backend.start()
+        self._task = asyncio.create_task(self._run(), name="presence")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.backend.stop()
+
+    def _record(self, room: str, email: str, online: bool):
+        self.transitions += 1
+        diff = self._diffs.get(room)
+        if diff is None:
+            diff = self._diffs[room] = _RoomDiff()
+        if online:
+            diff.offline.discard(email)
+            diff.online.add(email)
+        else:
+            diff.online.discard(email)
+            diff.offline.add(email)
+
+    async def join(self, sid: str, email: str, room: str):
+        """Count sid in room (idempotent per sid)."""
+        entry = self._sids.get(sid)
+        if entry is None:
+            entry = self._sids[sid] = (email, set())
+        if room in entry[1]:
+            return
+        entry[1].add(room)
+        if await self.backend.incr(room, email):
+            self._record(room, email, True)
+        if self._sids.get(sid) is not entry:
+            # Disconnected while we were counting it
+            if await self.backend.decr(room, email):
+                self._record(room, email, False)
+
+    async def leave(self, sid: str, room: str):
+        entry = self._sids.get(sid)
+        if entry is None or room not in entry[1]:
+            return
+        entry[1].discard(room)
+        if await self.backend.decr(room, entry[0]):
+            self._record(room, entry[0], False)
+
+    async def disconnect(self, sid: str) -> set:
+        """Remove sid from every room; returns the rooms it was in."""
+        entry = self._sids.pop(sid, None)
+        if entry is None:
+            return set()
+        email, rooms = entry
+        for room in rooms:
+            if await self.backend.decr(room, email):
+                self._record(room, email, False)
+        return rooms
+
+    async def snapshot(self, rooms: Iterable[str]) -> dict:
+        """Full member lists, sent once on join; diffs follow."""
+        return {room: await self.backend.members(room) for room in rooms}
+
+    async def members(self, room: str) -> list:
+        return await self.backend.members(room)
+
+    async def counts(self, rooms: Iterable[str]) -> dict:
+        """Online users per room (one O(1) lookup per room)."""
+        return await self.backend.counts(rooms)
+
+    async def flush(self):
+        if not self._diffs:
+            return
+        diffs, self._diffs = self._diffs, {}
+        counts = await self.backend.counts(diffs.keys())
+        for room, diff in diffs.items():
+            try:
+                await self._emit("presence", {
+                    "room": room,
+                    "online": sorted(diff.online),
+                    "offline": sorted(diff.offline),
+                    "count": counts[room],
+                }, room=room)
+                self.diffs_sent += 1
+            except Exception as e:
+                logger.error(f"Failed to emit presence diff for {room}: {e}")
+
+    async def _run(self):
+        last_reap = time.monotonic()
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                if time.monotonic() - last_reap >= self.heartbeat_seconds:
+                    last_reap = time.monotonic()
+                    for room, email in await self.backend.reap():
+                        self._record(room, email, False)
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Presence loop error: {e}", exc_info=True)
+
+    def stats(self) -> dict:
+        return {
+            "backend": self.backend.name,
+            "sockets": len(self._sids),
+            "pending_diffs": len(self._diffs),
+            "transitions": self.transitions,
+            "diffs_sent": self.diffs_sent,
+        }
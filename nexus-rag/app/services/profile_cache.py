@@ -0,0 +1,101 @@
+import time
+import logging
+from typing import Optional
+
+from app.core.config import PROFILE_CACHE_TTL_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# User fields that Socket.IO events need to render a sender
+PROFILE_FIELDS = ("username", "full_name", "is_private", "profile_image")
+
+
+def profile_from_user(email: str, user_doc: Optional[dict]) -> dict:
+    """Extract the cached profile fields from a users document."""
+    if not user_doc:
+        return {
+            "username": email.split("@")[0],
+            "full_name": None,
+            "is_private": False,
+            "profile_image": None,
+        }
+    return {
+        "username": user_doc.get("username", email.split("@")[0]),
+        "full_name": user_doc.get("full_name"),
+        "is_private": user_doc.get("is_private", False),
+        "profile_image": user_doc.get("profile_image"),
+    }
+
+
+class ProfileCache:
+    """
+    In-process cache of sender profiles keyed by email.
+
+    Entries are filled when a socket connects and dropped when the user's last
+    socket disconnects, so the cache only holds users that are online on this
+    worker. Profile endpoints call update() so the next message uses the new
+    avatar/privacy flag; the TTL covers changes made on other workers.
+    """
+
+    def __init__(self, ttl_seconds: int = PROFILE_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries: dict = {}      # email -> (profile, loaded_at)
+        self._connections: dict = {}  # email -> number of live sockets
+        self.hits = 0
+        self.misses = 0
+
+    def acquire(self, email: str, profile: dict):
+        """Register a new socket for this user and (re)fill the entry."""
+        self._connections[email] = self._connections.get(email, 0) + 1
+        self.set(email, profile)
+
+    def release(self, email: str):
+        """Forget the user once their last socket disconnects."""
+        remaining = self._connections.get(email, 0) - 1
+        if remaining > 0:
+            self._connections[email] = remaining
+        else:
+            self._connections.pop(email, None)
+            self._entries.pop(email, None)
+
+    def get(self, email: str) -> Optional[dict]:
+        entry = self._entries.get(email)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        profile, loaded_at = entry
+        if time.monotonic() - loaded_at > self.ttl_seconds:
+            del self._entries[email]
+            self.misses += 1
+            return None
+
+        self.hits += 1
+        return profile
+
+    def set(self, email: str, profile: dict):
+        if email in self._connections:
+            self._entries[email] = (profile, time.monotonic())
+
+    def update(self, email: str, fields: dict):
+        """Merge changed profile fields into the cached entry, if any."""
+        changes = {k: v for k, v in fields.items() if k in PROFILE_FIELDS}
+        entry = self._entries.get(email)
+        if entry is None or not changes:
+            return
+        profile, _ = entry
+        self._entries[email] = ({**profile, **changes}, time.monotonic())
+
+    def invalidate(self, email: str):
+        self._entries.pop(email, None)
+
+    def stats(self) -> dict:
+        return {
+            "entries": len(self._entries),
+            "online_users": len(self._connections),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+profile_cache = ProfileCache()
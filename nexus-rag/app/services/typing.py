@@ -0,0 +1,126 @@
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, Optional
+
+from app.core.config import TYPING_EMIT_INTERVAL_MS, TYPING_TTL_MS
+
+logger = logging.getLogger(__name__)
+
+
+class _RoomTyping:
+    __slots__ = ("typers", "last_emitted", "last_emit_at")
+
+    def __init__(self):
+        self.typers: dict = {}         # sid -> (email, expires_at)
+        self.last_emitted: set = set()  # emails in the last update sent
+        self.last_emit_at = 0.0
+
+
+class TypingAggregator:
+    """
+    Coalesces typing events per room.
+
+    Keystroke events only update an in-memory entry per sid (debounce); a single
+    background loop emits at most one "typing" update per room per interval, and
+    only when the set of typers changed or a refresh is due. Entries expire
+    `ttl_ms` after the last event, so nobody stays "typing" forever.
+
+    Each update carries the users currently typing and the ones that stopped, so
+    updates from several workers compose on the client:
+
+        {"group_id", "chat_id", "users": [...], "stopped": [...], "ttl_ms": 3000}
+    """
+
+    def __init__(
+        self,
+        emit: Callable[..., Awaitable],
+        interval_ms: int = TYPING_EMIT_INTERVAL_MS,
+        ttl_ms: int = TYPING_TTL_MS,
+    ):
+        self._emit = emit
+        self.interval = interval_ms / 1000
+        self.ttl = ttl_ms / 1000
+        # Re-announce unchanged typers before clients expire them
+        self.refresh_interval = self.ttl / 2
+        self._rooms: dict = {}  # room -> _RoomTyping
+        self._task: Optional[asyncio.Task] = None
+
+        self.events_received = 0
+        self.emits_sent = 0
+
+    def touch(self, room: str, sid: str, email: str):
+        """Record a typing event from sid; O(1), never emits directly."""
+        self.events_received += 1
+        state = self._rooms.get(room)
+        if state is None:
+            state = self._rooms[room] = _RoomTyping()
+        state.typers[sid] = (email, time.monotonic() + self.ttl)
+        self._ensure_running()
+
+    def stop_typing(self, room: str, sid: str):
+        """Drop sid from the room's typers (message sent, left the room)."""
+        state = self._rooms.get(room)
+        if state is not None:
+            state.typers.pop(sid, None)
+
+    def forget_sid(self, sid: str):
+        """Drop a disconnected sid from every room."""
+        for state in self._rooms.values():
+            state.typers.pop(sid, None)
+
+    def _ensure_running(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="typing-aggregator")
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.error(f"Typing aggregator flush failed: {e}", exc_info=True)
+
+    async def flush(self):
+        """Emit pending updates for every active room."""
+        now = time.monotonic()
+        for room, state in list(self._rooms.items()):
+            for sid, (_, expires_at) in list(state.typers.items()):
+                if expires_at <= now:
+                    del state.typers[sid]
+
+            current = {email for email, _ in state.typers.values()}
+            stopped = state.last_emitted - current
+            refresh_due = current and now - state.last_emit_at >= self.refresh_interval
+
+            if current != state.last_emitted or refresh_due:
+                group_id, _, chat_id = room.partition(":")
+                await self._emit("typing", {
+                    "group_id": group_id,
+                    "chat_id": chat_id,
+                    "users": sorted(current),
+                    "stopped": sorted(stopped),
+                    "ttl_ms": int(self.ttl * 1000),
+                }, room=room)
+                self.emits_sent += 1
+                state.last_emitted = current
+                state.last_emit_at = now
+
+            if not state.typers and not state.last_emitted:
+                del self._rooms[room]
+
+    def stats(self) -> dict:
+        return {
+            "active_rooms": len(self._rooms),
+            "events_received": self.events_received,
+            "emits_sent": self.emits_sent,
+        }
@@ -0,0 +1,172 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+from bson import ObjectId
+from pymongo.errors import BulkWriteError
+
+from app.core.config import (
+    MESSAGE_WRITE_BATCHING_ENABLED,
+    MESSAGE_WRITE_BATCH_WINDOW_MS,
+    MESSAGE_WRITE_BATCH_MAX,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class MessageWriteBatcher:
+    """
+    Group commit for message inserts.
+
+    Concurrent callers of insert() are collected for `window_ms` (or until
+    `max_batch` are waiting) and written together: one sequence-number
+    reservation per chat in the batch ($inc by the chat's message count) and
+    one unordered insert_many for the whole batch, instead of two round trips
+    per message. Sequence numbers are handed out in arrival order, so messages
+    of one room keep the order their senders got to insert(). Each document
+    gets its `_id` before it is queued; each caller gets its own result, or its
+    own exception when its part of the batch failed. One commit is in flight
+    at a time: a batch that closes while the previous one is still being
+    written goes out right after it, so reservations and inserts never overlap
+    even when a round trip outlasts the window.
+
+    `reserve(group_id, chat_id, count)` returns the last of `count` newly
+    reserved sequence numbers; `insert_many(docs)` stores the documents.
+    """
+
+    def __init__(
+        self,
+        reserve: Callable[[str, str, int], Awaitable[int]],
+        insert_many: Callable[[list], Awaitable],
+        enabled: bool = MESSAGE_WRITE_BATCHING_ENABLED,
+        window_ms: float = MESSAGE_WRITE_BATCH_WINDOW_MS,
+        max_batch: int = MESSAGE_WRITE_BATCH_MAX,
+    ):
+        self._reserve = reserve
+        self._insert_many = insert_many
+        self.enabled = enabled
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self._pending: list = []  # (doc, future) in arrival order
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._busy = False
+        self._due = False  # the window closed while a commit was in flight
+        self._commits: set = set()
+
+        self.submitted = 0
+        self.batches = 0
+        self.written = 0
+        self.failed = 0
+        self.max_batch_seen = 0
+
+    async def insert(self, doc: dict) -> int:
+        """Queue a message document for the next group commit; returns its sequence number."""
+        doc.setdefault("_id", ObjectId())
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((doc, future))
+        self.submitted += 1
+
+        if len(self._pending) >= self.max_batch:
+            self._commit_pending()
+        elif self._timer is None and not self._due:
+            self._timer = asyncio.get_running_loop().call_later(self.window, self._commit_pending)
+        return await future
+
+    def _commit_pending(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._busy:
+            self._due = True
+            return
+        self._due = False
+        batch, self._pending = self._pending[:self.max_batch], self._pending[self.max_batch:]
+        if not batch:
+            return
+        self._busy = True
+        task = asyncio.create_task(self._run(batch))
+        self._commits.add(task)
+        task.add_done_callback(self._commits.discard)
+
+    async def _run(self, batch: list):
+        try:
+            await self._commit(batch)
+        finally:
+            self._busy = False
+            # Whatever arrived during this commit goes next, without another window
+            if self._due or len(self._pending) >= self.max_batch:
+                self._commit_pending()
+            elif self._pending and self._timer is None:
+                self._timer = asyncio.get_running_loop().call_later(self.window, self._commit_pending)
+
+    async def _commit(self, batch: list):
+        self.batches += 1
+        self.max_batch_seen = max(self.max_batch_seen, len(batch))
+
+        # 1. Sequence numbers: one reservation per chat, assigned in arrival order
+        chats: dict = {}  # (group_id, chat_id) -> positions in batch
+        for i, (doc, _) in enumerate(batch):
+            chats.setdefault((doc["group_id"], doc["chat_id"]), []).append(i)
+        reserved = await asyncio.gather(
+            *[self._reserve(group_id, chat_id, len(positions)) for (group_id, chat_id), positions in chats.items()],
+            return_exceptions=True,
+        )
+
+        ready = []
+        for positions, last in zip(chats.values(), reserved):
+            if isinstance(last, BaseException):
+                self._fail([batch[i] for i in positions], last)
+                continue
+            first = last - len(positions) + 1
+            for offset, i in enumerate(positions):
+                batch[i][0]["seq"] = batch[i][0]["updated_seq"] = first + offset
+            ready.extend(positions)
+        if not ready:
+            return
+        ready.sort()
+
+        # 2. One insert_many for every document that got its numbers
+        docs = [batch[i][0] for i in ready]
+        errors: dict = {}
+        try:
+            await self._insert_many(docs)
+        except BulkWriteError as e:
+            errors = {err["index"]: err.get("errmsg", "write error") for err in e.details.get("writeErrors", [])}
+        except Exception as e:
+            self._fail([batch[i] for i in ready], e)
+            return
+
+        for index, i in enumerate(ready):
+            doc, future = batch[i]
+            if index in errors:
+                self._fail([(doc, future)], RuntimeError(f"Message insert failed: {errors[index]}"))
+            else:
+                self.written += 1
+                if not future.done():
+                    future.set_result(doc["seq"])
+
+    def _fail(self, items: list, error: BaseException):
+        logger.error(f"Group commit of {len(items)} message(s) failed: {error}")
+        for _, future in items:
+            self.failed += 1
+            if not future.done():
+                future.set_exception(error)
+
+    async def flush(self):
+        """Commit whatever is waiting and wait for commits in flight (shutdown)."""
+        while self._pending or self._commits:
+            if self._pending and not self._busy:
+                self._commit_pending()
+            if self._commits:
+                await asyncio.gather(*list(self._commits), return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "submitted": self.submitted,
+            "batches": self.batches,
+            "written": self.written,
+            "failed": self.failed,
+            "avg_batch_size": round((self.written + self.failed) / self.batches, 2) if self.batches else 0,
+            "max_batch_seen": self.max_batch_seen,
+        }
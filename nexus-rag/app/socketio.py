@@ -5,15 +5,39 @@ from jose import jwt
 from datetime import datetime
 import random
 import string
-
-from app.core.config import JWT_SECRET, JWT_ALGORITHM, ALLOWED_ORIGINS
-from app.core.mongo import get_message_collection
+import uuid
+
+from app.core.config import (
+    JWT_SECRET,
+    JWT_ALGORITHM,
+    ALLOWED_ORIGINS,
+    SOCKETIO_MANAGER,
+    AI_STREAMING_ENABLED,
+    AI_STREAM_FLUSH_MS,
+)
+from app.core.socket_manager import create_client_manager
+from app.storage import storage
+from app.services.profile_cache import profile_cache, profile_from_user, PROFILE_FIELDS
+from app.vectorstore.ingestion import ingestion_pipeline, chat_message_vector
+from app.services.membership import membership_index
+from app.services.typing import TypingAggregator
+from app.services.emit_batcher import RoomEmitBatcher
+from app.services.history_buffer import room_history, AI_SENDER, DELETED_CONTENT
+from app.services.ai_scheduler import AIReplyScheduler, AITrigger
+from app.services.presence import PresenceService, group_room
+from app.services.message_log import message_log
+from app.services.message_store import message_store
+from app.core.rate_limit import flood_control
+from app.core.logging import log_event, trace
 
 logger = logging.getLogger(__name__)
 
-# Create Socket.IO server with proper CORS configuration
+# Create Socket.IO server with proper CORS configuration.
+# Room emits go through the configured client manager so they reach clients
+# connected to any worker (see SOCKETIO_MANAGER).
 sio = socketio.AsyncServer(
     async_mode="asgi",
+    client_manager=create_client_manager(),
     cors_allowed_origins=ALLOWED_ORIGINS,
     logger=False,  # Use our own logger
     engineio_logger=False
@@ -21,6 +45,47 @@ sio = socketio.AsyncServer(
 
 socket_app = socketio.ASGIApp(sio, socketio_path="")
 
+# Per-room typing indicator coalescing (see app/services/typing.py)
+typing_aggregator = TypingAggregator(emit=sio.emit)
+
+# Online users per chat room and per group, sent to clients as batched diffs
+presence = PresenceService(emit=sio.emit)
+
+# Opt-in micro-batching of message events for hot rooms (see app/services/emit_batcher.py)
+room_emitter = RoomEmitBatcher(emit=sio.emit)
+
+# Keep per-room history buffers current with messages handled by other workers
+if hasattr(sio.manager, "add_remote_event_listener"):
+    sio.manager.add_remote_event_listener(room_history.on_room_event)
+
+
+def user_room(email: str) -> str:
+    """Private room holding every socket of one user"""
+    return f"user:{email}"
+
+
+async def emit_error(sid: str, event: str, code: str, detail: str, **extra):
+    """Send a structured error back to the socket whose event was rejected"""
+    await sio.emit("error", {"event": event, "code": code, "detail": detail, **extra}, room=sid)
+
+
+async def authorize_room(sid: str, user: str, event: str, group_id: str, chat_id: str) -> bool:
+    """Check room membership through the in-memory index; reject the event if denied"""
+    if await membership_index.check(user, group_id, chat_id):
+        return True
+
+    logger.warning(f"Rejected {event} from {user} (sid: {sid}) for room {group_id}:{chat_id}")
+    await emit_error(sid, event, "forbidden", "You are not a member of this room",
+                     group_id=group_id, chat_id=chat_id)
+    return False
+
+
+async def reject_rate_limited(sid: str, user: str, event: str, retry_after: float, **extra):
+    """Tell the client an event was dropped by flood control and when to retry"""
+    logger.warning(f"Rate limited {event} from {user} (sid: {sid})")
+    await emit_error(sid, event, "rate_limited", "Too many events, slow down",
+                     retry_after=round(retry_after, 2), **extra)
+
 
 def decode_token(token: str):
     """Decode and validate JWT token"""
@@ -43,26 +108,31 @@ async def connect(sid, environ, auth):
             logger.warning(f"Connection rejected - invalid token from {sid}")
             return False
             
-        print(f"DEBUG: Socket connected for user {user} (sid: {sid})")
+        log_event(logger, logging.INFO, "socket.connect", "Socket connected", user=user, sid=sid)
 
         # Fetch full user details from DB to get name/username
-        from app.core.mongo import get_users_collection
-        users = get_users_collection()
-        user_doc = users.find_one({"email": user})
+        user_doc = await storage.users.get_by_email(user)
+        profile = profile_from_user(user, user_doc)
         
-        username = user_doc.get("username", user.split("@")[0]) if user_doc else user.split("@")[0]
-        full_name = user_doc.get("full_name") if user_doc else None
-        is_private = user_doc.get("is_private", False) if user_doc else False
-        profile_image = user_doc.get("profile_image") if user_doc else None
-        
-        await sio.save_session(sid, {
-            "user": user,
-            "username": username,
-            "full_name": full_name,
-            "is_private": is_private,
-            "profile_image": profile_image
-        })
-        logger.info(f"Socket connected: {user} ({username}) [Private: {is_private}] (sid: {sid})")
+        await sio.save_session(sid, {"user": user, **profile})
+        await sio.enter_room(sid, user_room(user))
+        profile_cache.acquire(user, profile)
+
+        try:
+            group_ids = await membership_index.load_for_user(user)
+        except Exception as e:
+            # Not fatal: groups are loaded lazily on the first check
+            logger.warning(f"Could not preload memberships for {user}: {e}")
+            group_ids = []
+
+        # Group presence: every connected member sits in the group's room
+        group_rooms = [group_room(group_id) for group_id in group_ids]
+        for room in group_rooms:
+            await sio.enter_room(sid, room)
+            await presence.join(sid, user, room)
+        if group_rooms:
+            await sio.emit("presence_snapshot", {"rooms": await presence.snapshot(group_rooms)}, room=sid)
+        logger.info(f"Socket connected: {user} ({profile['username']}) [Private: {profile['is_private']}] (sid: {sid})")
         return True
         
     except Exception as e:
@@ -76,6 +146,11 @@ async def disconnect(sid):
     try:
         session = await sio.get_session(sid)
         user = session.get("user", "unknown")
+        if "user" in session:
+            profile_cache.release(user)
+        typing_aggregator.forget_sid(sid)
+        for room in await presence.disconnect(sid):
+            await _cancel_ai_if_room_empty(room)
         logger.info(f"Socket disconnected: {user} (sid: {sid})")
     except Exception as e:
         logger.error(f"Error in disconnect handler: {e}", exc_info=True)
@@ -89,9 +164,19 @@ async def join_room(sid, data):
             logger.warning(f"Invalid join_room data from {sid}: {data}")
             return
         
+        session = await sio.get_session(sid)
+        if not await authorize_room(sid, session["user"], "join_room", data["group_id"], data["chat_id"]):
+            return
+
         room = f"{data['group_id']}:{data['chat_id']}"
         await sio.enter_room(sid, room)
         logger.debug(f"Client {sid} joined room: {room}")
+
+        await presence.join(sid, session["user"], room)
+        await sio.emit("presence_snapshot", {"rooms": await presence.snapshot([room])}, room=sid)
+
+        # Load recent history now so the first AI trigger doesn't wait on Mongo
+        await room_history.warm(room, data["group_id"], data["chat_id"])
         
     except Exception as e:
         logger.error(f"Error in join_room handler: {e}", exc_info=True)
@@ -107,32 +192,97 @@ async def leave_room(sid, data):
         
         room = f"{data['group_id']}:{data['chat_id']}"
         await sio.leave_room(sid, room)
+        typing_aggregator.stop_typing(room, sid)
+        await presence.leave(sid, room)
+        await _cancel_ai_if_room_empty(room)
         logger.debug(f"Client {sid} left room: {room}")
         
     except Exception as e:
         logger.error(f"Error in leave_room handler: {e}", exc_info=True)
 
 
+@sio.event
+async def sync_messages(sid, data):
+    """
+    Resume a chat after a reconnect: send only the messages changed since the
+    client's last sequence number, or tell it to reload when too much changed.
+    """
+    try:
+        if not data or "group_id" not in data or "chat_id" not in data:
+            logger.warning(f"Invalid sync_messages data from {sid}: {data}")
+            return
+
+        session = await sio.get_session(sid)
+        user = session["user"]
+        group_id = data["group_id"]
+        chat_id = data["chat_id"]
+        if not await authorize_room(sid, user, "sync_messages", group_id, chat_id):
+            return
+
+        try:
+            since = max(int(data.get("since") or 0), 0)
+        except (TypeError, ValueError):
+            since = 0
+
+        result = await message_log.since(group_id, chat_id, since, user)
+        payload = {"group_id": group_id, "chat_id": chat_id}
+        if result is None:
+            payload.update(reset=True, messages=[])
+        else:
+            payload.update(result)
+        await sio.emit("messages_synced", payload, room=sid)
+
+    except Exception as e:
+        logger.error(f"Error in sync_messages handler: {e}", exc_info=True)
+
+
+async def push_profile_update(email: str, fields: dict):
+    """
+    Apply a profile change to the cache and to every live session of the user,
+    then tell their clients. Called by the /auth/profile endpoints.
+    """
+    changes = {k: v for k, v in fields.items() if k in PROFILE_FIELDS}
+    profile_cache.update(email, changes)
+
+    room = user_room(email)
+    for sid, _ in list(sio.manager.get_participants("/", room)):
+        async with sio.session(sid) as session:
+            session.update(changes)
+
+    await sio.emit("profile_updated", {"email": email, **fields}, room=room)
+
+
 @sio.event
 async def send_message(sid, data):
     session = await sio.get_session(sid)
     user = session["user"]
-    # Fetch fresh user data to get updated profile image
-    from app.core.mongo import get_users_collection
-    users_col = get_users_collection()
-    user_doc = users_col.find_one({"email": user})
-    
-    if user_doc:
-        full_name = user_doc.get("full_name")
-        username = user_doc.get("username", user.split("@")[0])
-        is_private = user_doc.get("is_private", False)
-        profile_image = user_doc.get("profile_image")
-    else:
-        # Fallback to session if DB fail? Rare.
-        username = session.get("username")
-        full_name = session.get("full_name")
-        is_private = session.get("is_private", False)
-        profile_image = session.get("profile_image")
+
+    group_id = data["group_id"]
+    chat_id = data["chat_id"]
+    if not await authorize_room(sid, user, "send_message", group_id, chat_id):
+        return
+
+    retry_after = flood_control.check_message_event(user, f"{group_id}:{chat_id}")
+    if retry_after is not None:
+        await reject_rate_limited(sid, user, "send_message", retry_after, group_id=group_id, chat_id=chat_id)
+        return
+
+    # Sender profile comes from the connection cache; profile endpoints keep it
+    # fresh, so the users collection is only read on a miss/expiry.
+    profile = profile_cache.get(user)
+    if profile is None:
+        user_doc = await storage.users.get_by_email(user)
+        if user_doc:
+            profile = profile_from_user(user, user_doc)
+            profile_cache.set(user, profile)
+        else:
+            # Fallback to session if DB fail? Rare.
+            profile = {field: session.get(field) for field in PROFILE_FIELDS}
+
+    full_name = profile.get("full_name")
+    username = profile.get("username")
+    is_private = profile.get("is_private", False)
+    profile_image = profile.get("profile_image")
 
     # Determine display name (for Chat Bubble)
     sender_name = full_name if full_name else username
@@ -157,17 +307,16 @@ async def send_message(sid, data):
     if not ai_context_name:
         ai_context_name = user
 
-    group_id = data["group_id"]
-    chat_id = data["chat_id"]
     content = data["content"]
 
     room = f"{group_id}:{chat_id}"
+    typing_aggregator.stop_typing(room, sid)
 
     reply_to = data.get("replyTo")
-    print(f"DEBUG: Received message with replyTo: {reply_to}")
+    if reply_to:
+        trace("socket.reply_to", "Message is a reply", user=user, room=room, reply_to=reply_to)
 
-    # store message
-    messages = get_message_collection()
+    # store message (takes the chat's next sequence number)
     message_doc = {
         "user_id": user,
         "group_id": group_id,
@@ -180,8 +329,12 @@ async def send_message(sid, data):
     
     if reply_to:
         message_doc["replyTo"] = reply_to
+    if data.get("client_id"):
+        # Lets the sender swap its optimistic copy for the stored message
+        message_doc["client_id"] = data["client_id"]
 
-    messages.insert_one(message_doc)
+    seq = await message_log.insert(message_doc)
+    room_history.append(room, str(message_doc["_id"]), "user", content, user)
 
     # broadcast
     emit_data = {
@@ -190,128 +343,182 @@ async def send_message(sid, data):
         "sender": user,  # Keep email for identity
         "sender_name": sender_name,  # Add display name
         "sender_image": sender_image, # Add display image
-        "id": str(message_doc["_id"]) # CRITICAL: Return DB ID so client can delete/reference it
+        "id": str(message_doc["_id"]), # CRITICAL: Return DB ID so client can delete/reference it
+        "seq": seq,
+        "group_id": group_id,
+        "chat_id": chat_id,
     }
     
     if reply_to:
         emit_data["replyTo"] = reply_to
+    if data.get("client_id"):
+        emit_data["client_id"] = data["client_id"]
+
+    await room_emitter.emit("new_message", emit_data, room=room)
 
-    await sio.emit(
+    # Background: Embed and Store in Vector DB
+    # Queued for the batched ingestion worker so the model never runs on the event loop.
+    # Content is formatted with sender info for better retrieval context.
+    await ingestion_pipeline.submit(chat_message_vector(
+        str(message_doc["_id"]), group_id, chat_id, user, content, message_doc["created_at"]
+    ))
+
+    # Trigger AI Response ONLY if explicitly requested (and within the AI budget;
+    # the message itself is already stored and delivered either way)
+    trigger_ai = bool(data.get("trigger_ai"))
+    if trigger_ai:
+        retry_after = flood_control.check_ai_trigger(user, room)
+        if retry_after is not None:
+            await reject_rate_limited(sid, user, "trigger_ai", retry_after, group_id=group_id, chat_id=chat_id)
+            trigger_ai = False
+
+    if trigger_ai:
+        await sio.emit("typing", {}, room=room)
+
+        reply_to_context = None
+        if reply_to:
+            # reply_to is a dict {id, sender, content}
+            reply_to_context = f"Replying to {reply_to.get('sender', 'Unknown')}: {reply_to.get('content', '')}"
+            trace("ai.reply_to_context", "Reply context built", room=room, reply_to_context=reply_to_context)
+
+        # Triggers close together are merged into one reply; a newer trigger
+        # supersedes a reply that is still being generated (see AIReplyScheduler)
+        ai_scheduler.trigger(room, group_id, chat_id, AITrigger(
+            user_query=content,
+            user_email=user, # Keep email for unique ID
+            user_name=ai_context_name, # Pass full name for AI context
+            reply_to_context=reply_to_context,
+        ))
+
+
+async def _cancel_ai_if_room_empty(room: str):
+    """Stop generating for a room nobody is listening to anymore (on any worker)."""
+    if not ai_scheduler.is_active(room):
+        return
+    if presence.backend.name == "local" and SOCKETIO_MANAGER != "local":
+        # Local counts can't see listeners on other workers
+        return
+    if not (await presence.counts([room]))[room]:
+        ai_scheduler.cancel(room, "room_empty")
+
+
+async def _emit_ai_error(room: str, stream_id: str, group_id: str, chat_id: str):
+    """Tell the room an AI reply failed; the notice is not stored and stays out of history."""
+    await room_emitter.emit(
         "new_message",
-        emit_data,
+        {
+            "role": "assistant",
+            "content": "Sorry, I encountered an error processing your request.",
+            "group_id": group_id,
+            "chat_id": chat_id,
+            "stream_id": stream_id,
+            "error": True,
+        },
         room=room,
     )
 
-    # Background: Embed and Store in Vector DB
-    # We run this in background so we don't block the ACK to the client
-    import asyncio
-    async def ingest_message(txt, grp, cht, usr):
-        try:
-            from app.embeddings.embedder import embed_text
-            from app.core.mongo import get_vector_collection
-            
-            # Format content with sender info for better retrieval context
-            vector_content = f"User ({usr}): {txt}"
-            embedding = embed_text(vector_content)
-            
-            vec_col = get_vector_collection()
-            vec_col.insert_one({
-                "group_id": grp,
-                "chat_id": cht,
-                "content": vector_content,
-                "embedding": embedding,
-                "created_at": datetime.utcnow(),
-                "metadata": {"user_id": usr, "type": "chat_message"}
-            })
-            print(f"Message vectorized for {usr}")
-        except Exception as e:
-            print(f"Vector Ingest Error: {e}")
-
-    # Fire and forget (or safer: explicit task ref)
-    asyncio.create_task(ingest_message(content, group_id, chat_id, user))
 
-    # Trigger AI Response ONLY if explicitly requested
-    if data.get("trigger_ai"):
-        await sio.emit("typing", {}, room=room)
-        
-        from app.services.chat_service import process_chat_message
-        
-        # We need to fetch history if we want context-aware chat.
-        # For now, let's pass an empty history or you could fetch it using get_message_collection.
-        # To be efficient, we can fetch last 5 messages.
-        messages_col = get_message_collection()
-        cursor = messages_col.find(
-            {
-                "group_id": group_id,
-                "chat_id": chat_id,
-            },
-            {"_id": 0, "role": 1, "content": 1, "user_id": 1}
-        ).sort("created_at", -1).limit(30)
-        
-        history_list = []
-        # Cursor is latest first, so reverse it
-        for msg in cursor:
-            # Pass user_id as sender if role is user
-            sender = msg.get("user_id") if msg.get("role") == "user" else "Nexus AI"
-            history_list.append({"role": msg["role"], "content": msg["content"], "sender": sender})
-        history_list.reverse()
-        print(f"DEBUG HISTORY: {history_list}")
-        with open("debug_nexus_history.txt", "a") as f:
-            f.write(f"\n--- {datetime.utcnow()} ---\n")
-            f.write(str(history_list))
-        
-        try:
-            reply_to_context = None
-            if reply_to:
-                # reply_to is a dict {id, sender, content}
-                reply_to_context = f"Replying to {reply_to.get('sender', 'Unknown')}: {reply_to.get('content', '')}"
-                print(f"DEBUG: Generated reply_to_context: {reply_to_context}")
-
-            answer, _ = await process_chat_message(
-                user_query=content,
-                group_id=group_id,
-                chat_id=chat_id,
-                user_email=user, # Keep email for unique ID
-                user_name=ai_context_name, # Pass full name for AI context
-                history=history_list,
-                reply_to_context=reply_to_context
-            )
+async def _run_ai_reply(room: str, **kwargs):
+    from app.services.chat_service import process_chat_message, stream_chat_message
 
-            await sio.emit(
+    stream_id = uuid.uuid4().hex
+    try:
+        if not AI_STREAMING_ENABLED:
+            answer, _, message_id, seq = await process_chat_message(**kwargs)
+            if message_id is None:
+                # Generation failed and the fallback text was not stored
+                await _emit_ai_error(room, stream_id, kwargs["group_id"], kwargs["chat_id"])
+                return
+            room_history.append(room, message_id, "assistant", answer, AI_SENDER)
+            await room_emitter.emit(
                 "new_message",
                 {
                     "role": "assistant",
                     "content": answer,
+                    "id": message_id,
+                    "seq": seq,
+                    "group_id": kwargs["group_id"],
+                    "chat_id": kwargs["chat_id"],
                 },
                 room=room,
             )
-        except Exception as e:
-            import traceback
-            traceback.print_exc()
-            print(f"AI Generation failed: {e}")
-            with open("debug_nexus_error.txt", "a") as f:
-                f.write(f"\n--- ERROR {datetime.utcnow()} ---\n")
-                f.write(traceback.format_exc())
-            
-            await sio.emit(
-                "new_message",
-                {
-                    "role": "assistant",
-                    "content": "Sorry, I encountered an error processing your request.",
-                },
-                room=room,
-            )
+            return
+
+        loop = asyncio.get_running_loop()
+        flush_interval = AI_STREAM_FLUSH_MS / 1000
+        pending = []
+        last_flush = 0.0
+
+        async def flush():
+            nonlocal last_flush
+            if pending:
+                await sio.emit("assistant_delta", {
+                    "stream_id": stream_id,
+                    "delta": "".join(pending),
+                    "group_id": kwargs["group_id"],
+                    "chat_id": kwargs["chat_id"],
+                }, room=room)
+                pending.clear()
+            last_flush = loop.time()
+
+        async def on_delta(delta: str):
+            pending.append(delta)
+            if loop.time() - last_flush >= flush_interval:
+                await flush()
+
+        answer, _, message_id, seq = await stream_chat_message(on_delta=on_delta, **kwargs)
+        room_history.append(room, message_id, "assistant", answer, AI_SENDER)
+        await flush()
+
+        # Final committed message; clients replace the streamed draft with it
+        await room_emitter.emit(
+            "new_message",
+            {
+                "role": "assistant",
+                "content": answer,
+                "id": message_id,
+                "seq": seq,
+                "group_id": kwargs["group_id"],
+                "chat_id": kwargs["chat_id"],
+                "stream_id": stream_id,
+            },
+            room=room,
+        )
+
+    except asyncio.CancelledError as e:
+        reason = e.args[0] if e.args else "cancelled"
+        await sio.emit("assistant_cancelled", {"stream_id": stream_id, "reason": reason}, room=room)
+        raise
+
+    except Exception as e:
+        log_event(logger, logging.ERROR, "ai.reply_failed", f"AI generation failed: {e}",
+                  exc_info=True, room=room, stream_id=stream_id)
+
+        await _emit_ai_error(room, stream_id, kwargs["group_id"], kwargs["chat_id"])
+
+
+# One AI generation at a time per room, shared by triggers that arrive together
+ai_scheduler = AIReplyScheduler(run=_run_ai_reply)
 
 
 @sio.event
 async def typing(sid, data):
-    """Handle typing indicators"""
+    """Handle typing indicators (coalesced per room, see TypingAggregator)"""
     try:
         if not data or "group_id" not in data or "chat_id" not in data:
             return
         
+        session = await sio.get_session(sid)
+        if not await authorize_room(sid, session["user"], "typing", data["group_id"], data["chat_id"]):
+            return
+
+        retry_after = flood_control.check_typing(session["user"])
+        if retry_after is not None:
+            await reject_rate_limited(sid, session["user"], "typing", retry_after)
+            return
+
         room = f"{data['group_id']}:{data['chat_id']}"
-        await sio.emit("typing", {}, room=room, skip_sid=sid)
+        typing_aggregator.touch(room, sid, session["user"])
         
     except Exception as e:
         logger.error(f"Error in typing handler: {e}", exc_info=True)
@@ -330,16 +537,21 @@ async def delete_message(sid, data):
         if not all([message_id, delete_type, group_id, chat_id]):
             return
 
-        from app.core.mongo import get_message_collection
-        from bson import ObjectId
-        messages = get_message_collection()
-        
+        if not await authorize_room(sid, user, "delete_message", group_id, chat_id):
+            return
+
+        retry_after = flood_control.check_message_event(user, f"{group_id}:{chat_id}")
+        if retry_after is not None:
+            await reject_rate_limited(sid, user, "delete_message", retry_after, group_id=group_id, chat_id=chat_id)
+            return
+
         room = f"{group_id}:{chat_id}"
         
         if delete_type == "everyone":
             # Verify sender
-            msg = messages.find_one({"_id": ObjectId(message_id)})
-            if not msg:
+            msg = await message_store.get(group_id, chat_id, message_id)
+            if not msg or msg.get("archived"):
+                # Archived messages are read-only
                 return
                 
             if msg.get("user_id") != user:
@@ -347,35 +559,36 @@ async def delete_message(sid, data):
                 return
 
             # Update DB
-            messages.update_one(
-                {"_id": ObjectId(message_id)},
-                {
-                    "$set": {
-                        "content": "This message was deleted",
-                        "is_deleted": True,
-                        "replyTo": None # Remove reply reference if deleted
-                    }
+            seq = await message_log.update(group_id, chat_id, message_id, {
+                "$set": {
+                    "content": "This message was deleted",
+                    "is_deleted": True,
+                    "replyTo": None # Remove reply reference if deleted
                 }
-            )
+            })
             
+            room_history.update(room, message_id, DELETED_CONTENT)
+            # Stop retrieving it for AI context (background, batched)
+            await ingestion_pipeline.submit_delete(message_id)
+
             # Broadcast to everyone
-            await sio.emit("message_deleted", {
+            await room_emitter.emit("message_deleted", {
                 "id": message_id,
+                "seq": seq,
                 "type": "everyone",
                 "chat_id": chat_id,
                 "group_id": group_id
             }, room=room)
             
         elif delete_type == "me":
-            # Add user to deleted_for array
-            messages.update_one(
-                {"_id": ObjectId(message_id)},
-                {"$addToSet": {"deleted_for": user}}
-            )
+            # Add user to deleted_for array (stamped, so the user's other tabs resume it)
+            seq = await message_log.update(group_id, chat_id, message_id,
+                                           {"$addToSet": {"deleted_for": user}})
             
             # Emit only to sender (using sid directly)
             await sio.emit("message_deleted", {
                 "id": message_id,
+                "seq": seq,
                 "type": "me",
                 "chat_id": chat_id,
                 "group_id": group_id
@@ -400,15 +613,20 @@ async def edit_message(sid, data):
         if not all([message_id, new_content, group_id, chat_id]):
             return
 
-        from app.core.mongo import get_message_collection
-        from bson import ObjectId
-        messages = get_message_collection()
-        
+        if not await authorize_room(sid, user, "edit_message", group_id, chat_id):
+            return
+
+        retry_after = flood_control.check_message_event(user, f"{group_id}:{chat_id}")
+        if retry_after is not None:
+            await reject_rate_limited(sid, user, "edit_message", retry_after, group_id=group_id, chat_id=chat_id)
+            return
+
         room = f"{group_id}:{chat_id}"
         
         # Verify sender
-        msg = messages.find_one({"_id": ObjectId(message_id)})
-        if not msg:
+        msg = await message_store.get(group_id, chat_id, message_id)
+        if not msg or msg.get("archived"):
+            # Archived messages are read-only
             return
             
         if msg.get("user_id") != user:
@@ -416,20 +634,25 @@ async def edit_message(sid, data):
             return
 
         # Update DB
-        messages.update_one(
-            {"_id": ObjectId(message_id)},
-            {
-                "$set": {
-                    "content": new_content,
-                    "is_edited": True,
-                    "updated_at": datetime.utcnow()
-                }
+        seq = await message_log.update(group_id, chat_id, message_id, {
+            "$set": {
+                "content": new_content,
+                "is_edited": True,
+                "updated_at": datetime.utcnow()
             }
-        )
+        })
         
+        room_history.update(room, message_id, new_content)
+        if msg.get("role", "user") == "user" and not msg.get("is_deleted"):
+            # Re-embed the new text in the background; the old vector is replaced
+            await ingestion_pipeline.submit_update(chat_message_vector(
+                message_id, group_id, chat_id, user, new_content, msg.get("created_at")
+            ))
+
         # Broadcast to everyone
-        await sio.emit("message_updated", {
+        await room_emitter.emit("message_updated", {
             "id": message_id,
+            "seq": seq,
             "content": new_content,
             "is_edited": True,
             "chat_id": chat_id,
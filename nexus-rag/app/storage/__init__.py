@@ -0,0 +1,86 @@
+"""
+Storage behind the app: repositories for users, groups, OTPs, vectors and
+sequence counters (interfaces in app/storage/base.py), picked by
+STORAGE_BACKEND. Messages go through app.services.message_store, which uses
+MemoryMessageStore from here with the memory backend.
+
+    from app.storage import storage
+    user = await storage.users.get_by_email(email)
+
+Maintenance scripts (migrations, archiver, consistency checks, index
+creation) work on the Mongo collections directly and need the mongo backend.
+"""
+import logging
+from typing import Optional
+
+from app.core.config import STORAGE_BACKEND
+from app.storage.memory import (
+    InjectedLatency,
+    MemoryUserRepository,
+    MemoryGroupRepository,
+    MemoryOtpRepository,
+    MemoryVectorRepository,
+    MemoryCounterRepository,
+)
+from app.storage.mongo import (
+    MongoUserRepository,
+    MongoGroupRepository,
+    MongoOtpRepository,
+    MongoVectorRepository,
+    MongoCounterRepository,
+)
+
+logger = logging.getLogger(__name__)
+
+
+class Storage:
+    """The repositories of one backend."""
+
+    def __init__(self, backend: str, users, groups, otps, vectors, counters,
+                 latency: Optional[InjectedLatency] = None):
+        self.backend = backend
+        self.users = users
+        self.groups = groups
+        self.otps = otps
+        self.vectors = vectors
+        self.counters = counters
+        # Memory backend only: the simulated round trip shared by its repositories
+        self.latency = latency
+
+    @property
+    def is_memory(self) -> bool:
+        return self.backend == "memory"
+
+    def stats(self) -> dict:
+        stats = {"backend": self.backend}
+        if self.latency is not None:
+            stats.update(self.latency.stats())
+        return stats
+
+
+def create_storage(backend: str = STORAGE_BACKEND) -> Storage:
+    if backend == "memory":
+        latency = InjectedLatency()
+        logger.warning(f"In-memory storage (STORAGE_BACKEND=memory, {latency.latency_ms:g}ms per call); nothing is persisted")
+        return Storage(
+            "memory",
+            MemoryUserRepository(latency),
+            MemoryGroupRepository(latency),
+            MemoryOtpRepository(latency),
+            MemoryVectorRepository(latency),
+            MemoryCounterRepository(latency),
+            latency,
+        )
+    if backend != "mongo":
+        logger.warning(f"Unknown STORAGE_BACKEND {backend!r}, using mongo")
+    return Storage(
+        "mongo",
+        MongoUserRepository(),
+        MongoGroupRepository(),
+        MongoOtpRepository(),
+        MongoVectorRepository(),
+        MongoCounterRepository(),
+    )
+
+
+storage = create_storage()
@@ -0,0 +1,124 @@
+"""
+Repository interfaces. Every backend implements these method sets; documents
+go in and come out as plain dicts shaped like the Mongo documents (`_id` is
+an ObjectId), so callers don't depend on the backend.
+"""
+from typing import Iterable, Optional
+
+from bson import ObjectId
+
+# Vector operations applied by VectorRepository.apply(): (op, document);
+# delete documents only carry message_id
+INSERT, UPDATE, DELETE = "insert", "update", "delete"
+
+
+class UserRepository:
+    """The `users` collection."""
+
+    async def get_by_email(self, email: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def get_by_username(self, username: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def get_by_login(self, identifier: str) -> Optional[dict]:
+        """The user whose email or username is `identifier`."""
+        raise NotImplementedError
+
+    async def profiles(self, emails: Iterable[str]) -> list:
+        """Users with one of `emails` (display fields only)."""
+        raise NotImplementedError
+
+    async def insert(self, doc: dict) -> ObjectId:
+        """Store a new user; sets and returns doc["_id"]."""
+        raise NotImplementedError
+
+    async def update(self, user_id: ObjectId, fields: dict) -> bool:
+        """Set `fields` on a user; False if there is no such user."""
+        raise NotImplementedError
+
+    async def update_by_email(self, email: str, fields: dict) -> bool:
+        raise NotImplementedError
+
+
+class GroupRepository:
+    """The `groups` collection. A group has an owner (`user_id`), `members` and `chats` ({id, title})."""
+
+    async def for_member(self, email: str, fields: Optional[dict] = None) -> list:
+        """Every group `email` owns or is a member of; `fields` is a projection the backend may apply."""
+        raise NotImplementedError
+
+    async def get(self, group_id: ObjectId, fields: Optional[dict] = None) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def get_personal(self, email: str) -> Optional[dict]:
+        """The stored Personal group of a user, if a chat was ever created in it."""
+        raise NotImplementedError
+
+    async def insert(self, doc: dict) -> ObjectId:
+        """Store a new group; sets and returns doc["_id"]."""
+        raise NotImplementedError
+
+    async def delete(self, group_id: ObjectId):
+        raise NotImplementedError
+
+    async def add_chat(self, group_id: ObjectId, chat: dict):
+        raise NotImplementedError
+
+    async def remove_chat(self, group_id: ObjectId, chat_id: str):
+        raise NotImplementedError
+
+    async def add_member(self, group_id: ObjectId, email: str):
+        raise NotImplementedError
+
+    async def remove_member(self, group_id: ObjectId, email: str) -> bool:
+        """False if `email` was not a member."""
+        raise NotImplementedError
+
+
+class OtpRepository:
+    """One-time passwords, one per (email, purpose)."""
+
+    async def replace(self, doc: dict):
+        """Store `doc` as the OTP of its email and purpose, dropping any earlier one."""
+        raise NotImplementedError
+
+    async def get(self, email: str, purpose: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def add_attempt(self, otp_id: ObjectId):
+        raise NotImplementedError
+
+    async def delete(self, otp_id: ObjectId):
+        raise NotImplementedError
+
+    async def clear(self, email: str, purpose: str):
+        raise NotImplementedError
+
+
+class VectorRepository:
+    """Embedded texts for retrieval; chat-message vectors are linked to their message by `message_id`."""
+
+    async def insert(self, doc: dict):
+        raise NotImplementedError
+
+    async def apply(self, ops: list):
+        """
+        Apply (op, document) pairs, at most one per message: INSERT stores the
+        document, UPDATE replaces the message's vector (or stores it), DELETE
+        removes the message's vectors.
+        """
+        raise NotImplementedError
+
+    async def search(self, embedding: list, limit: int, group_id: Optional[str] = None,
+                     chat_id: Optional[str] = None) -> list:
+        """Nearest `limit` vectors as {"id", "content", "score"}, best first, optionally within one chat."""
+        raise NotImplementedError
+
+
+class CounterRepository:
+    """Named counters shared by all workers (chat sequence numbers)."""
+
+    async def reserve(self, name: str, count: int) -> int:
+        """Add `count` to a counter (starting at 0); returns the new value."""
+        raise NotImplementedError
@@ -0,0 +1,388 @@
+"""
+In-process storage (STORAGE_BACKEND=memory) for load tests and offline
+benchmarks: dicts and lists instead of collections, so a run measures the
+app's own CPU cost, plus whatever round trip MEMORY_STORAGE_LATENCY_MS
+simulates. State lives in one worker and is lost on restart.
+
+Stored documents are copied in and out, as they would be through BSON, so
+callers can't change them behind the store's back.
+"""
+import asyncio
+import bisect
+import copy
+import random
+from collections import defaultdict
+from typing import Iterable, Optional
+
+import numpy as np
+from bson import ObjectId
+
+from app.core.config import MEMORY_STORAGE_LATENCY_MS, MEMORY_STORAGE_JITTER_MS
+from app.storage.base import (
+    INSERT,
+    UPDATE,
+    UserRepository,
+    GroupRepository,
+    OtpRepository,
+    VectorRepository,
+    CounterRepository,
+)
+
+
+class InjectedLatency:
+    """Awaited once per storage call: sleeps latency_ms plus a uniform 0..jitter_ms."""
+
+    def __init__(self, latency_ms: float = MEMORY_STORAGE_LATENCY_MS, jitter_ms: float = MEMORY_STORAGE_JITTER_MS):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.calls = 0
+
+    async def __call__(self):
+        self.calls += 1
+        delay = self.latency_ms + (random.uniform(0, self.jitter_ms) if self.jitter_ms > 0 else 0)
+        if delay > 0:
+            await asyncio.sleep(delay / 1000)
+
+    def stats(self) -> dict:
+        return {"latency_ms": self.latency_ms, "jitter_ms": self.jitter_ms, "calls": self.calls}
+
+
+def _copy(doc: Optional[dict]) -> Optional[dict]:
+    return copy.deepcopy(doc) if doc is not None else None
+
+
+class MemoryUserRepository(UserRepository):
+    def __init__(self, latency: InjectedLatency):
+        self._latency = latency
+        self._by_id: dict = {}
+        self._by_email: dict = {}
+        self._by_username: dict = {}
+
+    def _index(self, doc: dict):
+        self._by_email[doc["email"]] = doc
+        if doc.get("username"):
+            self._by_username[doc["username"]] = doc
+
+    def _unindex(self, doc: dict):
+        self._by_email.pop(doc["email"], None)
+        if doc.get("username"):
+            self._by_username.pop(doc["username"], None)
+
+    async def get_by_email(self, email: str) -> Optional[dict]:
+        await self._latency()
+        return _copy(self._by_email.get(email))
+
+    async def get_by_username(self, username: str) -> Optional[dict]:
+        await self._latency()
+        return _copy(self._by_username.get(username))
+
+    async def get_by_login(self, identifier: str) -> Optional[dict]:
+        await self._latency()
+        return _copy(self._by_email.get(identifier) or self._by_username.get(identifier))
+
+    async def profiles(self, emails: Iterable[str]) -> list:
+        await self._latency()
+        return [_copy(self._by_email[email]) for email in set(emails) if email in self._by_email]
+
+    async def insert(self, doc: dict) -> ObjectId:
+        await self._latency()
+        # The unique indexes of the users collection
+        if doc["email"] in self._by_email or (doc.get("username") and doc["username"] in self._by_username):
+            raise ValueError(f"duplicate user {doc['email']!r}")
+        doc.setdefault("_id", ObjectId())
+        stored = _copy(doc)
+        self._by_id[stored["_id"]] = stored
+        self._index(stored)
+        return doc["_id"]
+
+    def _set(self, doc: Optional[dict], fields: dict) -> bool:
+        if doc is None:
+            return False
+        self._unindex(doc)
+        doc.update(copy.deepcopy(fields))
+        self._index(doc)
+        return True
+
+    async def update(self, user_id: ObjectId, fields: dict) -> bool:
+        await self._latency()
+        return self._set(self._by_id.get(user_id), fields)
+
+    async def update_by_email(self, email: str, fields: dict) -> bool:
+        await self._latency()
+        return self._set(self._by_email.get(email), fields)
+
+
+class MemoryGroupRepository(GroupRepository):
+    def __init__(self, latency: InjectedLatency):
+        self._latency = latency
+        self._groups: dict = {}
+        self._by_user = defaultdict(set)  # owner or member email -> group ids
+
+    def _index(self, doc: dict):
+        for email in [doc.get("user_id"), *doc.get("members", ())]:
+            if email:
+                self._by_user[email].add(doc["_id"])
+
+    async def for_member(self, email: str, fields: Optional[dict] = None) -> list:
+        await self._latency()
+        return [_copy(self._groups[group_id]) for group_id in self._by_user.get(email, ()) if group_id in self._groups]
+
+    async def get(self, group_id: ObjectId, fields: Optional[dict] = None) -> Optional[dict]:
+        await self._latency()
+        return _copy(self._groups.get(group_id))
+
+    async def get_personal(self, email: str) -> Optional[dict]:
+        await self._latency()
+        for group_id in self._by_user.get(email, ()):
+            doc = self._groups.get(group_id)
+            if doc and doc.get("user_id") == email and doc.get("is_personal"):
+                return _copy(doc)
+        return None
+
+    async def insert(self, doc: dict) -> ObjectId:
+        await self._latency()
+        doc.setdefault("_id", ObjectId())
+        stored = _copy(doc)
+        self._groups[stored["_id"]] = stored
+        self._index(stored)
+        return doc["_id"]
+
+    async def delete(self, group_id: ObjectId):
+        await self._latency()
+        doc = self._groups.pop(group_id, None)
+        for email in [doc.get("user_id"), *doc.get("members", ())] if doc else ():
+            self._by_user[email].discard(group_id)
+
+    async def add_chat(self, group_id: ObjectId, chat: dict):
+        await self._latency()
+        if group_id in self._groups:
+            self._groups[group_id].setdefault("chats", []).append(dict(chat))
+
+    async def remove_chat(self, group_id: ObjectId, chat_id: str):
+        await self._latency()
+        if group_id in self._groups:
+            doc = self._groups[group_id]
+            doc["chats"] = [chat for chat in doc.get("chats", []) if chat.get("id") != chat_id]
+
+    async def add_member(self, group_id: ObjectId, email: str):
+        await self._latency()
+        doc = self._groups.get(group_id)
+        if doc is not None and email not in doc.setdefault("members", []):
+            doc["members"].append(email)
+            self._by_user[email].add(group_id)
+
+    async def remove_member(self, group_id: ObjectId, email: str) -> bool:
+        await self._latency()
+        doc = self._groups.get(group_id)
+        if doc is None or email not in doc.get("members", ()):
+            return False
+        doc["members"] = [member for member in doc["members"] if member != email]
+        if doc.get("user_id") != email:
+            self._by_user[email].discard(group_id)
+        return True
+
+
+class MemoryOtpRepository(OtpRepository):
+    def __init__(self, latency: InjectedLatency):
+        self._latency = latency
+        self._otps: dict = {}  # (email, purpose) -> doc
+
+    async def replace(self, doc: dict):
+        await self._latency()
+        doc.setdefault("_id", ObjectId())
+        self._otps[(doc["email"], doc["purpose"])] = _copy(doc)
+
+    async def get(self, email: str, purpose: str) -> Optional[dict]:
+        await self._latency()
+        return _copy(self._otps.get((email, purpose)))
+
+    def _find(self, otp_id: ObjectId):
+        return next((key for key, doc in self._otps.items() if doc["_id"] == otp_id), None)
+
+    async def add_attempt(self, otp_id: ObjectId):
+        await self._latency()
+        key = self._find(otp_id)
+        if key is not None:
+            self._otps[key]["attempts"] = self._otps[key].get("attempts", 0) + 1
+
+    async def delete(self, otp_id: ObjectId):
+        await self._latency()
+        key = self._find(otp_id)
+        if key is not None:
+            del self._otps[key]
+
+    async def clear(self, email: str, purpose: str):
+        await self._latency()
+        self._otps.pop((email, purpose), None)
+
+
+class MemoryVectorRepository(VectorRepository):
+    """Vectors in a list; search is an exact cosine scan over the matching ones."""
+
+    def __init__(self, latency: InjectedLatency):
+        self._latency = latency
+        self._docs: list = []
+
+    async def insert(self, doc: dict):
+        await self._latency()
+        doc.setdefault("_id", ObjectId())
+        self._docs.append(_copy(doc))
+
+    async def apply(self, ops: list):
+        await self._latency()
+        replaced = {doc["message_id"] for op, doc in ops if op != INSERT}
+        if replaced:
+            self._docs = [doc for doc in self._docs if doc.get("message_id") not in replaced]
+        for op, doc in ops:
+            if op in (INSERT, UPDATE):
+                doc.setdefault("_id", ObjectId())
+                self._docs.append(_copy(doc))
+
+    async def search(self, embedding: list, limit: int, group_id: Optional[str] = None,
+                     chat_id: Optional[str] = None) -> list:
+        await self._latency()
+        candidates = [
+            doc for doc in self._docs
+            if doc.get("embedding") is not None
+            and (group_id is None or doc.get("group_id") == group_id)
+            and (chat_id is None or doc.get("chat_id") == chat_id)
+        ]
+        if not candidates:
+            return []
+        matrix = np.asarray([doc["embedding"] for doc in candidates], dtype=np.float32)
+        query = np.asarray(embedding, dtype=np.float32)
+        scores = matrix @ query / (np.linalg.norm(matrix, axis=1) * np.linalg.norm(query) + 1e-12)
+        best = np.argsort(-scores)[:limit]
+        return [
+            {"id": str(candidates[i]["_id"]), "content": candidates[i].get("content", ""), "score": float(scores[i])}
+            for i in best
+        ]
+
+
+class MemoryCounterRepository(CounterRepository):
+    def __init__(self, latency: InjectedLatency):
+        self._latency = latency
+        self._counters = defaultdict(int)
+
+    async def reserve(self, name: str, count: int) -> int:
+        await self._latency()
+        self._counters[name] += count
+        return self._counters[name]
+
+
+def _key(doc: dict) -> tuple:
+    return doc["created_at"], doc["_id"]
+
+
+def _apply_update(doc: dict, update: dict):
+    """The Mongo update operators message updates use."""
+    for op, fields in update.items():
+        for field, value in fields.items():
+            if op == "$set":
+                doc[field] = copy.deepcopy(value)
+            elif op == "$unset":
+                doc.pop(field, None)
+            elif op == "$inc":
+                doc[field] = doc.get(field, 0) + value
+            elif op == "$addToSet":
+                if value not in doc.setdefault(field, []):
+                    doc[field].append(copy.deepcopy(value))
+            else:
+                raise ValueError(f"Unsupported update operator {op!r}")
+
+
+class MemoryMessageStore:
+    """
+    Messages per chat in a list kept in (created_at, _id) order, plus an id
+    index; same interface as DocumentMessageStore. Read profiles don't apply.
+    """
+
+    layout = "memory"
+
+    def __init__(self, latency: InjectedLatency):
+        self._latency = latency
+        self._chats = defaultdict(list)  # (group_id, chat_id) -> messages in page order
+        self._by_id: dict = {}
+
+    def _store(self, doc: dict):
+        doc.setdefault("_id", ObjectId())
+        stored = _copy(doc)
+        bisect.insort(self._chats[(stored["group_id"], stored["chat_id"])], stored, key=_key)
+        self._by_id[stored["_id"]] = stored
+
+    async def insert_one(self, doc: dict):
+        await self._latency()
+        self._store(doc)
+
+    async def insert_many(self, docs: list):
+        await self._latency()
+        for doc in docs:
+            self._store(doc)
+
+    def _lookup(self, group_id: str, chat_id: str, message_id: str) -> Optional[dict]:
+        doc = self._by_id.get(ObjectId(message_id))
+        if doc is None or doc["group_id"] != group_id or doc["chat_id"] != chat_id:
+            return None
+        return doc
+
+    async def get(self, group_id: str, chat_id: str, message_id: str) -> Optional[dict]:
+        await self._latency()
+        return _copy(self._lookup(group_id, chat_id, message_id))
+
+    async def update(self, group_id: str, chat_id: str, message_id: str, update: dict):
+        await self._latency()
+        doc = self._lookup(group_id, chat_id, message_id)
+        if doc is not None:
+            _apply_update(doc, update)
+
+    async def page(self, group_id: str, chat_id: str, viewer: Optional[str] = None,
+                   anchor: Optional[dict] = None, older: bool = True, limit: int = 50,
+                   profile: str = "history") -> list:
+        """Up to `limit` messages before/after the anchor (latest without one), oldest first."""
+        await self._latency()
+        messages = self._chats.get((group_id, chat_id), [])
+        visible = (lambda doc: viewer not in doc.get("deleted_for", ())) if viewer is not None else (lambda doc: True)
+        picked = []
+        if older:
+            end = bisect.bisect_left(messages, _key(anchor), key=_key) if anchor is not None else len(messages)
+            for i in range(end - 1, -1, -1):
+                if len(picked) == limit:
+                    break
+                if visible(messages[i]):
+                    picked.append(messages[i])
+            picked.reverse()
+        else:
+            start = bisect.bisect_right(messages, _key(anchor), key=_key) if anchor is not None else 0
+            for doc in messages[start:]:
+                if len(picked) == limit:
+                    break
+                if visible(doc):
+                    picked.append(doc)
+        return [_copy(doc) for doc in picked]
+
+    async def changed_since(self, group_id: str, chat_id: str, floor: int, limit: int) -> list:
+        """Up to `limit` messages with updated_seq > floor, in updated_seq order (scans the chat)."""
+        await self._latency()
+        changed = [doc for doc in self._chats.get((group_id, chat_id), []) if (doc.get("updated_seq") or 0) > floor]
+        changed.sort(key=lambda doc: doc["updated_seq"])
+        return [_copy(doc) for doc in changed[:limit]]
+
+    async def user_messages(self, group_id: str, chat_id: str, user_id: str, profile: str = "history") -> list:
+        await self._latency()
+        return [_copy(doc) for doc in self._chats.get((group_id, chat_id), []) if doc.get("user_id") == user_id]
+
+    async def chat_ids(self, group_id: str, user_id: str, profile: str = "analytics") -> list:
+        await self._latency()
+        return [
+            chat_id for (g, chat_id), messages in self._chats.items()
+            if g == group_id and any(doc.get("user_id") == user_id for doc in messages)
+        ]
+
+    async def delete(self, group_id: str, chat_id: Optional[str] = None):
+        await self._latency()
+        for key in [key for key in self._chats if key[0] == group_id and (chat_id is None or key[1] == chat_id)]:
+            for doc in self._chats.pop(key):
+                self._by_id.pop(doc["_id"], None)
+
+    def stats(self) -> dict:
+        return {"chats": len(self._chats), "messages": len(self._by_id)}
@@ -0,0 +1,164 @@
+"""MongoDB repositories (STORAGE_BACKEND=mongo), on the async client from app.core.async_mongo."""
+import logging
+from typing import Iterable, Optional
+
+from bson import ObjectId
+from pymongo import DeleteMany, InsertOne, ReplaceOne, ReturnDocument
+
+from app.core.async_mongo import (
+    get_async_db,
+    get_async_users_collection,
+    get_async_groups_collection,
+    get_async_vector_collection,
+)
+from app.storage.base import (
+    INSERT,
+    UPDATE,
+    UserRepository,
+    GroupRepository,
+    OtpRepository,
+    VectorRepository,
+    CounterRepository,
+)
+
+logger = logging.getLogger(__name__)
+
+OTP_COLLECTION = "otps"
+SEQUENCE_COLLECTION = "chat_sequences"
+
+# Atlas vector search index on the vector collection's `embedding`
+VECTOR_INDEX = "embedding_index"
+
+
+class MongoUserRepository(UserRepository):
+    _PROFILE_FIELDS = {"email": 1, "full_name": 1, "username": 1, "profile_image": 1, "is_private": 1}
+
+    async def get_by_email(self, email: str) -> Optional[dict]:
+        return await get_async_users_collection().find_one({"email": email})
+
+    async def get_by_username(self, username: str) -> Optional[dict]:
+        return await get_async_users_collection().find_one({"username": username})
+
+    async def get_by_login(self, identifier: str) -> Optional[dict]:
+        return await get_async_users_collection().find_one(
+            {"$or": [{"email": identifier}, {"username": identifier}]}
+        )
+
+    async def profiles(self, emails: Iterable[str]) -> list:
+        cursor = get_async_users_collection().find({"email": {"$in": list(emails)}}, self._PROFILE_FIELDS)
+        return await cursor.to_list(length=None)
+
+    async def insert(self, doc: dict) -> ObjectId:
+        result = await get_async_users_collection().insert_one(doc)
+        return result.inserted_id
+
+    async def update(self, user_id: ObjectId, fields: dict) -> bool:
+        result = await get_async_users_collection().update_one({"_id": user_id}, {"$set": fields})
+        return result.matched_count > 0
+
+    async def update_by_email(self, email: str, fields: dict) -> bool:
+        result = await get_async_users_collection().update_one({"email": email}, {"$set": fields})
+        return result.matched_count > 0
+
+
+class MongoGroupRepository(GroupRepository):
+    async def for_member(self, email: str, fields: Optional[dict] = None) -> list:
+        cursor = get_async_groups_collection().find({"$or": [{"user_id": email}, {"members": email}]}, fields)
+        return await cursor.to_list(length=None)
+
+    async def get(self, group_id: ObjectId, fields: Optional[dict] = None) -> Optional[dict]:
+        return await get_async_groups_collection().find_one({"_id": group_id}, fields)
+
+    async def get_personal(self, email: str) -> Optional[dict]:
+        return await get_async_groups_collection().find_one({"user_id": email, "is_personal": True})
+
+    async def insert(self, doc: dict) -> ObjectId:
+        result = await get_async_groups_collection().insert_one(doc)
+        return result.inserted_id
+
+    async def delete(self, group_id: ObjectId):
+        await get_async_groups_collection().delete_one({"_id": group_id})
+
+    async def add_chat(self, group_id: ObjectId, chat: dict):
+        await get_async_groups_collection().update_one({"_id": group_id}, {"$push": {"chats": chat}})
+
+    async def remove_chat(self, group_id: ObjectId, chat_id: str):
+        await get_async_groups_collection().update_one({"_id": group_id}, {"$pull": {"chats": {"id": chat_id}}})
+
+    async def add_member(self, group_id: ObjectId, email: str):
+        await get_async_groups_collection().update_one({"_id": group_id}, {"$addToSet": {"members": email}})
+
+    async def remove_member(self, group_id: ObjectId, email: str) -> bool:
+        result = await get_async_groups_collection().update_one({"_id": group_id}, {"$pull": {"members": email}})
+        return result.modified_count > 0
+
+
+class MongoOtpRepository(OtpRepository):
+    def _collection(self):
+        return get_async_db()[OTP_COLLECTION]
+
+    async def replace(self, doc: dict):
+        await self._collection().delete_many({"email": doc["email"], "purpose": doc["purpose"]})
+        await self._collection().insert_one(doc)
+
+    async def get(self, email: str, purpose: str) -> Optional[dict]:
+        return await self._collection().find_one({"email": email, "purpose": purpose})
+
+    async def add_attempt(self, otp_id: ObjectId):
+        await self._collection().update_one({"_id": otp_id}, {"$inc": {"attempts": 1}})
+
+    async def delete(self, otp_id: ObjectId):
+        await self._collection().delete_one({"_id": otp_id})
+
+    async def clear(self, email: str, purpose: str):
+        await self._collection().delete_many({"email": email, "purpose": purpose})
+
+
+class MongoVectorRepository(VectorRepository):
+    async def insert(self, doc: dict):
+        await get_async_vector_collection().insert_one(doc)
+
+    async def apply(self, ops: list):
+        # One bulk_write; one operation per message, so the order doesn't matter
+        requests = []
+        for op, doc in ops:
+            if op == INSERT:
+                requests.append(InsertOne(doc))
+            elif op == UPDATE:
+                requests.append(ReplaceOne({"message_id": doc["message_id"]}, doc, upsert=True))
+            else:
+                requests.append(DeleteMany({"message_id": doc["message_id"]}))
+        if requests:
+            await get_async_vector_collection().bulk_write(requests, ordered=False)
+
+    async def search(self, embedding: list, limit: int, group_id: Optional[str] = None,
+                     chat_id: Optional[str] = None) -> list:
+        search = {
+            "index": VECTOR_INDEX,
+            "path": "embedding",
+            "queryVector": embedding,
+            "numCandidates": max(100, limit * 10),
+            "limit": limit,
+        }
+        scope = {k: v for k, v in (("group_id", group_id), ("chat_id", chat_id)) if v is not None}
+        if scope:
+            search["filter"] = scope
+        cursor = get_async_vector_collection().aggregate([
+            {"$vectorSearch": search},
+            {"$project": {"_id": 1, "content": 1, "score": {"$meta": "vectorSearchScore"}}},
+        ])
+        return [
+            {"id": str(doc["_id"]), "content": doc.get("content", ""), "score": float(doc.get("score", 0.0))}
+            async for doc in cursor
+        ]
+
+
+class MongoCounterRepository(CounterRepository):
+    async def reserve(self, name: str, count: int) -> int:
+        doc = await get_async_db()[SEQUENCE_COLLECTION].find_one_and_update(
+            {"_id": name},
+            {"$inc": {"seq": count}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        return doc["seq"]
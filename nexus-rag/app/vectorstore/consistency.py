@@ -0,0 +1,179 @@
+"""
+Drift report between the messages collection and the vector collection.
+
+Chat-message vectors are linked to their message by `message_id`; edits and
+deletes are applied to them in the background by the ingestion pipeline, so a
+dropped queue item or a crash can leave them behind. Run from nexus-rag/:
+
+    python -m app.vectorstore.consistency [--group G [--chat C]] [--fix]
+
+--fix deletes vectors of deleted or missing messages, re-embeds stale ones and
+links legacy vectors (stored before message_id existed) whose text still
+matches exactly one message. Messages without any vector are only reported;
+backfill_embeddings.py stores those.
+"""
+import argparse
+import json
+import logging
+from collections import defaultdict
+from typing import Optional
+
+from bson import ObjectId
+
+from app.core.config import MESSAGE_STORAGE
+from app.core.mongo import (
+    initialize_database,
+    get_message_collection,
+    get_message_bucket_collection,
+    get_archive_collection,
+    get_vector_collection,
+)
+from app.vectorstore.ingestion import chat_message_vector
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_SIZE = 20
+
+
+def _user_messages(scope: dict):
+    """User-role messages in scope, from whichever layout MESSAGE_STORAGE selects."""
+    fields = {"_id": 1, "user_id": 1, "group_id": 1, "chat_id": 1, "content": 1, "is_deleted": 1, "created_at": 1}
+    if MESSAGE_STORAGE != "buckets":
+        return get_message_collection().find({**scope, "role": "user"}, fields)
+    return get_message_bucket_collection().aggregate([
+        {"$match": {**scope, "messages.role": "user"}},
+        {"$unwind": "$messages"},
+        {"$match": {"messages.role": "user"}},
+        {"$replaceRoot": {"newRoot": {"$mergeObjects": [
+            "$messages", {"group_id": "$group_id", "chat_id": "$chat_id"},
+        ]}}},
+        {"$project": fields},
+    ])
+
+
+def _archived_ids(message_ids: list) -> set:
+    """The ids among `message_ids` that are in the message archive."""
+    oids = [ObjectId(i) for i in message_ids if ObjectId.is_valid(i)]
+    archived = set()
+    for i in range(0, len(oids), 1000):
+        chunk = oids[i:i + 1000]
+        for block in get_archive_collection().find({"message_ids": {"$in": chunk}}, {"message_ids": 1}):
+            archived.update(str(oid) for oid in block["message_ids"])
+    return archived & set(message_ids)
+
+
+def check_consistency(group_id: Optional[str] = None, chat_id: Optional[str] = None, fix: bool = False) -> dict:
+    """Compare user messages with their chat-message vectors; returns counts and sample ids per kind of drift."""
+    scope = {}
+    if group_id:
+        scope["group_id"] = group_id
+    if chat_id:
+        scope["chat_id"] = chat_id
+
+    messages = {}  # message id -> expected vector document
+    deleted = set()
+    by_text = defaultdict(list)  # (group_id, chat_id, vector content) -> message ids
+    for msg in _user_messages(scope):
+        message_id = str(msg["_id"])
+        if msg.get("is_deleted"):
+            deleted.add(message_id)
+            continue
+        if not msg.get("content"):
+            continue
+        expected = chat_message_vector(
+            message_id, msg.get("group_id"), msg.get("chat_id"), msg.get("user_id", "unknown"),
+            msg["content"], msg.get("created_at"),
+        )
+        messages[message_id] = expected
+        by_text[(expected["group_id"], expected["chat_id"], expected["content"])].append(message_id)
+
+    drift = {kind: [] for kind in ("deleted", "orphaned", "stale", "duplicate", "unlinked", "missing")}
+    linked = defaultdict(list)  # message id -> vector ids
+    links = []  # (vector id, message id) for legacy vectors that match one message
+    absent = []  # (vector id, message id) whose message is not in the hot tier
+
+    vectors = get_vector_collection()
+    cursor = vectors.find(
+        {**scope, "metadata.type": "chat_message"},
+        {"_id": 1, "message_id": 1, "group_id": 1, "chat_id": 1, "content": 1, "metadata": 1},
+    )
+    for vec in cursor:
+        # backfill_embeddings.py used to link through metadata.original_msg_id
+        message_id = vec.get("message_id") or vec.get("metadata", {}).get("original_msg_id")
+        if message_id is None:
+            matches = by_text.get((vec.get("group_id"), vec.get("chat_id"), vec.get("content")), [])
+            if len(matches) == 1:
+                links.append((vec["_id"], matches[0]))
+                linked[matches[0]].append(vec["_id"])
+            drift["unlinked"].append(vec["_id"])
+            continue
+
+        message_id = str(message_id)
+        linked[message_id].append(vec["_id"])
+        if message_id in deleted:
+            drift["deleted"].append(vec["_id"])
+        elif message_id not in messages:
+            absent.append((vec["_id"], message_id))
+        elif vec.get("content") != messages[message_id]["content"]:
+            drift["stale"].append(message_id)
+
+    # Vectors of archived messages are kept unless ARCHIVE_DROP_VECTORS removed them
+    archived = _archived_ids([message_id for _, message_id in absent])
+    drift["orphaned"] = [vector_id for vector_id, message_id in absent if message_id not in archived]
+
+    for message_id, vector_ids in linked.items():
+        if len(vector_ids) > 1:
+            drift["duplicate"].append(message_id)
+    drift["missing"] = [message_id for message_id in messages if message_id not in linked]
+
+    report = {
+        "scope": scope or "all",
+        "messages": len(messages),
+        "deleted_messages": len(deleted),
+        "archived_messages": len(archived),
+        **{kind: len(ids) for kind, ids in drift.items()},
+        "samples": {kind: [str(i) for i in ids[:SAMPLE_SIZE]] for kind, ids in drift.items() if ids},
+    }
+
+    if fix:
+        report["fixed"] = _fix(vectors, drift, messages, links)
+    return report
+
+
+def _fix(vectors, drift: dict, messages: dict, links: list) -> dict:
+    from app.embeddings.embedder import embed_texts
+
+    removed = vectors.delete_many({"_id": {"$in": drift["deleted"] + drift["orphaned"]}}).deleted_count
+
+    linked_ids = set()
+    for vector_id, message_id in links:
+        vectors.update_one({"_id": vector_id}, {"$set": {"message_id": message_id}})
+        linked_ids.add(vector_id)
+    # Legacy vectors matching no current message hold text that was edited or deleted
+    unmatched = [vector_id for vector_id in drift["unlinked"] if vector_id not in linked_ids]
+    removed += vectors.delete_many({"_id": {"$in": unmatched}}).deleted_count
+
+    # Stale and duplicated vectors are replaced by one fresh document per message
+    rebuild = list(dict.fromkeys(drift["stale"] + drift["duplicate"]))
+    docs = [dict(messages[message_id]) for message_id in rebuild if message_id in messages]
+    if docs:
+        for doc, embedding in zip(docs, embed_texts([doc["content"] for doc in docs])):
+            doc["embedding"] = embedding
+            vectors.delete_many({"$or": [
+                {"message_id": doc["message_id"]},
+                {"metadata.original_msg_id": ObjectId(doc["message_id"])},
+            ]})
+            vectors.insert_one(doc)
+
+    return {"removed": removed, "linked": len(linked_ids), "reembedded": len(docs)}
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report drift between messages and their vectors")
+    parser.add_argument("--group", help="only this group_id")
+    parser.add_argument("--chat", help="only this chat_id (with --group)")
+    parser.add_argument("--fix", action="store_true", help="repair what can be repaired")
+    args = parser.parse_args()
+
+    initialize_database()
+    print(json.dumps(check_consistency(args.group, args.chat, args.fix), indent=2, default=str))
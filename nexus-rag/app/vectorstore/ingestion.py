@@ -0,0 +1,266 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+from typing import Optional
+
+from app.core.config import (
+    INGEST_QUEUE_MAX_SIZE,
+    INGEST_BATCH_SIZE,
+    INGEST_BATCH_WAIT_MS,
+    INGEST_OVERFLOW_POLICY,
+    INGEST_BLOCK_TIMEOUT_MS,
+    INGEST_SHUTDOWN_TIMEOUT_SECONDS,
+)
+from app.storage.base import INSERT, UPDATE, DELETE
+
+logger = logging.getLogger(__name__)
+
+OVERFLOW_POLICIES = ("block", "drop_newest", "drop_oldest")
+
+def chat_message_vector(message_id: str, group_id: str, chat_id: str, user_id: str, content: str,
+                        created_at: Optional[datetime] = None) -> dict:
+    """Vector document for a chat message, linked to it by message_id (no embedding yet)."""
+    return {
+        "message_id": message_id,
+        "group_id": group_id,
+        "chat_id": chat_id,
+        "content": f"User ({user_id}): {content}",
+        "created_at": created_at or datetime.utcnow(),
+        "metadata": {"user_id": user_id, "type": "chat_message"},
+    }
+
+
+def coalesce_ops(batch: list) -> list:
+    """
+    Reduce a batch to one operation per message, keeping the final state:
+    insert + update stores the edited text once, insert + delete stores nothing,
+    anything else keeps the last operation. Documents without a message_id pass
+    through unchanged.
+    """
+    ops: dict = {}
+    for i, (op, doc) in enumerate(batch):
+        key = doc.get("message_id") or ("unlinked", i)
+        previous = ops.get(key)
+        if previous is not None and previous[0] == INSERT:
+            if op == UPDATE:
+                op = INSERT
+            elif op == DELETE:
+                del ops[key]
+                continue
+        ops[key] = (op, doc)
+    return list(ops.values())
+
+
+class IngestionPipeline:
+    """
+    Bounded, batched background maintenance of the vector collection.
+
+    Producers (socket handlers) call submit() with a vector document that has no
+    embedding yet, submit_update() when the message it came from is edited and
+    submit_delete() when it is deleted for everyone. A single worker drains the
+    queue in batches of up to `batch_size` items (or whatever arrived within
+    `batch_wait_ms`), folds them into one operation per message, embeds every
+    new text with one model call on a dedicated thread and applies the batch
+    with one storage call (a bulk_write on Mongo), so the event loop never runs
+    the model or blocking I/O. Vector documents are found by their `message_id`.
+
+    When the queue is full the overflow policy decides what happens:
+      block        wait up to `block_timeout_ms` for space, then drop the new item
+      drop_newest  drop the new item
+      drop_oldest  evict the oldest queued item to make room
+    """
+
+    def __init__(
+        self,
+        max_size: int = INGEST_QUEUE_MAX_SIZE,
+        batch_size: int = INGEST_BATCH_SIZE,
+        batch_wait_ms: int = INGEST_BATCH_WAIT_MS,
+        overflow_policy: str = INGEST_OVERFLOW_POLICY,
+        block_timeout_ms: int = INGEST_BLOCK_TIMEOUT_MS,
+    ):
+        if overflow_policy not in OVERFLOW_POLICIES:
+            raise ValueError(f"Unknown ingest overflow policy '{overflow_policy}', expected one of {OVERFLOW_POLICIES}")
+
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000
+        self.overflow_policy = overflow_policy
+        self.block_timeout = block_timeout_ms / 1000
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+
+        self.enqueued = 0
+        self.dropped = 0
+        self.processed = 0
+        self.updated = 0
+        self.deleted = 0
+        self.coalesced = 0
+        self.failed = 0
+        self.batches = 0
+        self.max_depth_seen = 0
+        self.last_batch_size = 0
+        self.last_batch_ms = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._worker is not None and not self._worker.done()
+
+    def start(self):
+        """Start the background worker. Call from the application startup hook."""
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.max_size)
+        self._worker = asyncio.create_task(self._run(), name="vector-ingestion")
+        logger.info(
+            f"Vector ingestion started (queue={self.max_size}, batch={self.batch_size}, "
+            f"wait={int(self.batch_wait * 1000)}ms, policy={self.overflow_policy})"
+        )
+
+    async def stop(self, timeout: float = INGEST_SHUTDOWN_TIMEOUT_SECONDS):
+        """Flush whatever is queued (bounded by `timeout`) and stop the worker."""
+        if not self.running:
+            return
+
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout=timeout)
+            logger.info("Vector ingestion queue flushed")
+        except asyncio.TimeoutError:
+            logger.warning(f"Vector ingestion flush timed out, {self._queue.qsize()} items not stored")
+
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+    async def submit(self, document: dict) -> bool:
+        """
+        Queue a vector document (message_id, group_id, chat_id, content, metadata, ...)
+        for embedding. Returns False if it was dropped by the overflow policy.
+        """
+        return await self._put((INSERT, document))
+
+    async def submit_update(self, document: dict) -> bool:
+        """Re-embed a message's new text and replace its vector document (upsert by message_id)."""
+        return await self._put((UPDATE, document))
+
+    async def submit_delete(self, message_id: str) -> bool:
+        """Remove the vector documents of a deleted message."""
+        return await self._put((DELETE, {"message_id": message_id}))
+
+    async def _put(self, item: tuple) -> bool:
+        if not self.running:
+            logger.warning(f"Vector ingestion not running, dropping {item[0]}")
+            self.dropped += 1
+            return False
+
+        try:
+            self._queue.put_nowait(item)
+        except asyncio.QueueFull:
+            if self.overflow_policy == "drop_newest":
+                self.dropped += 1
+                return False
+
+            if self.overflow_policy == "drop_oldest":
+                try:
+                    self._queue.get_nowait()
+                    self._queue.task_done()
+                    self.dropped += 1
+                except asyncio.QueueEmpty:
+                    pass
+                self._queue.put_nowait(item)
+            else:
+                try:
+                    await asyncio.wait_for(self._queue.put(item), timeout=self.block_timeout)
+                except asyncio.TimeoutError:
+                    self.dropped += 1
+                    return False
+
+        self.enqueued += 1
+        self.max_depth_seen = max(self.max_depth_seen, self._queue.qsize())
+        return True
+
+    async def _next_batch(self) -> list:
+        batch = [await self._queue.get()]
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.batch_wait
+
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+                continue
+            except asyncio.QueueEmpty:
+                pass
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout=remaining))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._next_batch()
+            try:
+                await self._store_batch(batch)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+    async def _store_batch(self, batch: list):
+        from app.embeddings.batcher import embedding_batcher
+        from app.storage import storage
+
+        started = time.perf_counter()
+        try:
+            ops = coalesce_ops(batch)
+            self.coalesced += len(batch) - len(ops)
+
+            to_embed = [doc for op, doc in ops if op != DELETE]
+            if to_embed:
+                # Shares model calls with retrieval queries embedded at the same time
+                embeddings = await embedding_batcher.embed_many([doc["content"] for doc in to_embed])
+                for doc, embedding in zip(to_embed, embeddings):
+                    doc["embedding"] = embedding
+
+            if ops:
+                await storage.vectors.apply(ops)
+
+            self.processed += len(batch)
+            self.updated += sum(1 for op, _ in ops if op == UPDATE)
+            self.deleted += sum(1 for op, _ in ops if op == DELETE)
+        except Exception as e:
+            self.failed += len(batch)
+            logger.error(f"Vector ingestion batch of {len(batch)} failed: {e}", exc_info=True)
+        finally:
+            self.batches += 1
+            self.last_batch_size = len(batch)
+            self.last_batch_ms = (time.perf_counter() - started) * 1000
+
+    def stats(self) -> dict:
+        return {
+            "running": self.running,
+            "queue_depth": self._queue.qsize() if self._queue else 0,
+            "queue_max_size": self.max_size,
+            "max_depth_seen": self.max_depth_seen,
+            "overflow_policy": self.overflow_policy,
+            "enqueued": self.enqueued,
+            "dropped": self.dropped,
+            "processed": self.processed,
+            "updated": self.updated,
+            "deleted": self.deleted,
+            "coalesced": self.coalesced,
+            "failed": self.failed,
+            "batches": self.batches,
+            "avg_batch_size": round(self.processed / self.batches, 2) if self.batches else 0,
+            "last_batch_size": self.last_batch_size,
+            "last_batch_ms": round(self.last_batch_ms, 2),
+        }
+
+
+ingestion_pipeline = IngestionPipeline()
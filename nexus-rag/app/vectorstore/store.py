@@ -1,11 +1,11 @@
 from datetime import datetime
 from typing import Optional
 
-from app.core.mongo import get_vector_collection
-from app.embeddings.embedder import embed_text
+from app.embeddings.batcher import embedding_batcher
+from app.storage import storage
 
 class VectorStore:
-    def store_message(
+    async def store_message(
         self,
         *,
         group_id: str,
@@ -13,13 +13,13 @@ class VectorStore:
         content: str,
         role: str,
         message_id: Optional[str] = None,
+        embedding: Optional[list] = None,
     ):
         if not content.strip():
             return
 
-        collection = get_vector_collection()
-
-        embedding = embed_text(content)
+        if embedding is None:
+            embedding = await embedding_batcher.embed(content)
 
         document = {
             "group_id": group_id,
@@ -31,5 +31,11 @@ class VectorStore:
             "created_at": datetime.utcnow(),
         }
 
-        collection.insert_one(document)
-vector_store = VectorStore()
\ No newline at end of file
+        await storage.vectors.insert(document)
+
+    async def search(self, *, query_vector: list, limit: int = 5,
+                     group_id: Optional[str] = None, chat_id: Optional[str] = None) -> list:
+        return await storage.vectors.search(query_vector, limit, group_id=group_id, chat_id=chat_id)
+
+
+vector_store = VectorStore()
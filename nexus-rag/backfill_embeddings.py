@@ -35,6 +35,7 @@ async def backfill():
             embedding = embed_text(vector_content)
             
             vec_col.insert_one({
+                "message_id": str(msg["_id"]),
                 "group_id": group_id,
                 "chat_id": chat_id,
                 "content": vector_content,
@@ -0,0 +1,68 @@
+"""Shared helpers for the benchmark scripts in this folder."""
+import statistics
+from typing import Iterable, List
+
+
+def mint_token(email: str) -> str:
+    """Create a JWT for a synthetic benchmark user (uses the server's JWT_SECRET from .env)."""
+    from app.auth.service import create_access_token
+    return create_access_token({"sub": email, "username": email.split("@")[0]})
+
+
+def percentile(values: List[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered) + 0.5)) - 1))
+    return ordered[index]
+
+
+def summarize(label: str, samples_ms: Iterable[float]) -> dict:
+    samples = list(samples_ms)
+    summary = {
+        "label": label,
+        "count": len(samples),
+        "mean_ms": statistics.fmean(samples) if samples else 0.0,
+        "p50_ms": percentile(samples, 50),
+        "p95_ms": percentile(samples, 95),
+        "p99_ms": percentile(samples, 99),
+        "max_ms": max(samples) if samples else 0.0,
+    }
+    return summary
+
+
+def print_summary(summary: dict):
+    print(
+        f"{summary['label']:<28} n={summary['count']:<7} "
+        f"mean={summary['mean_ms']:8.2f}ms p50={summary['p50_ms']:8.2f}ms "
+        f"p95={summary['p95_ms']:8.2f}ms p99={summary['p99_ms']:8.2f}ms "
+        f"max={summary['max_ms']:8.2f}ms"
+    )
+
+
+def bench_db():
+    """Synchronous handle on the app database for seeding benchmark fixtures."""
+    from pymongo import MongoClient
+    from app.core.config import MONGO_URI, MONGO_DB_NAME
+    return MongoClient(MONGO_URI)[MONGO_DB_NAME]
+
+
+def seed_users(db, emails: List[str]):
+    """Make sure every benchmark user has a users document (REST auth requires one)."""
+    for email in emails:
+        db.users.update_one(
+            {"email": email},
+            {"$setOnInsert": {"email": email, "username": email.split("@")[0]}},
+            upsert=True,
+        )
+
+
+def seed_group(db, owner: str, members: List[str], name: str = "bench") -> str:
+    """Create a shared group with a 'general' chat and return its id."""
+    result = db.groups.insert_one({
+        "user_id": owner,
+        "name": name,
+        "members": list(dict.fromkeys([owner, *members])),
+        "chats": [{"id": "general", "title": "General"}],
+    })
+    return str(result.inserted_id)
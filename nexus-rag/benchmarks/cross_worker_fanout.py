@@ -0,0 +1,144 @@
+"""
+Cross-worker Socket.IO fan-out check and throughput benchmark.
+
+Starts two independent uvicorn server processes that share a message-queue
+client manager (SOCKETIO_MANAGER, Redis by default), connects listeners to
+server B, sends messages through server A and checks that every `new_message`
+arrives on B. Prints delivery ratio, end-to-end latency and throughput, and exits
+non-zero if anything was lost.
+
+    python -m benchmarks.cross_worker_fanout --manager redis --queue redis://localhost:6379/0 \\
+        --listeners 20 --messages 500
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+import socketio
+from bson import ObjectId
+
+from benchmarks.common import mint_token, summarize, print_summary, bench_db, seed_users, seed_group
+
+
+def start_server(port: int, manager: str, queue: str) -> subprocess.Popen:
+    env = dict(os.environ)
+    env["SOCKETIO_MANAGER"] = manager
+    env["SOCKETIO_MESSAGE_QUEUE"] = queue
+    # Senders outpace the per-user flood control limits; measure fan-out, not rejections
+    env["SOCKET_RATE_LIMIT_ENABLED"] = "false"
+    env.setdefault("LOG_LEVEL", "WARNING")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        env=env,
+    )
+
+
+def wait_until_up(port: int, timeout: float = 60.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with urllib.request.urlopen(f"http://127.0.0.1:{port}/health", timeout=1):
+                return
+        except Exception:
+            time.sleep(0.5)
+    raise RuntimeError(f"Server on port {port} did not come up")
+
+
+async def run(args, group_id: str, sender: str, listeners: list):
+    url_a = f"http://127.0.0.1:{args.port_a}"
+    url_b = f"http://127.0.0.1:{args.port_b}"
+    room = {"group_id": group_id, "chat_id": "general"}
+
+    sent_at = {}
+    received = {email: 0 for email in listeners}
+    latencies = []
+    clients = []
+
+    for email in listeners:
+        client = socketio.AsyncClient(reconnection=False)
+
+        def make_handler(listener):
+            async def on_new_message(data):
+                started = sent_at.get(data.get("content"))
+                if data.get("role") == "user" and started is not None:
+                    received[listener] += 1
+                    latencies.append((time.perf_counter() - started) * 1000)
+            return on_new_message
+
+        client.on("new_message", make_handler(email))
+        await client.connect(url_b, auth={"token": mint_token(email)}, transports=["websocket"])
+        await client.emit("join_room", room)
+        clients.append(client)
+
+    sender_client = socketio.AsyncClient(reconnection=False)
+    await sender_client.connect(url_a, auth={"token": mint_token(sender)}, transports=["websocket"])
+    await sender_client.emit("join_room", room)
+    await asyncio.sleep(0.5)
+
+    started = time.perf_counter()
+    for n in range(args.messages):
+        content = f"fanout {n}"
+        sent_at[content] = time.perf_counter()
+        await sender_client.emit("send_message", {**room, "content": content})
+        if args.rate:
+            await asyncio.sleep(1 / args.rate)
+
+    expected = args.messages * len(listeners)
+    deadline = time.perf_counter() + args.timeout
+    while sum(received.values()) < expected and time.perf_counter() < deadline:
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+
+    delivered = sum(received.values())
+    print(f"manager={args.manager} listeners={len(listeners)} messages={args.messages}")
+    print(f"delivered {delivered}/{expected} cross-worker frames in {elapsed:.2f}s "
+          f"({args.messages / elapsed:.1f} msg/s in, {delivered / elapsed:.1f} frames/s out)")
+    print_summary(summarize("A send -> B new_message", latencies))
+
+    for client in [sender_client, *clients]:
+        await client.disconnect()
+    return delivered == expected
+
+
+def main(args):
+    db = bench_db()
+    sender = "fanout_sender@bench.local"
+    listeners = [f"fanout_listener_{i}@bench.local" for i in range(args.listeners)]
+    seed_users(db, [sender, *listeners])
+    group_id = seed_group(db, sender, listeners, name="cross-worker fanout")
+
+    servers = [
+        start_server(args.port_a, args.manager, args.queue),
+        start_server(args.port_b, args.manager, args.queue),
+    ]
+    try:
+        wait_until_up(args.port_a)
+        wait_until_up(args.port_b)
+        ok = asyncio.run(run(args, group_id, sender, listeners))
+    finally:
+        for server in servers:
+            server.terminate()
+        for server in servers:
+            server.wait(timeout=15)
+        db.groups.delete_one({"_id": ObjectId(group_id)})
+        db.messages.delete_many({"group_id": group_id})
+
+    print("PASS" if ok else "FAIL: messages were lost between workers")
+    sys.exit(0 if ok else 1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--manager", default="redis", choices=["redis", "aiopika"])
+    parser.add_argument("--queue", default="redis://localhost:6379/0")
+    parser.add_argument("--port-a", type=int, default=8091)
+    parser.add_argument("--port-b", type=int, default=8092)
+    parser.add_argument("--listeners", type=int, default=10)
+    parser.add_argument("--messages", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=0, help="messages/s to send (0 = as fast as possible)")
+    parser.add_argument("--timeout", type=float, default=30)
+    main(parser.parse_args())
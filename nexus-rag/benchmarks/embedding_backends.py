@@ -0,0 +1,152 @@
+"""
+Offline (downloads the model on first use): torch vs. ONNX vs. int8 ONNX
+embedding backends, and their parity with the torch vectors.
+
+Each backend runs in its own process so RSS is not shared: model load time,
+RSS after loading and peak RSS, single-text latency (p50/p95/p99, like a
+retrieval query) and batched throughput (texts/s, like the ingestion worker).
+Vectors of the same corpus are then compared with the torch ones by cosine
+similarity; the script exits non-zero if a backend falls below its threshold,
+so it doubles as a parity check for EMBEDDING_BACKEND=onnx at benchmark scale
+(tests/test_embedding_parity.py is the test-suite version).
+
+    pip install onnxruntime
+    python -m benchmarks.embedding_backends --backends torch onnx onnx-int8
+    EMBEDDING_ONNX_PATH=models/minilm-onnx python -m benchmarks.embedding_backends
+"""
+import argparse
+import json
+import os
+import random
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+from app.embeddings.backends import PARITY_MIN_COSINE, PARITY_MIN_COSINE_INT8
+from benchmarks.common import summarize
+
+VARIANTS = {
+    "torch": ("torch", False),
+    "onnx": ("onnx", False),
+    "onnx-int8": ("onnx", True),
+}
+
+WORDS = ("the deploy failed again after the migration can someone check why the socket reconnects "
+         "thanks ok lol sure meeting moved to friday what is the status of the vector index "
+         "please review my pull request embeddings are slow on cloud run memory limit exceeded").split()
+
+
+def corpus(size: int, seed: int = 7) -> list:
+    """Chat-like texts: mostly short replies, some questions, a few long paragraphs."""
+    rng = random.Random(seed)
+    texts = []
+    for _ in range(size):
+        length = rng.choice([1, 2, 3, 5, 8, 12, 20, 40, 120])
+        texts.append(" ".join(rng.choice(WORDS) for _ in range(length)))
+    return texts
+
+
+def rss_mb() -> dict:
+    values = {}
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith(("VmRSS:", "VmHWM:")):
+                key, value = line.split(":")
+                values[key] = int(value.split()[0]) / 1024
+    return {"rss_mb": values.get("VmRSS", 0.0), "peak_rss_mb": values.get("VmHWM", 0.0)}
+
+
+def worker(variant: str, args, vectors_path: str):
+    """Runs in a child process: measure one backend and save its vectors."""
+    from app.embeddings.backends import load_model
+
+    backend, quantized = VARIANTS[variant]
+    started = time.perf_counter()
+    model = load_model(backend, quantized)
+    load_s = time.perf_counter() - started
+    loaded_rss = rss_mb()["rss_mb"]
+
+    texts = corpus(args.texts)
+    model.encode(texts[:8], batch_size=8, normalize_embeddings=True)  # warm up
+
+    latencies = []
+    for text in texts[:args.single]:
+        started = time.perf_counter()
+        model.encode(text, normalize_embeddings=True)
+        latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    vectors = model.encode(texts, batch_size=args.batch_size, normalize_embeddings=True)
+    batch_s = time.perf_counter() - started
+    np.save(vectors_path, np.asarray(vectors, dtype=np.float32))
+
+    summary = summarize(variant, latencies)
+    print(json.dumps({
+        "variant": variant,
+        "load_s": load_s,
+        "loaded_rss_mb": loaded_rss,
+        "peak_rss_mb": rss_mb()["peak_rss_mb"],
+        "p50_ms": summary["p50_ms"],
+        "p95_ms": summary["p95_ms"],
+        "p99_ms": summary["p99_ms"],
+        "texts_per_s": len(texts) / batch_s,
+    }))
+
+
+def run_variant(variant: str, args, vectors_path: str) -> dict:
+    command = [sys.executable, "-m", "benchmarks.embedding_backends", "--worker", variant,
+               "--vectors", vectors_path, "--texts", str(args.texts), "--single", str(args.single),
+               "--batch-size", str(args.batch_size)]
+    output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main(args):
+    variants = list(dict.fromkeys(["torch"] + args.backends))  # torch is the parity reference
+    rows, vectors = [], {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for variant in variants:
+            path = os.path.join(tmp, f"{variant}.npy")
+            rows.append(run_variant(variant, args, path))
+            vectors[variant] = np.load(path)
+
+    reference = vectors["torch"]
+    failed = []
+    print(f"\ntexts={args.texts} single={args.single} batch_size={args.batch_size}")
+    print(f"{'backend':>10} {'load s':>7} {'RSS MB':>8} {'peak MB':>8} {'p50':>7} {'p95':>7} {'p99':>7} "
+          f"{'texts/s':>8} {'min cos':>8} {'mean cos':>9}")
+    for row in rows:
+        variant = row["variant"]
+        cosines = np.sum(vectors[variant] * reference, axis=1)  # both are normalized
+        threshold = args.min_cosine_int8 if VARIANTS[variant][1] else args.min_cosine
+        if cosines.min() < threshold:
+            failed.append(f"{variant}: min cosine {cosines.min():.4f} < {threshold}")
+        print(f"{variant:>10} {row['load_s']:>7.2f} {row['loaded_rss_mb']:>8.1f} {row['peak_rss_mb']:>8.1f} "
+              f"{row['p50_ms']:>7.2f} {row['p95_ms']:>7.2f} {row['p99_ms']:>7.2f} {row['texts_per_s']:>8.1f} "
+              f"{cosines.min():>8.4f} {cosines.mean():>9.4f}")
+
+    if failed:
+        print("\nParity check failed:\n  " + "\n  ".join(failed))
+        sys.exit(1)
+    print("\nParity check passed")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backends", nargs="+", choices=list(VARIANTS), default=list(VARIANTS))
+    parser.add_argument("--texts", type=int, default=1000, help="corpus size for throughput and parity")
+    parser.add_argument("--single", type=int, default=200, help="single-text encodes for latency")
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--min-cosine", type=float, default=PARITY_MIN_COSINE, help="parity threshold for fp32 ONNX")
+    parser.add_argument("--min-cosine-int8", type=float, default=PARITY_MIN_COSINE_INT8,
+                        help="parity threshold for int8 ONNX")
+    parser.add_argument("--worker", choices=list(VARIANTS), help=argparse.SUPPRESS)
+    parser.add_argument("--vectors", help=argparse.SUPPRESS)
+    parsed = parser.parse_args()
+    if parsed.worker:
+        worker(parsed.worker, parsed, parsed.vectors)
+    else:
+        main(parsed)
@@ -0,0 +1,81 @@
+"""
+Offline: embedding throughput and latency with one model call per text vs. the
+cross-request micro-batcher (app/embeddings/batcher.py) at several windows.
+
+N concurrent clients each embed --requests texts back to back. By default the
+encoder is simulated (a thread sleeping --overhead-ms per call plus --per-item-ms
+per text, roughly how a small CPU model scales with batch size); --encoder model
+runs the real EMBEDDING_MODEL instead (downloads it on first use).
+
+    python -m benchmarks.embedding_batching --clients 1 16 64 --windows 0 1 2 5 10
+"""
+import argparse
+import asyncio
+import time
+
+from benchmarks.common import summarize
+from app.embeddings.batcher import EmbeddingBatcher
+
+
+def simulated_encoder(overhead_ms: float, per_item_ms: float):
+    def encode(texts, batch_size):
+        time.sleep((overhead_ms + per_item_ms * len(texts)) / 1000)
+        return [[float(len(text))] for text in texts]
+    return encode
+
+
+def model_encoder():
+    from app.embeddings.embedder import embed_texts
+    embed_texts(["warm up"])
+    return embed_texts
+
+
+async def run_client(batcher: EmbeddingBatcher, client: int, requests: int, latencies: list):
+    for i in range(requests):
+        started = time.perf_counter()
+        await batcher.embed(f"client {client} asks question number {i} about the project")
+        latencies.append((time.perf_counter() - started) * 1000)
+
+
+async def run(encode, window_ms, clients: int, requests: int, max_batch: int):
+    # window None: batching disabled, every request is its own model call
+    batcher = EmbeddingBatcher(encode=encode, enabled=window_ms is not None,
+                               window_ms=window_ms or 0, max_batch=max_batch, cache=None)
+    latencies = []
+    started = time.perf_counter()
+    await asyncio.gather(*[run_client(batcher, c, requests, latencies) for c in range(clients)])
+    elapsed = time.perf_counter() - started
+    await batcher.flush()
+    return latencies, elapsed, batcher.stats()
+
+
+def main(args):
+    if args.encoder == "model":
+        encode = model_encoder()
+    else:
+        encode = simulated_encoder(args.overhead_ms, args.per_item_ms)
+
+    print(f"encoder={args.encoder} requests/client={args.requests} max_batch={args.max_batch}")
+    print(f"{'clients':>7} {'window':>9} {'texts/s':>9} {'p50':>8} {'p95':>8} {'p99':>8} {'calls':>6} {'avg batch':>9}")
+    for clients in args.clients:
+        for window_ms in [None] + args.windows:
+            latencies, elapsed, stats = asyncio.run(run(encode, window_ms, clients, args.requests, args.max_batch))
+            summary = summarize("", latencies)
+            calls = stats["batches"] if window_ms is not None else stats["requested"]
+            label = "off" if window_ms is None else f"{window_ms:g}ms"
+            avg_batch = stats["avg_batch_size"] if window_ms is not None else 1
+            print(f"{clients:>7} {label:>9} {len(latencies) / elapsed:>9.1f} {summary['p50_ms']:>8.2f} "
+                  f"{summary['p95_ms']:>8.2f} {summary['p99_ms']:>8.2f} {calls:>6} {avg_batch:>9}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--encoder", choices=["simulated", "model"], default="simulated")
+    parser.add_argument("--overhead-ms", type=float, default=8, help="simulated fixed cost per model call")
+    parser.add_argument("--per-item-ms", type=float, default=0.5, help="simulated cost per text in a call")
+    parser.add_argument("--clients", type=int, nargs="+", default=[1, 16, 64])
+    parser.add_argument("--requests", type=int, default=50, help="texts embedded by each client")
+    parser.add_argument("--windows", type=float, nargs="+", default=[0, 1, 2, 5, 10],
+                        help="batch windows to compare, in ms (batching off is always included)")
+    parser.add_argument("--max-batch", type=int, default=64)
+    main(parser.parse_args())
@@ -0,0 +1,100 @@
+"""
+Fan-out benchmark for hot-room emit batching (in-process, no server needed).
+
+Simulates --hot-rooms rooms receiving --rate messages/s each and --quiet-rooms
+rooms receiving one message every few seconds, all with --members members, for
+--seconds. Every message goes through RoomEmitBatcher once with batching off and
+once with batching on. Reports the websocket frames each run produces (every emit
+is sent to every member), the added delivery delay, and that per-room ordering
+is preserved.
+
+    python -m benchmarks.emit_batching --hot-rooms 20 --rate 50 --members 300 --seconds 5
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from app.services.emit_batcher import RoomEmitBatcher
+from benchmarks.common import summarize
+
+
+async def run(args, enabled: bool) -> dict:
+    emits = 0
+    delays = []
+    received = {}  # room -> [seq, ...] in delivery order
+
+    async def emit(event, data, room=None):
+        nonlocal emits
+        emits += 1
+        now = time.perf_counter()
+        items = data["events"] if event == "event_batch" else [{"event": event, "data": data}]
+        for item in items:
+            delays.append((now - item["data"]["sent_at"]) * 1000)
+            received.setdefault(room, []).append(item["data"]["seq"])
+
+    batcher = RoomEmitBatcher(
+        emit, enabled=enabled, window_ms=args.window_ms, hot_rate=args.hot_rate, max_events=args.max_events
+    )
+
+    async def sender(room, rate):
+        await asyncio.sleep(random.random() / rate)
+        deadline = time.monotonic() + args.seconds
+        seq = 0
+        while time.monotonic() < deadline:
+            await batcher.emit("new_message", {"seq": seq, "sent_at": time.perf_counter()}, room=room)
+            seq += 1
+            await asyncio.sleep(random.expovariate(rate))
+
+    await asyncio.gather(
+        *[sender(f"hot{r}:general", args.rate) for r in range(args.hot_rooms)],
+        *[sender(f"quiet{r}:general", 0.3) for r in range(args.quiet_rooms)],
+    )
+    await asyncio.sleep(args.window_ms / 1000 * 2)
+    await batcher.flush_all()
+
+    ordered = all(seqs == sorted(seqs) for seqs in received.values())
+    return {
+        "stats": batcher.stats(),
+        "emits": emits,
+        "frames": emits * args.members,
+        "delays": delays,
+        "ordered": ordered,
+    }
+
+
+async def main(args):
+    print(f"hot rooms={args.hot_rooms} @ {args.rate} msg/s, quiet rooms={args.quiet_rooms}, "
+          f"members/room={args.members}, window={args.window_ms}ms, hot threshold={args.hot_rate}/s, "
+          f"{args.seconds}s")
+
+    results = {}
+    for label, enabled in (("immediate (before)", False), ("batched (after)", True)):
+        res = results[label] = await run(args, enabled)
+        delay = summarize(label, res["delays"])
+        print(f"\n{label}")
+        print(f"  messages:      {res['stats']['events']}")
+        print(f"  emits:         {res['emits']}  (avg batch {res['stats']['avg_batch_size']})")
+        print(f"  frames:        {res['frames']:,}")
+        print(f"  added delay:   p50 {delay['p50_ms']:.1f}ms  p95 {delay['p95_ms']:.1f}ms  p99 {delay['p99_ms']:.1f}ms")
+        print(f"  order kept:    {res['ordered']}")
+
+    before, after = results["immediate (before)"], results["batched (after)"]
+    if before["frames"]:
+        # Message counts differ slightly between runs, so compare frames per message
+        per_msg_before = before["frames"] / before["stats"]["events"]
+        per_msg_after = after["frames"] / after["stats"]["events"]
+        print(f"\noutbound frames per message reduced by {100 * (1 - per_msg_after / per_msg_before):.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--hot-rooms", type=int, default=20)
+    parser.add_argument("--quiet-rooms", type=int, default=200)
+    parser.add_argument("--rate", type=float, default=50, help="messages/s per hot room")
+    parser.add_argument("--members", type=int, default=300)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--window-ms", type=int, default=25)
+    parser.add_argument("--hot-rate", type=int, default=10)
+    parser.add_argument("--max-events", type=int, default=100)
+    asyncio.run(main(parser.parse_args()))
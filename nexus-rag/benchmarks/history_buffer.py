@@ -0,0 +1,118 @@
+"""
+In-process benchmark of the per-room history ring buffer.
+
+Fills --rooms rooms with --size messages of --content-len characters and reports
+the memory per room (tracemalloc, and the buffer's own bytes_per_room estimate).
+Then replays a chat workload - sends, edits and AI triggers spread over the
+rooms with a Zipf-like popularity - and reports the buffer hit rate, i.e. the
+share of AI triggers that no longer read a history page from the message store.
+The store is the in-process MemoryMessageStore (as with STORAGE_BACKEND=memory),
+so no database is needed; its page() calls are the history queries.
+
+    python -m benchmarks.history_buffer --rooms 2000 --size 30 --events 200000
+"""
+import argparse
+import asyncio
+import itertools
+import random
+import time
+import tracemalloc
+from datetime import datetime
+
+from bson import ObjectId
+
+import app.services.message_store as message_store_module
+from app.services.history_buffer import RoomHistoryBuffer
+from app.storage.memory import InjectedLatency, MemoryMessageStore
+
+
+class CountingMessageStore(MemoryMessageStore):
+    """MemoryMessageStore that counts history reads"""
+
+    def __init__(self):
+        super().__init__(InjectedLatency(0, 0))
+        self.queries = 0
+
+    async def page(self, *args, **kwargs) -> list:
+        self.queries += 1
+        return await super().page(*args, **kwargs)
+
+
+def text(length: int) -> str:
+    return "".join(random.choices("abcdefghijklmnopqrstuvwxyz ", k=length))
+
+
+async def main(args):
+    # RoomHistoryBuffer._load reads through app.services.message_store.message_store
+    messages = CountingMessageStore()
+    message_store_module.message_store = messages
+
+    def message(group_id: str, chat_id: str) -> dict:
+        return {
+            "_id": ObjectId(), "group_id": group_id, "chat_id": chat_id, "role": "user",
+            "content": text(args.content_len), "user_id": "user@example.com", "created_at": datetime.utcnow(),
+        }
+
+    rooms = [(str(ObjectId()), "general") for _ in range(args.rooms)]
+    ids = {}  # room -> message ids, for edits
+    for group_id, chat_id in rooms:
+        docs = [message(group_id, chat_id) for _ in range(args.size)]
+        await messages.insert_many(docs)
+        ids[(group_id, chat_id)] = [doc["_id"] for doc in docs]
+
+    # Memory: every room warmed and full
+    buffer = RoomHistoryBuffer(size=args.size, max_rooms=args.rooms, idle_seconds=3600, max_age_seconds=3600)
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for group_id, chat_id in rooms:
+        await buffer.warm(f"{group_id}:{chat_id}", group_id, chat_id)
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+    used = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    print(f"rooms={args.rooms} size={args.size} content~{args.content_len} chars")
+    print(f"memory: {used / 1024 / 1024:.2f} MiB total, {used / args.rooms / 1024:.1f} KiB per room (tracemalloc; "
+          f"content strings are shared with the message store and not counted)")
+    print(f"buffer estimate incl. content: {buffer.stats()['bytes_per_room'] / 1024:.1f} KiB per room")
+
+    # Hit rate: a cold buffer that only holds --max-rooms rooms
+    buffer = RoomHistoryBuffer(size=args.size, max_rooms=args.max_rooms, idle_seconds=3600, max_age_seconds=3600)
+    cum_weights = list(itertools.accumulate(1 / (rank + 1) for rank in range(len(rooms))))
+    queries_before = messages.queries
+    triggers = 0
+    started = time.perf_counter()
+    for _ in range(args.events):
+        group_id, chat_id = random.choices(rooms, cum_weights=cum_weights)[0]
+        room = f"{group_id}:{chat_id}"
+        roll = random.random()
+        if roll < args.ai_ratio:
+            triggers += 1
+            await buffer.get(room, group_id, chat_id)
+        elif roll < 0.95:
+            doc = message(group_id, chat_id)
+            await messages.insert_one(doc)
+            ids[(group_id, chat_id)].append(doc["_id"])
+            buffer.append(room, str(doc["_id"]), "user", doc["content"], doc["user_id"])
+        else:
+            message_id = str(random.choice(ids[(group_id, chat_id)]))
+            content = text(args.content_len)
+            await messages.update(group_id, chat_id, message_id, {"$set": {"content": content}})
+            buffer.update(room, message_id, content)
+    elapsed = time.perf_counter() - started
+
+    stats = buffer.stats()
+    print(f"{args.events} events ({triggers} AI triggers) over {args.rooms} rooms, buffer capacity {args.max_rooms} rooms, "
+          f"{elapsed:.2f}s")
+    print(f"hit rate {stats['hit_rate'] * 100:.1f}% ({stats['hits']} hits, {stats['misses']} misses, "
+          f"{stats['evictions']} evictions); history queries {messages.queries - queries_before} "
+          f"instead of {triggers} without the buffer")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=2000)
+    parser.add_argument("--max-rooms", type=int, default=1000)
+    parser.add_argument("--size", type=int, default=30)
+    parser.add_argument("--content-len", type=int, default=120)
+    parser.add_argument("--events", type=int, default=200_000)
+    parser.add_argument("--ai-ratio", type=float, default=0.1)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,75 @@
+"""
+In-process benchmark of the room membership index.
+
+Builds an index with --memberships total group memberships (spread over groups of
+--group-size members, each with --chats chats), reports the memory it takes
+(tracemalloc) and how many authorization checks per second it answers for a mix
+of allowed and denied lookups. No database needed.
+
+    python -m benchmarks.membership_index --memberships 100000 --group-size 50
+"""
+import argparse
+import random
+import time
+import tracemalloc
+
+from bson import ObjectId
+
+from app.services.membership import MembershipIndex
+
+
+def build(memberships: int, group_size: int, chats: int, users: int):
+    emails = [f"user{i}@example.com" for i in range(users)]
+    groups = []
+    index = MembershipIndex(ttl_seconds=3600, recheck_seconds=3600)
+
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(max(1, memberships // group_size)):
+        group_id = str(ObjectId())
+        members = random.sample(emails, group_size)
+        chat_ids = ["general"] + [str(ObjectId()) for _ in range(chats - 1)]
+        index.add_group(group_id, members[0], members, chat_ids)
+        groups.append((group_id, members, chat_ids))
+    after = tracemalloc.take_snapshot()
+    tracemalloc.stop()
+
+    used = sum(stat.size_diff for stat in after.compare_to(before, "filename"))
+    return index, groups, emails, used
+
+
+def main(args):
+    index, groups, emails, used = build(args.memberships, args.group_size, args.chats, args.users)
+    total = index.stats()["memberships"]
+    print(f"groups={len(groups)} memberships={total} users={args.users}")
+    print(f"index memory: {used / 1024 / 1024:.2f} MiB total, "
+          f"{used / total * 100_000 / 1024 / 1024:.2f} MiB per 100k memberships, "
+          f"{used / total:.1f} B per membership "
+          f"(excludes the email strings themselves, which are shared with the rest of the process)")
+
+    lookups = []
+    for _ in range(args.checks):
+        group_id, members, chat_ids = random.choice(groups)
+        if random.random() < 0.9:
+            lookups.append((random.choice(members), group_id, random.choice(chat_ids)))
+        else:
+            lookups.append((random.choice(emails), group_id, "not-a-chat"))
+
+    started = time.perf_counter()
+    allowed = 0
+    for email, group_id, chat_id in lookups:
+        if index.can_access(email, group_id, chat_id):
+            allowed += 1
+    elapsed = time.perf_counter() - started
+    print(f"{len(lookups)} checks in {elapsed:.3f}s = {len(lookups) / elapsed:,.0f} checks/s "
+          f"({allowed} allowed, {len(lookups) - allowed} denied)")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--memberships", type=int, default=100_000)
+    parser.add_argument("--group-size", type=int, default=50)
+    parser.add_argument("--chats", type=int, default=5)
+    parser.add_argument("--users", type=int, default=20_000)
+    parser.add_argument("--checks", type=int, default=1_000_000)
+    main(parser.parse_args())
@@ -0,0 +1,167 @@
+"""
+Read/write comparison of the two message layouts (needs MongoDB).
+
+Writes --messages messages into one chat with --writers concurrent senders,
+once through DocumentMessageStore (one document per message) and once through
+BucketMessageStore (--bucket-size messages per document, appended with $push),
+each into its own scratch collection that is dropped first. Then times, per
+layout, the reads and writes the app does:
+
+  latest page     GET /api/messages without a cursor, and the AI history load
+  before @ N%     the page just older than a message N% of the way back
+  resume          changes after a sequence number (sync_messages)
+  edit            message lookup + update of one message (edit_message)
+
+and reports the storage and index size of each collection.
+
+    python -m benchmarks.message_buckets --messages 200000 --bucket-size 200
+"""
+import argparse
+import asyncio
+import itertools
+import time
+from datetime import datetime, timedelta, timezone
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING
+
+from app.core.config import MONGO_URI, MONGO_DB_NAME
+from app.core.mongo import MESSAGE_BUCKET_INDEXES
+from app.services.message_store import DocumentMessageStore, BucketMessageStore
+from benchmarks.common import summarize, print_summary
+
+GROUP_ID = "bench-buckets"
+CHAT_ID = "general"
+DEPTHS = (10, 50, 90)
+
+DOCUMENT_INDEXES = [
+    [("group_id", ASCENDING), ("chat_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)],
+    [("group_id", ASCENDING), ("chat_id", ASCENDING), ("updated_seq", ASCENDING)],
+]
+
+
+async def write(store, args) -> tuple:
+    base = datetime.now(timezone.utc) - timedelta(seconds=args.messages)
+    counter = itertools.count(1)
+    latencies = []
+
+    async def writer(w: int):
+        while True:
+            seq = next(counter)
+            if seq > args.messages:
+                return
+            doc = {
+                "group_id": GROUP_ID,
+                "chat_id": CHAT_ID,
+                "user_id": f"user{w}@example.com",
+                "role": "user",
+                "content": f"message {seq}: " + "lorem ipsum dolor sit amet " * 3,
+                "created_at": base + timedelta(seconds=seq),
+                "seq": seq,
+                "updated_seq": seq,
+            }
+            started = time.perf_counter()
+            await store.insert_one(doc)
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[writer(w) for w in range(args.writers)])
+    elapsed = time.perf_counter() - started
+    return summarize(f"{store.layout}: insert", latencies), args.messages / elapsed
+
+
+async def timed(label: str, run, samples: int) -> dict:
+    latencies = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        await run()
+        latencies.append((time.perf_counter() - started) * 1000)
+    return summarize(label, latencies)
+
+
+async def bench(store, collection, args) -> dict:
+    insert, per_second = await write(store, args)
+    rows = [insert]
+
+    latest = await store.page(GROUP_ID, CHAT_ID, limit=args.page_size)
+    rows.append(await timed(f"{store.layout}: latest page",
+                            lambda: store.page(GROUP_ID, CHAT_ID, limit=args.page_size), args.samples))
+
+    # Walk back page by page (untimed), as a client would, stopping at each depth
+    anchor, walked = latest[0], 0
+    for depth in DEPTHS:
+        while walked < args.messages * depth // 100 // args.page_size:
+            anchor = (await store.page(GROUP_ID, CHAT_ID, anchor=anchor, limit=args.page_size))[0]
+            walked += 1
+        rows.append(await timed(f"{store.layout}: before @ {depth}%",
+                                lambda: store.page(GROUP_ID, CHAT_ID, anchor=anchor, limit=args.page_size),
+                                args.samples))
+
+    floor = args.messages - 100
+    rows.append(await timed(f"{store.layout}: resume (100)",
+                            lambda: store.changed_since(GROUP_ID, CHAT_ID, floor, 501), args.samples))
+
+    targets = iter([str(doc["_id"]) for doc in latest] * (args.samples // len(latest) + 1))
+    next_seq = itertools.count(args.messages + 1)
+
+    async def edit():
+        message_id = next(targets)
+        await store.get(GROUP_ID, CHAT_ID, message_id)
+        await store.update(GROUP_ID, CHAT_ID, message_id, {
+            "$set": {"content": "edited", "is_edited": True, "updated_seq": next(next_seq)},
+        })
+    rows.append(await timed(f"{store.layout}: edit", edit, args.samples))
+
+    stats = await collection.database.command("collStats", collection.name)
+    return {
+        "rows": rows,
+        "per_second": per_second,
+        "documents": stats["count"],
+        "size_mb": stats["size"] / 2**20,
+        "index_mb": stats["totalIndexSize"] / 2**20,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--writers", type=int, default=20, help="concurrent senders in the write phase")
+    parser.add_argument("--bucket-size", type=int, default=200)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--samples", type=int, default=50)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch collections")
+    args = parser.parse_args()
+
+    db = AsyncIOMotorClient(MONGO_URI)[MONGO_DB_NAME]
+    layouts = []
+    for name, store_cls, indexes, kwargs in (
+        ("bench_messages", DocumentMessageStore, DOCUMENT_INDEXES, {}),
+        ("bench_message_buckets", BucketMessageStore, MESSAGE_BUCKET_INDEXES, {"bucket_size": args.bucket_size}),
+    ):
+        collection = db[name]
+        await collection.drop()
+        for keys in indexes:
+            await collection.create_index(keys)
+        store = store_cls(collection=lambda c=collection: c, **kwargs)
+        layouts.append((store, collection))
+
+    results = []
+    for store, collection in layouts:
+        print(f"{store.layout}: writing {args.messages} messages...")
+        results.append((store.layout, await bench(store, collection, args)))
+        if not args.keep:
+            await collection.drop()
+
+    print()
+    for _, result in results:
+        for summary in result["rows"]:
+            print_summary(summary)
+
+    print(f"\n{'layout':<10} {'inserts/s':>10} {'documents':>10} {'data MB':>9} {'index MB':>9}")
+    for layout, result in results:
+        print(f"{layout:<10} {result['per_second']:>10.0f} {result['documents']:>10} "
+              f"{result['size_mb']:>9.1f} {result['index_mb']:>9.1f}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,148 @@
+"""
+Chat history reads on one very long chat: full history vs. keyset pages (needs MongoDB).
+
+Seeds --messages messages (default 1M) into one chat of the app database (once;
+reused while the count matches, --drop removes them afterwards), then times
+the queries behind GET /api/messages/{group_id}/{chat_id}:
+
+  full history   the old endpoint: every message, sorted ascending, read twice
+                 (the cursor was rewound for a second pass)
+  latest page    the new default: newest --page-size messages
+  before @ N%    the page just older than a message N% of the way into the chat
+  skip @ N%      the same page with skip/limit, for comparison
+
+Reports latency, documents and BSON bytes returned, and index keys / documents
+examined (from explain) per query. Sender rendering is left out; it is the same
+per returned message in both versions.
+
+    python -m benchmarks.message_pagination --messages 1000000 --samples 20
+"""
+import argparse
+import time
+from datetime import datetime, timezone
+
+import bson
+from pymongo import ASCENDING
+
+from app.services.message_store import page_query, page_sort
+from benchmarks.common import bench_db, summarize, print_summary
+
+GROUP_ID = "bench-pagination"
+CHAT_ID = "general"
+VIEWER = "bench-viewer@example.com"
+DEPTHS = (10, 50, 90, 99)
+
+
+def seed(col, count: int):
+    existing = col.count_documents({"group_id": GROUP_ID, "chat_id": CHAT_ID})
+    if existing == count:
+        print(f"reusing {count} seeded messages")
+        return
+    col.delete_many({"group_id": GROUP_ID, "chat_id": CHAT_ID})
+    print(f"seeding {count} messages...")
+    base = time.time() - count
+    batch = []
+    for i in range(count):
+        sender = f"user{i % 20}@example.com"
+        batch.append({
+            "group_id": GROUP_ID,
+            "chat_id": CHAT_ID,
+            "user_id": sender,
+            "sender": sender,
+            "role": "user",
+            "content": f"message {i}: " + "lorem ipsum dolor sit amet " * 3,
+            # Several messages per timestamp, so _id has to break ties
+            "created_at": datetime.fromtimestamp(base + i // 4, tz=timezone.utc),
+            "seq": i + 1,
+            "updated_seq": i + 1,
+        })
+        if len(batch) == 10_000:
+            col.insert_many(batch, ordered=False)
+            batch = []
+    if batch:
+        col.insert_many(batch, ordered=False)
+
+
+def timed(label: str, run, samples: int) -> tuple:
+    latencies = []
+    docs = []
+    for _ in range(samples):
+        started = time.perf_counter()
+        docs = run()
+        latencies.append((time.perf_counter() - started) * 1000)
+    size = sum(len(bson.encode(doc)) for doc in docs)
+    return summarize(label, latencies), len(docs), size
+
+
+def examined(cursor) -> tuple:
+    stats = cursor.explain().get("executionStats", {})
+    return stats.get("totalKeysExamined"), stats.get("totalDocsExamined")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1_000_000)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--samples", type=int, default=20)
+    parser.add_argument("--full-samples", type=int, default=3, help="samples of the (slow) full-history read")
+    parser.add_argument("--drop", action="store_true", help="delete the seeded messages when done")
+    args = parser.parse_args()
+
+    col = bench_db().messages
+    # Same index as app/core/mongo.py
+    col.create_index([("group_id", ASCENDING), ("chat_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)])
+    seed(col, args.messages)
+
+    rows = []
+
+    def full_history():
+        query = page_query(GROUP_ID, CHAT_ID, VIEWER)
+        cursor = col.find(query).sort("created_at", 1)
+        docs = list(cursor)
+        cursor.rewind()
+        list(cursor)
+        return docs
+
+    summary, n, size = timed("full history", full_history, args.full_samples)
+    rows.append((summary, n, size, examined(col.find(page_query(GROUP_ID, CHAT_ID, VIEWER)).sort("created_at", 1))))
+
+    def keyset(anchor):
+        return lambda: col.find(page_query(GROUP_ID, CHAT_ID, VIEWER, anchor)).sort(page_sort()).limit(args.page_size)
+
+    latest = keyset(None)
+    summary, n, size = timed("latest page", lambda: list(latest()), args.samples)
+    rows.append((summary, n, size, examined(latest())))
+
+    for depth in DEPTHS:
+        # Offset counted from the newest message, as a client paging back would reach it
+        offset = args.messages * depth // 100
+        anchor = col.find_one(
+            page_query(GROUP_ID, CHAT_ID, VIEWER), {"created_at": 1},
+            sort=page_sort(), skip=max(offset - 1, 0),
+        )
+        if anchor is None:
+            continue
+        before = keyset(anchor)
+        summary, n, size = timed(f"before @ {depth}%", lambda: list(before()), args.samples)
+        rows.append((summary, n, size, examined(before())))
+
+        def skipped():
+            return col.find(page_query(GROUP_ID, CHAT_ID, VIEWER)).sort(page_sort()).skip(offset).limit(args.page_size)
+        summary, n, size = timed(f"skip @ {depth}%", lambda: list(skipped()), args.samples)
+        rows.append((summary, n, size, examined(skipped())))
+
+    print()
+    for summary, *_ in rows:
+        print_summary(summary)
+
+    print(f"\n{'query':<16} {'p50 ms':>10} {'p95 ms':>10} {'docs':>9} {'bytes':>12} {'keys examined':>14} {'docs examined':>14}")
+    for summary, n, size, (keys, docs) in rows:
+        print(f"{summary['label']:<16} {summary['p50_ms']:>10.2f} {summary['p95_ms']:>10.2f} {n:>9} {size:>12} "
+              f"{str(keys):>14} {str(docs):>14}")
+
+    if args.drop:
+        col.delete_many({"group_id": GROUP_ID, "chat_id": CHAT_ID})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Whole-app socket latency without a database: app CPU cost vs. storage latency.
+
+Starts the server with STORAGE_BACKEND=memory once per --latencies value
+(MEMORY_STORAGE_LATENCY_MS, the simulated round trip of every storage call),
+runs the socket_latency senders against it and prints one row per run. The
+0 ms row is what the app itself costs per message; the other rows show how
+much of the end-to-end latency a database of that speed would add.
+
+    python -m benchmarks.offline_app --senders 200 --messages 25 --latencies 0 1 5
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from benchmarks.common import summarize
+from benchmarks.cross_worker_fanout import wait_until_up
+from benchmarks.socket_latency import run_sender
+
+
+def start_server(port: int, latency_ms: float, jitter_ms: float) -> subprocess.Popen:
+    env = dict(os.environ)
+    env["STORAGE_BACKEND"] = "memory"
+    env["MEMORY_STORAGE_LATENCY_MS"] = str(latency_ms)
+    env["MEMORY_STORAGE_JITTER_MS"] = str(jitter_ms)
+    # Senders outpace the per-user flood control limits; measure the app, not rejections
+    env["SOCKET_RATE_LIMIT_ENABLED"] = "false"
+    env.setdefault("LOG_LEVEL", "WARNING")
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port)],
+        env=env,
+    )
+
+
+async def run(args) -> tuple:
+    url = f"http://127.0.0.1:{args.port}"
+    latencies, errors = [], []
+    started = time.perf_counter()
+    await asyncio.gather(*[run_sender(url, i, args.messages, latencies, errors) for i in range(args.senders)])
+    return latencies, errors, time.perf_counter() - started
+
+
+def main(args):
+    rows = []
+    for latency_ms in args.latencies:
+        server = start_server(args.port, latency_ms, args.jitter)
+        try:
+            wait_until_up(args.port)
+            latencies, errors, elapsed = asyncio.run(run(args))
+        finally:
+            server.terminate()
+            server.wait(timeout=15)
+        rows.append((latency_ms, summarize(f"{latency_ms:g}ms storage", latencies), len(latencies) / elapsed, len(errors)))
+
+    print(f"\nsenders={args.senders} messages/sender={args.messages} jitter={args.jitter:g}ms")
+    print(f"{'storage':>8} {'msg/s':>8} {'p50':>8} {'p95':>8} {'p99':>8} {'errors':>7}")
+    for latency_ms, summary, per_second, errors in rows:
+        print(f"{latency_ms:>6g}ms {per_second:>8.1f} {summary['p50_ms']:>8.2f} {summary['p95_ms']:>8.2f} "
+              f"{summary['p99_ms']:>8.2f} {errors:>7}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--port", type=int, default=8093)
+    parser.add_argument("--senders", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=20)
+    parser.add_argument("--latencies", type=float, nargs="+", default=[0, 1, 5],
+                        help="simulated storage round trips to compare, in ms")
+    parser.add_argument("--jitter", type=float, default=0, help="MEMORY_STORAGE_JITTER_MS")
+    main(parser.parse_args())
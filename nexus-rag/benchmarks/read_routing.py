@@ -0,0 +1,152 @@
+"""
+Mixed workload against a replica set: history reads on the primary vs. routed to secondaries.
+
+Needs a replica set (benchmarks/replica_set/docker-compose.yml starts one
+locally) and MONGO_URI pointing at it. Seeds --messages messages into a
+scratch chat, then runs the same workload twice for --seconds, once with
+history reads on the "primary" profile and once on the "history" profile
+(MONGO_HISTORY_READ_PREFERENCE, secondaryPreferred by default):
+
+  --writers   senders inserting messages back to back (always the primary)
+  --readers   clients reading --page-size pages at random depths, as
+              "Load older messages" does
+  --scanners  clients running the personal-chat aggregation
+
+Reports write/read latency percentiles, operations per second and how many
+commands each replica-set member served.
+
+    python -m benchmarks.read_routing --messages 200000 --writers 20 --readers 50 --seconds 20
+"""
+import argparse
+import asyncio
+import random
+import time
+from datetime import datetime, timedelta
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo import ASCENDING
+
+from app.core.config import MONGO_URI, MONGO_DB_NAME
+from app.core.db_monitor import CommandMonitor
+from app.core.read_profiles import describe
+from app.services.message_store import DocumentMessageStore
+from benchmarks.common import summarize, print_summary
+
+COLLECTION = "bench_read_routing"
+GROUP_ID = "bench-routing"
+CHAT_ID = "general"
+
+
+def message(i: int, base: datetime) -> dict:
+    return {
+        "group_id": GROUP_ID,
+        "chat_id": CHAT_ID,
+        "user_id": f"user{i % 50}@example.com",
+        "role": "user",
+        "content": f"message {i}: " + "lorem ipsum dolor sit amet " * 3,
+        "created_at": base + timedelta(milliseconds=i),
+    }
+
+
+async def seed(collection, count: int) -> list:
+    await collection.drop()
+    await collection.create_index([("group_id", ASCENDING), ("chat_id", ASCENDING), ("created_at", ASCENDING), ("_id", ASCENDING)])
+    await collection.create_index([("user_id", ASCENDING), ("group_id", ASCENDING), ("chat_id", ASCENDING)])
+    base = datetime.utcnow() - timedelta(milliseconds=count)
+    for start in range(0, count, 10_000):
+        await collection.insert_many([message(i, base) for i in range(start, min(start + 10_000, count))], ordered=False)
+    # Page anchors spread over the chat
+    cursor = collection.find({"group_id": GROUP_ID, "chat_id": CHAT_ID}, {"created_at": 1}).sort("created_at", 1)
+    return (await cursor.to_list(length=None))[::max(count // 1000, 1)]
+
+
+async def run(args, profile: str, anchors: list) -> dict:
+    monitor = CommandMonitor(enabled=True, slow_ms=float("inf"), explain=False)
+    client = AsyncIOMotorClient(MONGO_URI, event_listeners=[monitor], maxPoolSize=200)
+    collection = client[MONGO_DB_NAME][COLLECTION]
+    store = DocumentMessageStore(collection=lambda: collection)
+    await client.admin.command("ping")
+
+    deadline = time.monotonic() + args.seconds
+    writes, reads, scans = [], [], []
+    counter = iter(range(10**9))
+    base = datetime.utcnow()
+
+    async def writer():
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            await store.insert_one(message(next(counter), base))
+            writes.append((time.perf_counter() - started) * 1000)
+
+    async def reader():
+        while time.monotonic() < deadline:
+            anchor = random.choice(anchors)
+            started = time.perf_counter()
+            await store.page(GROUP_ID, CHAT_ID, "viewer@example.com", anchor, True, args.page_size, profile=profile)
+            reads.append((time.perf_counter() - started) * 1000)
+
+    async def scanner():
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            await store.chat_ids(GROUP_ID, f"user{random.randrange(50)}@example.com",
+                                 profile="primary" if profile == "primary" else "analytics")
+            scans.append((time.perf_counter() - started) * 1000)
+
+    await asyncio.gather(
+        *[writer() for _ in range(args.writers)],
+        *[reader() for _ in range(args.readers)],
+        *[scanner() for _ in range(args.scanners)],
+    )
+    servers = monitor.report()["servers"]
+    client.close()
+    return {
+        "write": summarize(f"{profile}: insert", writes),
+        "read": summarize(f"{profile}: history page", reads),
+        "scan": summarize(f"{profile}: aggregation", scans),
+        "writes_per_s": len(writes) / args.seconds,
+        "reads_per_s": len(reads) / args.seconds,
+        "servers": servers,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=200_000)
+    parser.add_argument("--writers", type=int, default=20)
+    parser.add_argument("--readers", type=int, default=50)
+    parser.add_argument("--scanners", type=int, default=2)
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--seconds", type=float, default=20)
+    parser.add_argument("--keep", action="store_true", help="keep the scratch collection")
+    args = parser.parse_args()
+
+    seeder = AsyncIOMotorClient(MONGO_URI)
+    hello = await seeder.admin.command("hello")
+    if not hello.get("setName"):
+        print("warning: MONGO_URI is not a replica set; every profile reads the primary")
+    print(f"read profiles: {describe()}")
+    print(f"seeding {args.messages} messages...")
+    anchors = await seed(seeder[MONGO_DB_NAME][COLLECTION], args.messages)
+
+    results = []
+    for profile in ("primary", "history"):
+        print(f"running {args.seconds:g}s with history reads on {profile!r}...")
+        results.append(await run(args, profile, anchors))
+
+    print()
+    for result in results:
+        for key in ("write", "read", "scan"):
+            print_summary(result[key])
+
+    print(f"\n{'profile':<9} {'writes/s':>9} {'write p99':>10} {'reads/s':>9} {'read p95':>9}  commands per member")
+    for profile, result in zip(("primary", "history"), results):
+        print(f"{profile:<9} {result['writes_per_s']:>9.0f} {result['write']['p99_ms']:>10.2f} "
+              f"{result['reads_per_s']:>9.0f} {result['read']['p95_ms']:>9.2f}  {result['servers']}")
+
+    if not args.keep:
+        await seeder[MONGO_DB_NAME][COLLECTION].drop()
+    seeder.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,87 @@
+"""
+Socket.IO event-handling latency under concurrent senders.
+
+Every simulated user connects, joins its personal room and sends messages back to
+back. Latency is measured from `send_message` to the `new_message` broadcast coming
+back to the sender, which covers the handler's Mongo round trips (user lookup,
+insert) and any time spent waiting for the event loop.
+
+Run it against a running server, once on the baseline build and once on the
+current one. Start the server with SOCKET_RATE_LIMIT_ENABLED=false: senders go
+far above the per-user flood control limits, and rejected sends never get a
+`new_message` back, so the numbers would measure the limiter instead:
+
+    SOCKET_RATE_LIMIT_ENABLED=false uvicorn app.main:app --port 8080
+    python -m benchmarks.socket_latency --url http://localhost:8080 --senders 200 --messages 25
+"""
+import argparse
+import asyncio
+import time
+
+import socketio
+
+from benchmarks.common import mint_token, summarize, print_summary
+
+
+async def run_sender(url: str, index: int, messages: int, latencies: list, errors: list):
+    email = f"bench_sender_{index}@bench.local"
+    group_id = f"personal_{email}"
+    chat_id = "bench"
+    client = socketio.AsyncClient(reconnection=False)
+    pending = {}
+
+    @client.on("new_message")
+    async def on_new_message(data):
+        if data.get("role") != "user":
+            return
+        sent_at = pending.pop(data.get("content"), None)
+        if sent_at is not None:
+            latencies.append((time.perf_counter() - sent_at) * 1000)
+
+    try:
+        await client.connect(url, auth={"token": mint_token(email)}, transports=["websocket"])
+        await client.emit("join_room", {"group_id": group_id, "chat_id": chat_id})
+        await asyncio.sleep(0.1)
+
+        for n in range(messages):
+            content = f"bench {index}-{n}"
+            pending[content] = time.perf_counter()
+            await client.emit("send_message", {
+                "group_id": group_id,
+                "chat_id": chat_id,
+                "content": content,
+            })
+            # Wait for our own broadcast before sending the next one
+            deadline = time.perf_counter() + 10
+            while content in pending and time.perf_counter() < deadline:
+                await asyncio.sleep(0.001)
+            if content in pending:
+                errors.append(content)
+                pending.pop(content, None)
+    except Exception as e:
+        errors.append(str(e))
+    finally:
+        await client.disconnect()
+
+
+async def main(args):
+    latencies = []
+    errors = []
+    started = time.perf_counter()
+    await asyncio.gather(*[
+        run_sender(args.url, i, args.messages, latencies, errors)
+        for i in range(args.senders)
+    ])
+    elapsed = time.perf_counter() - started
+
+    print(f"senders={args.senders} messages/sender={args.messages} elapsed={elapsed:.2f}s "
+          f"throughput={len(latencies) / elapsed:.1f} msg/s errors={len(errors)}")
+    print_summary(summarize("send_message -> new_message", latencies))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--url", default="http://localhost:8080")
+    parser.add_argument("--senders", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=20)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,70 @@
+"""
+Load test for typing-indicator coalescing (in-process, no server needed).
+
+Simulates --rooms rooms of --members members where --typers members per room
+send a typing event every --keystroke-ms for --seconds. Compares the websocket
+frames the old per-keystroke broadcast would have produced (every event sent to
+every other member) with the frames produced by TypingAggregator (every
+aggregated update sent to every member).
+
+    python -m benchmarks.typing_load --rooms 50 --members 200 --typers 5 --seconds 10
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from app.services.typing import TypingAggregator
+
+
+async def main(args):
+    emits = []
+
+    async def emit(event, data, room=None):
+        emits.append(room)
+
+    aggregator = TypingAggregator(emit, interval_ms=args.interval_ms, ttl_ms=args.ttl_ms)
+    rooms = [f"group{r}:general" for r in range(args.rooms)]
+    keystrokes = 0
+
+    async def typer(room, sid, email):
+        nonlocal keystrokes
+        await asyncio.sleep(random.random() * args.keystroke_ms / 1000)
+        deadline = time.monotonic() + args.seconds
+        while time.monotonic() < deadline:
+            # Bursts of typing with pauses, like real users
+            if random.random() < 0.8:
+                aggregator.touch(room, sid, email)
+                keystrokes += 1
+            await asyncio.sleep(args.keystroke_ms / 1000)
+
+    await asyncio.gather(*[
+        typer(room, f"{room}-sid{t}", f"user{t}@{room}")
+        for room in rooms
+        for t in range(args.typers)
+    ])
+    # Let the last updates and expirations go out
+    await asyncio.sleep(args.ttl_ms / 1000 + 2 * args.interval_ms / 1000)
+    await aggregator.stop()
+
+    before_frames = keystrokes * (args.members - 1)
+    after_frames = len(emits) * args.members
+    print(f"rooms={args.rooms} members/room={args.members} typers/room={args.typers} "
+          f"keystroke every {args.keystroke_ms}ms for {args.seconds}s")
+    print(f"typing events received:           {keystrokes}")
+    print(f"per-keystroke broadcast (before): {keystrokes} emits -> {before_frames:,} frames")
+    print(f"aggregated updates (after):       {len(emits)} emits -> {after_frames:,} frames")
+    if before_frames:
+        print(f"outbound typing frames reduced by {100 * (1 - after_frames / before_frames):.1f}%")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rooms", type=int, default=50)
+    parser.add_argument("--members", type=int, default=200)
+    parser.add_argument("--typers", type=int, default=5)
+    parser.add_argument("--keystroke-ms", type=int, default=150)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--interval-ms", type=int, default=500)
+    parser.add_argument("--ttl-ms", type=int, default=3000)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,125 @@
+"""
+Throughput benchmark for group-committed message inserts (in-process, no server needed).
+
+--senders concurrent senders spread over --rooms rooms insert messages back to back
+for --seconds, once through the direct path (sequence reservation + insert_one per
+message, as MessageLog.insert does with batching off) and once through
+MessageWriteBatcher. The database is simulated: every round trip holds one of
+--pool connections (MONGO_MAX_POOL_SIZE) for --rtt-ms plus --doc-us per document.
+Reports messages/s, per-insert latency, round trips per message, and checks
+that every room got gap-free sequence numbers in each sender's order.
+
+    python -m benchmarks.write_batching --senders 1,100,1000 --rtt-ms 2 --seconds 5
+"""
+import argparse
+import asyncio
+import time
+
+from app.services.write_batcher import MessageWriteBatcher
+from benchmarks.common import summarize, print_summary
+
+
+class SimulatedMongo:
+    def __init__(self, rtt_ms: float, doc_us: float, pool: int):
+        self.rtt = rtt_ms / 1000
+        self.doc_cost = doc_us / 1_000_000
+        self.pool = asyncio.Semaphore(pool)
+        self.counters = {}
+        self.round_trips = 0
+
+    async def _round_trip(self, docs: int):
+        async with self.pool:
+            self.round_trips += 1
+            await asyncio.sleep(self.rtt + docs * self.doc_cost)
+
+    async def reserve(self, group_id: str, chat_id: str, count: int) -> int:
+        key = (group_id, chat_id)
+        self.counters[key] = self.counters.get(key, 0) + count
+        last = self.counters[key]
+        await self._round_trip(1)
+        return last
+
+    async def insert_one(self, doc: dict):
+        await self._round_trip(1)
+
+    async def insert_many(self, docs: list):
+        await self._round_trip(len(docs))
+
+
+async def run(args, senders: int, batched: bool) -> dict:
+    db = SimulatedMongo(args.rtt_ms, args.doc_us, args.pool)
+    writer = MessageWriteBatcher(
+        reserve=db.reserve, insert_many=db.insert_many,
+        enabled=True, window_ms=args.window_ms, max_batch=args.max_batch,
+    )
+
+    async def insert_direct(doc: dict) -> int:
+        seq = await db.reserve(doc["group_id"], doc["chat_id"], 1)
+        doc["seq"] = doc["updated_seq"] = seq
+        await db.insert_one(doc)
+        return seq
+
+    insert = writer.insert if batched else insert_direct
+    latencies = []
+    seqs = {}  # room -> {sender: [seq, ...]}
+    deadline = time.monotonic() + args.seconds
+
+    async def sender(i: int):
+        room = f"room{i % args.rooms}"
+        mine = seqs.setdefault(room, {}).setdefault(i, [])
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            seq = await insert({"group_id": room, "chat_id": "general", "content": "hello"})
+            latencies.append((time.perf_counter() - started) * 1000)
+            mine.append(seq)
+
+    started = time.perf_counter()
+    await asyncio.gather(*[sender(i) for i in range(senders)])
+    await writer.flush()
+    elapsed = time.perf_counter() - started
+
+    ordered = True
+    for room, by_sender in seqs.items():
+        all_seqs = sorted(seq for sender_seqs in by_sender.values() for seq in sender_seqs)
+        ordered &= all_seqs == list(range(1, len(all_seqs) + 1))
+        ordered &= all(s == sorted(s) for s in by_sender.values())
+
+    return {
+        "messages": len(latencies),
+        "per_second": len(latencies) / elapsed,
+        "round_trips_per_message": db.round_trips / max(len(latencies), 1),
+        "latency": summarize(f"{'group commit' if batched else 'direct'} x{senders}", latencies),
+        "ordered": ordered,
+        "stats": writer.stats() if batched else None,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--senders", default="1,100,1000", help="comma-separated concurrency levels")
+    parser.add_argument("--rooms", type=int, default=50)
+    parser.add_argument("--seconds", type=float, default=5)
+    parser.add_argument("--rtt-ms", type=float, default=2.0, help="simulated round-trip time")
+    parser.add_argument("--doc-us", type=float, default=15.0, help="simulated server cost per document")
+    parser.add_argument("--pool", type=int, default=50, help="simulated connection pool size")
+    parser.add_argument("--window-ms", type=float, default=3.0)
+    parser.add_argument("--max-batch", type=int, default=500)
+    args = parser.parse_args()
+
+    print(f"rtt={args.rtt_ms}ms doc={args.doc_us}us pool={args.pool} rooms={args.rooms} "
+          f"window={args.window_ms}ms seconds={args.seconds}\n")
+    rows = []
+    for senders in [int(n) for n in args.senders.split(",")]:
+        for batched in (False, True):
+            result = await run(args, senders, batched)
+            print_summary(result["latency"])
+            rows.append((senders, batched, result))
+
+    print(f"\n{'senders':>8} {'mode':<13} {'msgs/s':>10} {'round trips/msg':>16} {'p95 ms':>8} {'ordered':>8}")
+    for senders, batched, result in rows:
+        print(f"{senders:>8} {'group commit' if batched else 'direct':<13} {result['per_second']:>10.0f} "
+              f"{result['round_trips_per_message']:>16.3f} {result['latency']['p95_ms']:>8.2f} {str(result['ordered']):>8}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
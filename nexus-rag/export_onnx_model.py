@@ -0,0 +1,73 @@
+"""
+Export EMBEDDING_MODEL to ONNX (and a dynamic int8 quantized copy) for
+EMBEDDING_BACKEND=onnx.
+
+    pip install onnx onnxruntime
+    python export_onnx_model.py --out models/minilm-onnx
+    EMBEDDING_BACKEND=onnx EMBEDDING_ONNX_PATH=models/minilm-onnx uvicorn app.main:app
+
+Writes model.onnx, model_qint8.onnx, tokenizer.json and sentence_bert_config.json.
+Only needed for models that don't publish ONNX graphs on the hub, or to avoid
+downloading them at startup. Needs torch/transformers (build time only).
+"""
+import argparse
+import json
+import os
+
+from app.core.config import EMBEDDING_MODEL
+from app.embeddings.backends import LOCAL_ONNX_FILE, LOCAL_ONNX_QUANTIZED_FILE
+
+
+def export(out: str, opset: int):
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from transformers import AutoModel, AutoTokenizer
+
+    os.makedirs(out, exist_ok=True)
+    st_model = SentenceTransformer(EMBEDDING_MODEL, device="cpu")
+    transformer = st_model[0]
+    model = AutoModel.from_pretrained(transformer.auto_model.name_or_path)
+    model.eval()
+    tokenizer = AutoTokenizer.from_pretrained(transformer.auto_model.name_or_path)
+
+    sample = tokenizer(["export sample"], return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    inputs = tuple(sample[name] for name in names if name in sample)
+    input_names = [name for name in names if name in sample]
+    model_path = os.path.join(out, LOCAL_ONNX_FILE)
+    torch.onnx.export(
+        model,
+        inputs,
+        model_path,
+        input_names=input_names,
+        output_names=["last_hidden_state"],
+        dynamic_axes={**{name: {0: "batch", 1: "sequence"} for name in input_names},
+                      "last_hidden_state": {0: "batch", 1: "sequence"}},
+        opset_version=opset,
+    )
+
+    tokenizer.save_pretrained(out)  # writes tokenizer.json for fast tokenizers
+    with open(os.path.join(out, "sentence_bert_config.json"), "w") as f:
+        json.dump({"max_seq_length": st_model.max_seq_length}, f)
+    print(f"Exported {EMBEDDING_MODEL} to {model_path}")
+    return model_path
+
+
+def quantize(model_path: str, out: str):
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+
+    quantized_path = os.path.join(out, LOCAL_ONNX_QUANTIZED_FILE)
+    quantize_dynamic(model_path, quantized_path, weight_type=QuantType.QInt8)
+    print(f"Quantized (dynamic int8) to {quantized_path}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--out", required=True, help="output directory (EMBEDDING_ONNX_PATH)")
+    parser.add_argument("--opset", type=int, default=14)
+    parser.add_argument("--no-quantize", action="store_true")
+    args = parser.parse_args()
+
+    path = export(args.out, args.opset)
+    if not args.no_quantize:
+        quantize(path, args.out)
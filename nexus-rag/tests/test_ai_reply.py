@@ -0,0 +1,47 @@
+import asyncio
+import os
+
+os.environ.setdefault("JWT_SECRET", "test")
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1")
+
+import app.services.chat_service as chat_service  # noqa: E402
+import app.socketio as socketio_module  # noqa: E402
+
+
+def _run(monkeypatch, result):
+    history, events = [], []
+
+    async def fake_process_chat_message(**kwargs):
+        return result
+
+    async def fake_emit(event, data=None, room=None, **kwargs):
+        events.append((event, data))
+
+    monkeypatch.setattr(chat_service, "process_chat_message", fake_process_chat_message)
+    monkeypatch.setattr(socketio_module, "AI_STREAMING_ENABLED", False)
+    monkeypatch.setattr(socketio_module.room_emitter, "emit", fake_emit)
+    monkeypatch.setattr(socketio_module.room_history, "append", lambda *args: history.append(args))
+
+    asyncio.run(socketio_module._run_ai_reply(
+        "g:c", group_id="g", chat_id="c", user_query="q", user_email="u@x", user_name="u",
+        reply_to_context=None, on_commit=None,
+    ))
+    return history, events
+
+
+def test_failed_reply_is_kept_out_of_history_and_sent_as_error_notice(monkeypatch):
+    history, events = _run(monkeypatch, ("I apologize, but I encountered an internal error.", [], None, None))
+
+    assert history == []
+    [(event, data)] = events
+    assert event == "new_message"
+    assert data["error"] is True and "id" not in data and "seq" not in data
+    assert (data["group_id"], data["chat_id"]) == ("g", "c")
+
+
+def test_stored_reply_goes_to_history_with_id_and_seq(monkeypatch):
+    history, events = _run(monkeypatch, ("hello", [], "m1", 7))
+
+    assert history == [("g:c", "m1", "assistant", "hello", socketio_module.AI_SENDER)]
+    [(event, data)] = events
+    assert (data["id"], data["seq"], data["content"]) == ("m1", 7, "hello")
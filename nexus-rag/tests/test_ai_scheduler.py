@@ -0,0 +1,97 @@
+import asyncio
+import os
+
+os.environ.setdefault("JWT_SECRET", "test")
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1")
+
+import app.services.chat_service as chat_service  # noqa: E402
+import app.socketio as socketio_module  # noqa: E402
+from app.services.ai_scheduler import AIReplyScheduler, AITrigger  # noqa: E402
+
+ROOM = "g:c"
+
+
+def _setup(monkeypatch, on_emit):
+    """Run _run_ai_reply against a fake LLM/store; returns (stored answers, emitted events)."""
+    stored, events = [], []
+
+    async def fake_stream_chat_message(on_delta, on_commit=None, **kwargs):
+        await on_delta("first ")
+        await on_delta("second")  # buffered until the final flush
+        if on_commit:
+            on_commit()
+        stored.append(kwargs["user_query"])
+        return f"answer to {kwargs['user_query']}", [], f"id{len(stored)}", len(stored)
+
+    async def fake_emit(event, data=None, room=None, **kwargs):
+        events.append((event, data))
+        await on_emit(event, data)
+
+    monkeypatch.setattr(chat_service, "stream_chat_message", fake_stream_chat_message)
+    monkeypatch.setattr(socketio_module, "AI_STREAMING_ENABLED", True)
+    monkeypatch.setattr(socketio_module, "AI_STREAM_FLUSH_MS", 60_000)
+    monkeypatch.setattr(socketio_module.sio, "emit", fake_emit)
+    monkeypatch.setattr(socketio_module.room_emitter, "emit", fake_emit)
+    monkeypatch.setattr(socketio_module.room_history, "append", lambda *args, **kwargs: None)
+    return stored, events
+
+
+def _trigger(scheduler, query):
+    scheduler.trigger(ROOM, "g", "c", AITrigger(query, "u@x", "u"))
+
+
+async def _wait_idle(scheduler, timeout: float = 2.0):
+    for _ in range(int(timeout / 0.005)):
+        if not scheduler.is_active(ROOM):
+            return
+        await asyncio.sleep(0.005)
+    raise AssertionError("AI scheduler never went idle (stranded trigger?)")
+
+
+def test_trigger_during_final_flush_queues_instead_of_cancelling_stored_reply(monkeypatch):
+    scheduler = AIReplyScheduler(run=socketio_module._run_ai_reply, window_ms=1, max_restarts=3)
+
+    async def on_emit(event, data):
+        # The answer is already stored; the final flush is in progress
+        if event == "assistant_delta" and data["delta"] == "second" and scheduler.stats()["generations"] == 1:
+            _trigger(scheduler, "q2")
+            scheduler.cancel(ROOM, "room_empty")
+            _trigger(scheduler, "q3")
+            await asyncio.sleep(0.01)
+
+    stored, events = _setup(monkeypatch, on_emit)
+
+    async def run():
+        _trigger(scheduler, "q1")
+        await asyncio.sleep(0.01)
+        await _wait_idle(scheduler)
+
+    asyncio.run(run())
+
+    assert stored == ["q1", "q3"]  # each reply persisted once, q1's never restarted
+    assert not [e for e, _ in events if e == "assistant_cancelled"]
+    finals = [d for e, d in events if e == "new_message"]
+    assert [d["id"] for d in finals] == ["id1", "id2"]
+    assert scheduler.stats()["superseded"] == 0
+
+
+def test_trigger_before_commit_still_supersedes(monkeypatch):
+    scheduler = AIReplyScheduler(run=socketio_module._run_ai_reply, window_ms=1, max_restarts=3)
+
+    async def on_emit(event, data):
+        if event == "assistant_delta" and data["delta"] == "first " and scheduler.stats()["generations"] == 1:
+            _trigger(scheduler, "q2")
+            await asyncio.sleep(0.01)
+
+    stored, events = _setup(monkeypatch, on_emit)
+
+    async def run():
+        _trigger(scheduler, "q1")
+        await asyncio.sleep(0.01)
+        await _wait_idle(scheduler)
+
+    asyncio.run(run())
+
+    assert len(stored) == 1 and "q1" in stored[0] and "q2" in stored[0]
+    assert [d["reason"] for e, d in events if e == "assistant_cancelled"] == ["superseded"]
+    assert scheduler.stats()["superseded"] == 1
@@ -0,0 +1,35 @@
+import os
+
+os.environ.setdefault("JWT_SECRET", "test")
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1")
+
+from app.embeddings.cache import EmbeddingCache  # noqa: E402
+
+
+def test_rewriting_keys_already_on_disk_does_not_grow_the_row_count(tmp_path):
+    path = str(tmp_path / "embeddings.db")
+    cache = EmbeddingCache(model_name="m", max_bytes=10 ** 6, path=path, disk_max_bytes=10 ** 7)
+
+    cache.store(["a", "b"], [[1.0] * 4, [2.0] * 4])
+    cache.store(["a", "b", "c"], [[1.0] * 4, [2.0] * 4, [3.0] * 4])
+
+    disk = cache.stats()["disk"]
+    assert disk["entries"] == 3
+    assert disk["writes"] == 3
+
+    reopened = EmbeddingCache(model_name="m", path=path)
+    assert reopened.lookup([" c "])[0] == [3.0] * 4
+    assert reopened.stats()["disk"]["entries"] == 3
+
+
+def test_memory_tier_evicts_least_recently_used_by_bytes():
+    entry = 4 * 4 + 200  # four float32 plus the per-entry overhead
+    cache = EmbeddingCache(model_name="m", max_bytes=2 * entry, path="")
+
+    cache.store(["a", "b"], [[1.0] * 4, [2.0] * 4])
+    assert cache.lookup(["a"])[0] == [1.0] * 4  # a is now the most recent
+    cache.store(["c"], [[3.0] * 4])
+
+    assert cache.lookup(["b"]) == [None]
+    assert cache.lookup(["a", "c"]) == [[1.0] * 4, [3.0] * 4]
+    assert cache.stats()["evictions"] == 1
@@ -0,0 +1,120 @@
+import os
+
+os.environ.setdefault("JWT_SECRET", "test")
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1")
+
+import numpy as np  # noqa: E402
+import pytest  # noqa: E402
+
+from app.embeddings.backends import (  # noqa: E402
+    OnnxEncoder,
+    PARITY_MIN_COSINE,
+    PARITY_MIN_COSINE_INT8,
+    load_model,
+)
+
+TEXTS = [
+    "ok",
+    "thanks!",
+    "lol",
+    "Can someone check why the deploy failed after the migration?",
+    "The socket keeps reconnecting on Cloud Run when the instance scales down, "
+    "and the vector index returns nothing for messages older than a day.",
+    "  whitespace   and\nnewlines  ",
+    "émojis 🎉 and ünïcödé",
+]
+
+
+# --- Pooling and normalization against a stubbed session ---------------------
+
+class _Encoding:
+    def __init__(self, ids, length):
+        self.ids = ids + [0] * (length - len(ids))
+        self.attention_mask = [1] * len(ids) + [0] * (length - len(ids))
+        self.type_ids = [0] * length
+
+
+class _Tokenizer:
+    """One token per character, padded to the longest text of the batch"""
+
+    def encode_batch(self, texts):
+        length = max(len(t) for t in texts)
+        return [_Encoding([ord(c) for c in t], length) for t in texts]
+
+
+class _Session:
+    """Token embedding = [1, token id]; padding positions get a huge value that pooling must ignore"""
+
+    def __init__(self, input_names):
+        self.input_names = input_names
+        self.feeds = []
+
+    def run(self, outputs, feeds):
+        self.feeds.append(feeds)
+        ids = feeds["input_ids"]
+        hidden = np.stack([np.ones(ids.shape), ids.astype(np.float32)], axis=-1)
+        hidden[feeds["attention_mask"] == 0] = 1e6
+        return [hidden.astype(np.float32)]
+
+
+def _encoder(input_names=("input_ids", "attention_mask", "token_type_ids")):
+    encoder = OnnxEncoder.__new__(OnnxEncoder)  # skip loading onnxruntime and a real graph
+    encoder.tokenizer = _Tokenizer()
+    encoder.session = _Session(set(input_names))
+    encoder.input_names = set(input_names)
+    return encoder
+
+
+def test_mean_pooling_ignores_padding_and_keeps_input_order():
+    encoder = _encoder()
+    out = encoder.encode(["abc", "a", "ab"], batch_size=2)  # sorted by length into two batches
+
+    assert out.shape == (3, 2)
+    np.testing.assert_allclose(out[0], [1, (97 + 98 + 99) / 3])
+    np.testing.assert_allclose(out[1], [1, 97])
+    np.testing.assert_allclose(out[2], [1, (97 + 98) / 2])
+    assert len(encoder.session.feeds) == 2
+
+
+def test_normalized_output_has_unit_length_and_single_text_is_1d():
+    encoder = _encoder()
+    single = encoder.encode("ab", normalize_embeddings=True)
+    batch = encoder.encode(["ab", "abc"], normalize_embeddings=True)
+
+    assert single.shape == (2,)
+    np.testing.assert_allclose(np.linalg.norm(batch, axis=1), [1, 1], rtol=1e-6)
+    np.testing.assert_allclose(single, batch[0], rtol=1e-6)
+
+
+def test_only_inputs_the_graph_declares_are_fed():
+    encoder = _encoder(input_names=("input_ids", "attention_mask"))
+    encoder.encode(["abc"])
+
+    assert set(encoder.session.feeds[0]) == {"input_ids", "attention_mask"}
+    assert encoder.session.feeds[0]["input_ids"].dtype == np.int64
+
+
+# --- Parity with the torch model (needs onnxruntime and the model files) -----
+
+def _load(backend, quantized=False):
+    try:
+        return load_model(backend, quantized)
+    except (OSError, RuntimeError, ValueError) as e:
+        pytest.skip(f"{backend} model unavailable: {e}")
+
+
+@pytest.fixture(scope="module")
+def torch_vectors():
+    pytest.importorskip("sentence_transformers")
+    return np.asarray(_load("torch").encode(TEXTS, normalize_embeddings=True))
+
+
+@pytest.mark.parametrize("quantized, threshold", [(False, PARITY_MIN_COSINE), (True, PARITY_MIN_COSINE_INT8)])
+def test_onnx_vectors_match_torch(torch_vectors, quantized, threshold):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("tokenizers")
+    vectors = np.asarray(_load("onnx", quantized).encode(TEXTS, normalize_embeddings=True))
+
+    assert vectors.shape == torch_vectors.shape
+    cosines = np.sum(vectors * torch_vectors, axis=1)  # both are normalized
+    assert cosines.min() >= threshold, dict(zip(TEXTS, cosines.round(4)))
@@ -0,0 +1,44 @@
+import asyncio
+import os
+
+os.environ.setdefault("JWT_SECRET", "test")
+os.environ.setdefault("MONGO_URI", "mongodb://localhost:1")
+
+from app.services.write_batcher import MessageWriteBatcher  # noqa: E402
+
+
+def test_seqs_follow_arrival_order_when_commits_outlast_the_window():
+    counters: dict = {}
+    reserve_delays = iter([0.05])  # the first reservation is the slowest round trip
+    in_flight = 0
+    max_in_flight = 0
+
+    async def reserve(group_id, chat_id, count):
+        await asyncio.sleep(next(reserve_delays, 0.001))
+        counters[chat_id] = counters.get(chat_id, 0) + count
+        return counters[chat_id]
+
+    async def insert_many(docs):
+        nonlocal in_flight, max_in_flight
+        in_flight += 1
+        max_in_flight = max(max_in_flight, in_flight)
+        await asyncio.sleep(0.03)  # longer than the 5 ms window
+        in_flight -= 1
+
+    async def run():
+        batcher = MessageWriteBatcher(reserve, insert_many, enabled=True, window_ms=5, max_batch=100)
+        tasks = []
+        for i in range(12):
+            doc = {"group_id": "g", "chat_id": "c", "content": str(i)}
+            tasks.append(asyncio.create_task(batcher.insert(doc)))
+            await asyncio.sleep(0.004)
+        seqs = await asyncio.gather(*tasks)
+        await batcher.flush()
+        return seqs, batcher.stats()
+
+    seqs, stats = asyncio.run(run())
+
+    assert seqs == list(range(1, 13))
+    assert max_in_flight == 1
+    assert stats["batches"] > 1
+    assert stats["written"] == 12